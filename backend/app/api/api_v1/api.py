@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import auth, users, issues, comments, attachments, stats
+from app.api.api_v1.endpoints import auth, users, issues, comments, attachments, uploads, files, feed, stats, admin
 
 api_router = APIRouter()
 
@@ -10,4 +10,8 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(issues.router, prefix="/issues", tags=["issues"])
 api_router.include_router(comments.router, prefix="/comments", tags=["comments"])
 api_router.include_router(attachments.router, prefix="/attachments", tags=["attachments"])
+api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
+api_router.include_router(files.router, prefix="/files", tags=["files"])
+api_router.include_router(feed.router, prefix="/feed", tags=["feed"])
 api_router.include_router(stats.router, prefix="/stats", tags=["stats"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
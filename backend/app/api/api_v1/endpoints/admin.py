@@ -0,0 +1,21 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.core.security import get_admin_user
+from app.db.database import async_engine, replica_engine
+from app.db.pool import pool_status
+from app.models.user import User
+from app.schemas.admin import PoolStatusResponse
+
+router = APIRouter()
+
+@router.get("/db/pool", response_model=PoolStatusResponse)
+async def read_pool_status(
+    current_user: User = Depends(get_admin_user)
+) -> Any:
+    """Get database connection pool usage and wait times - admin only"""
+    pools = {"primary": pool_status(async_engine.sync_engine.pool)}
+    if replica_engine is not None:
+        pools["replica"] = pool_status(replica_engine.sync_engine.pool)
+    return {"success": True, "data": pools}
@@ -1,29 +1,57 @@
 from typing import Any, List
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 
 from app.api.deps import get_db
+from app.core.archives import ArchiveMember, stream_zip, unique_names
+from app.core.blobs import UploadTooLarge, blob_key, is_blob_key, thumbnail_key
 from app.core.config import settings
+from app.core.offload import file_response, signed_file_url
 from app.core.security import get_current_active_user
+from app.core.storage import content_disposition, read_file_chunks, storage
+from app.core.thumbnails import THUMBNAIL_MEDIA_TYPE, ThumbnailFailed, thumbnail_generator
 from app.crud.attachment_crud import get_attachment, get_attachments_by_issue, create_attachment, delete_attachment, save_upload_file, can_modify_attachment
+from app.crud.blob_crud import acquire_blob
+from app.crud.issue_crud import can_view_issue
+from app.models.attachment import Attachment
+from app.models.issue import Issue
 from app.models.user import User
-from app.schemas.attachment import AttachmentCreate, AttachmentResponse, AttachmentsResponse
+from app.schemas.attachment import AttachmentCreate, AttachmentResponse, AttachmentsResponse, DownloadUrlResponse
+from app.schemas.upload import DirectUploadCreate, DirectUploadResponse
+from app.websockets.manager import manager
+from app.websockets.routes import send_attachment_update, attachment_update_message
 
 router = APIRouter()
 
+async def get_visible_attachment(db: AsyncSession, attachment_id: int, user: User) -> Attachment:
+    """Get an attachment the user may see, answering 404 or 403 otherwise"""
+    attachment = await get_attachment(db, attachment_id=attachment_id)
+    if not attachment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+    issue = await db.get(Issue, attachment.issue_id)
+    if issue is None or not can_view_issue(issue, user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return attachment
+
 @router.get("/issue/{issue_id}", response_model=AttachmentsResponse)
 async def read_attachments_by_issue(
     issue_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Retrieve attachments for an issue"""
-    attachments, total = get_attachments_by_issue(
+    attachments, total = await get_attachments_by_issue(
         db, 
         issue_id=issue_id,
         skip=skip, 
@@ -37,43 +65,97 @@ async def read_attachments_by_issue(
         "page_size": limit
     }
 
+@router.get("/issue/{issue_id}/archive")
+async def download_issue_attachments_archive(
+    issue_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Download every attachment of an issue as one ZIP, streamed as it is built"""
+    issue = await db.get(Issue, issue_id)
+    if issue is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Issue not found"
+        )
+    if not can_view_issue(issue, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    # Only metadata is loaded up front, file contents are read while streaming
+    attachments = []
+    while True:
+        page, total = await get_attachments_by_issue(db, issue_id=issue_id, skip=len(attachments), limit=100)
+        attachments.extend(page)
+        if not page or len(attachments) >= total:
+            break
+    
+    def reader(file_path: str):
+        # Legacy per-issue files are always on local disk, blobs may be remote
+        if is_blob_key(file_path):
+            return lambda: storage.iter_chunks(file_path, settings.UPLOAD_CHUNK_SIZE)
+        return lambda: read_file_chunks(os.path.join(settings.UPLOAD_DIR, file_path), settings.UPLOAD_CHUNK_SIZE)
+    
+    names = unique_names(attachment.filename for attachment in attachments)
+    members = [
+        ArchiveMember(
+            name=name,
+            size=attachment.size,
+            modified=attachment.created_at,
+            chunks=reader(attachment.file_path)
+        )
+        for name, attachment in zip(names, attachments)
+    ]
+    return StreamingResponse(
+        stream_zip(members),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": content_disposition(f"issue-{issue_id}-attachments.zip"),
+            "Cache-Control": "no-store",
+        }
+    )
+
 @router.post("/", response_model=AttachmentResponse, status_code=status.HTTP_201_CREATED)
 async def create_attachment_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     issue_id: int = Form(...),
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Upload new attachment"""
-    # Validate file size
-    if file.size > settings.MAX_UPLOAD_SIZE:
+    # Validate file extension
+    file_ext = os.path.splitext(file.filename or "")[1].lower()
+    if file_ext not in settings.ALLOWED_UPLOAD_EXTENSIONS:
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE / (1024 * 1024):.1f} MB"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed types: {', '.join(settings.ALLOWED_UPLOAD_EXTENSIONS)}"
         )
     
-    # Validate file extension
-    file_ext = os.path.splitext(file.filename)[1].lower().lstrip('.')
-    if file_ext not in settings.ALLOWED_EXTENSIONS:
+    # Save file, the size limit is enforced while streaming since file.size is client supplied
+    try:
+        stored = await save_upload_file(db, file)
+    except UploadTooLarge:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type not allowed. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE / (1024 * 1024):.1f} MB"
         )
     
-    # Save file
     try:
-        file_path = await save_upload_file(file, issue_id)
-        
         attachment_in = AttachmentCreate(
             filename=file.filename,
-            content_type=file.content_type,
-            size=file.size,
+            content_type=file.content_type or "application/octet-stream",
+            size=stored.size,
+            sha256=stored.sha256,
             issue_id=issue_id,
-            file_path=file_path
+            file_path=stored.file_path
         )
         
-        attachment = create_attachment(db, attachment_in=attachment_in, uploader_id=current_user.id)
+        attachment = await create_attachment(db, attachment_in=attachment_in, uploader_id=current_user.id)
+        thumbnail_generator.schedule(attachment.sha256, attachment.file_path, attachment.content_type)
+        await send_attachment_update(attachment, "created")
         return {"success": True, "data": attachment}
     except Exception as e:
         raise HTTPException(
@@ -81,14 +163,101 @@ async def create_attachment_endpoint(
             detail=f"Error uploading file: {str(e)}"
         )
 
+@router.post("/direct-uploads", response_model=DirectUploadResponse)
+async def create_direct_upload(
+    upload_in: DirectUploadCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Get a presigned request to PUT a file straight to storage, then POST direct-uploads/complete"""
+    if not storage.supports_presigned_urls:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Direct uploads are not supported by this server's storage, use /uploads instead"
+        )
+    if upload_in.size > settings.DIRECT_UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.DIRECT_UPLOAD_MAX_SIZE / (1024 * 1024):.1f} MB"
+        )
+    if await db.get(Issue, upload_in.issue_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Issue not found"
+        )
+    
+    # Content already in storage needs no transfer, the client can complete straight away
+    if await storage.size(blob_key(upload_in.sha256)) == upload_in.size:
+        return {"success": True, "data": {"exists": True}}
+    presigned = storage.presigned_upload(upload_in.sha256, upload_in.size, upload_in.content_type)
+    return {
+        "success": True,
+        "data": {
+            "exists": False,
+            "upload_method": presigned["method"],
+            "upload_url": presigned["url"],
+            "upload_headers": presigned["headers"],
+            "expires_in": settings.PRESIGNED_URL_EXPIRE_SECONDS,
+        }
+    }
+
+@router.post("/direct-uploads/complete", response_model=AttachmentResponse, status_code=status.HTTP_201_CREATED)
+async def complete_direct_upload(
+    upload_in: DirectUploadCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Turn a file uploaded straight to storage into an attachment"""
+    if not storage.supports_presigned_urls:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Direct uploads are not supported by this server's storage, use /uploads instead"
+        )
+    if await db.get(Issue, upload_in.issue_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Issue not found"
+        )
+    
+    # The presigned PUT signs the checksum, so an object under the hash's key holds exactly that content
+    key = blob_key(upload_in.sha256)
+    stored_size = await storage.size(key)
+    if stored_size != upload_in.size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File has not been uploaded to storage"
+        )
+    await storage.claim_upload(key)
+    await acquire_blob(db, sha256=upload_in.sha256, size=stored_size)
+    # The last attachment of this content may have been deleted since the check above, its release then
+    # moved the blob to quarantine, so take it back from there before referring to it
+    if await storage.size(key) is None and not await storage.restore(key):
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File has not been uploaded to storage"
+        )
+    attachment_in = AttachmentCreate(
+        filename=upload_in.filename,
+        content_type=upload_in.content_type,
+        size=stored_size,
+        sha256=upload_in.sha256,
+        issue_id=upload_in.issue_id,
+        file_path=key
+    )
+    attachment = await create_attachment(db, attachment_in=attachment_in, uploader_id=current_user.id)
+    thumbnail_generator.schedule(attachment.sha256, attachment.file_path, attachment.content_type)
+    await send_attachment_update(attachment, "created")
+    return {"success": True, "data": attachment}
+
 @router.get("/{attachment_id}", response_model=AttachmentResponse)
 async def read_attachment(
     attachment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Get attachment metadata by ID"""
-    attachment = get_attachment(db, attachment_id=attachment_id)
+    attachment = await get_attachment(db, attachment_id=attachment_id)
     if not attachment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,16 +268,17 @@ async def read_attachment(
 @router.get("/{attachment_id}/download")
 async def download_attachment(
     attachment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
-    """Download attachment file"""
-    attachment = get_attachment(db, attachment_id=attachment_id)
-    if not attachment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Attachment not found"
-        )
+    """Download attachment file, supporting byte ranges and conditional requests"""
+    attachment = await get_visible_attachment(db, attachment_id, current_user)
+    
+    # Blobs in remote storage go straight from there to the client, the API only authorizes
+    if is_blob_key(attachment.file_path):
+        url = storage.presigned_download(attachment.file_path, attachment.filename, attachment.content_type)
+        if url is not None:
+            return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers={"Cache-Control": "no-store"})
     
     file_path = os.path.join(settings.UPLOAD_DIR, attachment.file_path)
     if not os.path.exists(file_path):
@@ -117,21 +287,80 @@ async def download_attachment(
             detail="File not found on server"
         )
     
-    return FileResponse(
-        path=file_path,
+    # The content hash is a strong validator, and blob paths never change content
+    return file_response(
+        attachment.file_path,
+        media_type=attachment.content_type,
         filename=attachment.filename,
-        media_type=attachment.content_type
+        etag=f'"{attachment.sha256}"' if attachment.sha256 else None,
+        immutable=is_blob_key(attachment.file_path)
+    )
+
+@router.get("/{attachment_id}/download-url", response_model=DownloadUrlResponse)
+async def read_attachment_download_url(
+    attachment_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Get a short-lived link to the file that works without an Authorization header"""
+    attachment = await get_visible_attachment(db, attachment_id, current_user)
+    
+    url = None
+    if is_blob_key(attachment.file_path):
+        url = storage.presigned_download(attachment.file_path, attachment.filename, attachment.content_type)
+    if url is not None:
+        expires_in = settings.PRESIGNED_URL_EXPIRE_SECONDS
+    else:
+        expires_in = settings.SIGNED_URL_EXPIRE_SECONDS
+        url = signed_file_url(attachment.file_path, attachment.filename, attachment.content_type, expires_in)
+    return {"success": True, "data": {"url": url, "expires_in": expires_in}}
+
+@router.get("/{attachment_id}/thumbnail")
+async def read_attachment_thumbnail(
+    attachment_id: int,
+    size: int = Query(256, description="Bounding box edge in pixels, one of THUMBNAIL_SIZES"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Get a WebP thumbnail of an image attachment, rendered on first request if needed"""
+    if size not in settings.THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported size. Available sizes: {', '.join(map(str, settings.THUMBNAIL_SIZES))}"
+        )
+    # Checked before rendering, so nobody can make the workers decode images they may not see
+    attachment = await get_visible_attachment(db, attachment_id, current_user)
+    if not attachment.has_thumbnail:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment has no thumbnail"
+        )
+    
+    try:
+        await thumbnail_generator.get(attachment.sha256, attachment.file_path, size)
+    except (ThumbnailFailed, FileNotFoundError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Thumbnail could not be rendered from this file"
+        )
+    # Thumbnails are derived from immutable content, so they never change either
+    return file_response(
+        thumbnail_key(attachment.sha256, size),
+        media_type=THUMBNAIL_MEDIA_TYPE,
+        etag=f'"{attachment.sha256}-{size}"',
+        immutable=True,
+        content_disposition_type="inline"
     )
 
 @router.delete("/{attachment_id}", response_model=AttachmentResponse)
 async def delete_attachment_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     attachment_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Delete attachment with permission check"""
-    attachment = get_attachment(db, attachment_id=attachment_id)
+    attachment = await get_attachment(db, attachment_id=attachment_id)
     if not attachment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,5 +374,8 @@ async def delete_attachment_endpoint(
             detail="Not enough permissions"
         )
     
-    attachment = delete_attachment(db, attachment_id=attachment_id)
+    # Build the event while the attachment can still be read
+    message = attachment_update_message(attachment, "deleted")
+    attachment = await delete_attachment(db, attachment_id=attachment_id)
+    await manager.publish_to_issue(message, message["attachment"]["issue_id"])
     return {"success": True, "data": attachment}
@@ -1,13 +1,15 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Any
 
 from fastapi import APIRouter, Body, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db
 from app.core.config import settings
-from app.core.security import create_access_token, create_refresh_token
+from app.core.principals import principal_cache
+from app.core.revocation import revocation_store
+from app.core.security import create_access_token, create_refresh_token, oauth2_scheme
 from app.crud.user_crud import authenticate_user, get_user_by_email
 from app.schemas.auth import TokenResponse, RefreshRequest
 from app.schemas.user import UserCreate
@@ -16,11 +18,11 @@ router = APIRouter()
 
 @router.post("/login", response_model=TokenResponse)
 async def login_access_token(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """OAuth2 compatible token login, get an access token for future requests"""
-    user = authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,7 +50,7 @@ async def login_access_token(
     }
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(refresh_request: RefreshRequest, db: Session = Depends(get_db)) -> Any:
+async def refresh_token(refresh_request: RefreshRequest, db: AsyncSession = Depends(get_db)) -> Any:
     """Refresh access token"""
     try:
         from jose import jwt
@@ -57,7 +59,8 @@ async def refresh_token(refresh_request: RefreshRequest, db: Session = Depends(g
         )
         user_id = payload.get("sub")
         email = payload.get("email")
-        if user_id is None or email is None:
+        jti = payload.get("jti")
+        if user_id is None or email is None or jti is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid refresh token",
@@ -70,7 +73,14 @@ async def refresh_token(refresh_request: RefreshRequest, db: Session = Depends(g
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = get_user_by_email(db, email=email)
+    if await revocation_store.is_revoked(jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user = await get_user_by_email(db, email=email)
     if not user or str(user.id) != user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,6 +93,16 @@ async def refresh_token(refresh_request: RefreshRequest, db: Session = Depends(g
             detail="Inactive user"
         )
     
+    # Rotate, each refresh token is single use; losing the race to revoke it means it was replayed
+    if not await revocation_store.revoke(
+        db, jti=jti, expires_at=datetime.utcfromtimestamp(payload["exp"]), user_id=user.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
     # Create new access and refresh tokens
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token_data = {"sub": str(user.id), "email": user.email, "role": user.role.value}
@@ -97,11 +117,36 @@ async def refresh_token(refresh_request: RefreshRequest, db: Session = Depends(g
         "user": user
     }
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    refresh_request: RefreshRequest,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> None:
+    """Revoke the session's refresh token and the access token used for this request"""
+    from jose import JWTError, jwt
+    for raw_token in (refresh_request.refresh_token, token):
+        try:
+            payload = jwt.decode(raw_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            # Already expired or invalid, nothing left to revoke
+            continue
+        if payload.get("jti") is None:
+            continue
+        user_id = payload.get("sub")
+        await revocation_store.revoke(
+            db,
+            jti=payload["jti"],
+            expires_at=datetime.utcfromtimestamp(payload["exp"]),
+            user_id=int(user_id) if user_id is not None else None
+        )
+    principal_cache.invalidate_token(token)
+
 @router.post("/register", response_model=TokenResponse)
-async def register_user(user_in: UserCreate, db: Session = Depends(get_db)) -> Any:
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db)) -> Any:
     """Register new user"""
     # Check if user with this email already exists
-    user = get_user_by_email(db, email=user_in.email)
+    user = await get_user_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -110,7 +155,7 @@ async def register_user(user_in: UserCreate, db: Session = Depends(get_db)) -> A
     
     # Create new user
     from app.crud.user_crud import create_user
-    user = create_user(db, user_in=user_in)
+    user = await create_user(db, user_in=user_in)
     
     # Create access and refresh tokens
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -1,31 +1,36 @@
 from typing import Any, List
 
 from fastapi import APIRouter, Body, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db
 from app.core.security import get_current_active_user, get_admin_user
 from app.crud.comment_crud import get_comment, get_comments_by_issue, create_comment, update_comment, delete_comment, can_modify_comment
 from app.models.user import User
+from app.schemas.base import ContentFormat
 from app.schemas.comment import CommentCreate, CommentUpdate, CommentResponse, CommentsResponse
+from app.websockets.manager import manager
+from app.websockets.routes import send_comment_update, comment_update_message
 
 router = APIRouter()
 
 @router.get("/issue/{issue_id}", response_model=CommentsResponse)
 async def read_comments_by_issue(
     issue_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    format: ContentFormat = Query(ContentFormat.MARKDOWN, description="html adds sanitized HTML of Markdown fields"),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Retrieve comments for an issue"""
-    comments, total = get_comments_by_issue(
+    comments, total = await get_comments_by_issue(
         db, 
         issue_id=issue_id,
         skip=skip, 
         limit=limit,
-        current_user=current_user
+        current_user=current_user,
+        with_html=format == ContentFormat.HTML
     )
     return {
         "success": True,
@@ -38,22 +43,24 @@ async def read_comments_by_issue(
 @router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 async def create_comment_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     comment_in: CommentCreate,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Create new comment"""
-    comment = create_comment(db, comment_in=comment_in, user_id=current_user.id)
+    comment = await create_comment(db, comment_in=comment_in, user_id=current_user.id)
+    await send_comment_update(comment, "created")
     return {"success": True, "data": comment}
 
 @router.get("/{comment_id}", response_model=CommentResponse)
 async def read_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    format: ContentFormat = Query(ContentFormat.MARKDOWN, description="html adds sanitized HTML of Markdown fields"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Get comment by ID"""
-    comment = get_comment(db, comment_id=comment_id)
+    comment = await get_comment(db, comment_id=comment_id, with_html=format == ContentFormat.HTML)
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,13 +71,13 @@ async def read_comment(
 @router.put("/{comment_id}", response_model=CommentResponse)
 async def update_comment_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     comment_id: int,
     comment_in: CommentUpdate,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Update comment with permission check"""
-    comment = get_comment(db, comment_id=comment_id)
+    comment = await get_comment(db, comment_id=comment_id)
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -84,18 +91,19 @@ async def update_comment_endpoint(
             detail="Not enough permissions"
         )
     
-    comment = update_comment(db, db_comment=comment, comment_in=comment_in)
+    comment = await update_comment(db, db_comment=comment, comment_in=comment_in)
+    await send_comment_update(comment, "updated")
     return {"success": True, "data": comment}
 
 @router.delete("/{comment_id}", response_model=CommentResponse)
 async def delete_comment_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     comment_id: int,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Delete comment with permission check"""
-    comment = get_comment(db, comment_id=comment_id)
+    comment = await get_comment(db, comment_id=comment_id)
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,5 +117,8 @@ async def delete_comment_endpoint(
             detail="Not enough permissions"
         )
     
-    comment = delete_comment(db, comment_id=comment_id)
+    # Build the event while the comment can still be read
+    message = comment_update_message(comment, "deleted")
+    comment = await delete_comment(db, comment_id=comment_id)
+    await manager.publish_to_issue(message, message["comment"]["issue_id"])
     return {"success": True, "data": comment}
@@ -0,0 +1,27 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.core.security import get_current_active_user
+from app.crud.feed_crud import get_feed
+from app.models.user import User
+from app.schemas.feed import FeedResponse
+
+router = APIRouter()
+
+@router.get("", response_model=FeedResponse)
+async def read_feed(
+    before: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Status changes, comments and attachments on issues the current user reported, is assigned to or commented on"""
+    entries = await get_feed(db, user_id=current_user.id, before=before, limit=limit)
+    return {
+        "success": True,
+        "data": entries,
+        "next_cursor": entries[-1].id if len(entries) == limit else None
+    }
@@ -1,28 +1,39 @@
 from typing import Any, List, Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, File, UploadFile, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
 
-from app.api.deps import get_db
+from app.api.deps import get_db, statement_timeout
+from app.core.config import settings
 from app.core.security import get_current_active_user, get_admin_user, get_maintainer_or_admin_user
-from app.crud.issue_crud import get_issue, get_issues, create_issue, update_issue, delete_issue, update_issue_status
+from app.core.thumbnails import thumbnail_generator
+from app.crud.issue_crud import can_view_issue, get_issue, get_issues, create_issue, update_issue, delete_issue, update_issue_status
 from app.crud.attachment_crud import save_upload_file, create_attachment
 from app.models.user import User, UserRole
 from app.models.issue import IssueStatus, IssueSeverity
+from app.schemas.base import ContentFormat
 from app.schemas.issue import IssueCreate, IssueUpdate, IssueResponse, IssuesResponse, IssueStatusUpdate
 from app.schemas.attachment import AttachmentCreate
+from app.websockets.access import access_cache
+from app.websockets.manager import manager
+from app.websockets.routes import send_issue_update, send_attachment_update, issue_update_message
 
 router = APIRouter()
 
-@router.get("/", response_model=IssuesResponse)
+@router.get(
+    "/",
+    response_model=IssuesResponse,
+    dependencies=[Depends(statement_timeout(settings.DB_SEARCH_STATEMENT_TIMEOUT_MS))]
+)
 async def read_issues(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, description="Number of issues to skip (pagination offset)"),
     limit: int = Query(100, description="Maximum number of issues to return", ge=1, le=100),
     status: Optional[IssueStatus] = Query(None, description="Filter by status: OPEN, TRIAGED, IN_PROGRESS, DONE"),
     severity: Optional[IssueSeverity] = Query(None, description="Filter by severity: LOW, MEDIUM, HIGH, CRITICAL"),
     search: Optional[str] = Query(None, description="Search term for issue title or description"),
+    format: ContentFormat = Query(ContentFormat.MARKDOWN, description="html adds sanitized HTML of Markdown fields"),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Retrieve a paginated list of issues based on filters.
@@ -40,14 +51,15 @@ async def read_issues(
     GET /api/v1/issues/?status=OPEN&severity=HIGH&limit=10
     ```
     """
-    issues, total = get_issues(
+    issues, total = await get_issues(
         db, 
         skip=skip, 
         limit=limit, 
         current_user=current_user,
         status=status,
         severity=severity,
-        search=search
+        search=search,
+        with_html=format == ContentFormat.HTML
     )
     return {
         "success": True,
@@ -60,7 +72,7 @@ async def read_issues(
 @router.post("/", response_model=IssueResponse, status_code=status.HTTP_201_CREATED)
 async def create_issue_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     title: str = Form(..., description="Issue title, max 255 characters"),
     description: str = Form(..., description="Detailed issue description in Markdown format"),
     severity: IssueSeverity = Form(IssueSeverity.MEDIUM, description="Issue severity level"),
@@ -105,36 +117,42 @@ async def create_issue_endpoint(
         severity=severity,
         assignee_id=assignee_id
     )
-    issue = create_issue(db, issue_in=issue_in, reporter_id=current_user.id)
+    issue = await create_issue(db, issue_in=issue_in, reporter_id=current_user.id)
     
     # Handle file upload if provided
     if file:
         try:
-            file_path = await save_upload_file(file, issue.id)
+            stored = await save_upload_file(db, file)
             attachment_in = AttachmentCreate(
                 filename=file.filename,
-                content_type=file.content_type,
-                size=file.size,
+                content_type=file.content_type or "application/octet-stream",
+                size=stored.size,
+                sha256=stored.sha256,
                 issue_id=issue.id,
-                file_path=file_path
+                file_path=stored.file_path
             )
-            create_attachment(db, attachment_in=attachment_in, uploader_id=current_user.id)
+            attachment = await create_attachment(db, attachment_in=attachment_in, uploader_id=current_user.id)
+            thumbnail_generator.schedule(attachment.sha256, attachment.file_path, attachment.content_type)
+            await send_attachment_update(attachment, "created")
         except Exception as e:
-            # Log the error but don't fail the issue creation
+            # Log the error but don't fail the issue creation, dropping the blob reference
+            await db.rollback()
             print(f"Error uploading file: {str(e)}")
     
     # Refresh issue to get all relationships
-    issue = get_issue(db, issue_id=issue.id)
+    issue = await get_issue(db, issue_id=issue.id)
+    await send_issue_update(issue, "created")
     return {"success": True, "data": issue}
 
 @router.get("/{issue_id}", response_model=IssueResponse)
 async def read_issue(
     issue_id: int,
-    db: Session = Depends(get_db),
+    format: ContentFormat = Query(ContentFormat.MARKDOWN, description="html adds sanitized HTML of Markdown fields"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Get issue by ID with RBAC"""
-    issue = get_issue(db, issue_id=issue_id)
+    issue = await get_issue(db, issue_id=issue_id, with_html=format == ContentFormat.HTML)
     if not issue:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -142,7 +160,7 @@ async def read_issue(
         )
     
     # Check permissions
-    if current_user.role == UserRole.REPORTER and issue.reporter_id != current_user.id:
+    if not can_view_issue(issue, current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
@@ -153,13 +171,13 @@ async def read_issue(
 @router.put("/{issue_id}", response_model=IssueResponse)
 async def update_issue_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     issue_id: int,
     issue_in: IssueUpdate,
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Update issue with RBAC"""
-    issue = get_issue(db, issue_id=issue_id)
+    issue = await get_issue(db, issue_id=issue_id)
     if not issue:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -180,19 +198,20 @@ async def update_issue_endpoint(
                 detail="Reporters cannot change issue status"
             )
     
-    issue = update_issue(db, db_issue=issue, issue_in=issue_in, user_id=current_user.id)
+    issue = await update_issue(db, db_issue=issue, issue_in=issue_in, user_id=current_user.id)
+    await send_issue_update(issue, "updated")
     return {"success": True, "data": issue}
 
 @router.put("/{issue_id}/status", response_model=IssueResponse)
 async def update_issue_status_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     issue_id: int,
     status_update: IssueStatusUpdate,
     current_user: User = Depends(get_maintainer_or_admin_user)  # Only maintainers and admins
 ) -> Any:
     """Update issue status - maintainers and admins only"""
-    issue = get_issue(db, issue_id=issue_id)
+    issue = await get_issue(db, issue_id=issue_id)
     if not issue:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -200,29 +219,34 @@ async def update_issue_status_endpoint(
         )
     
     try:
-        issue = update_issue_status(db, db_issue=issue, status_update=status_update, user_id=current_user.id)
+        issue = await update_issue_status(db, db_issue=issue, status_update=status_update, user_id=current_user.id)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     
+    await send_issue_update(issue, "updated")
     return {"success": True, "data": issue}
 
 @router.delete("/{issue_id}", response_model=IssueResponse)
 async def delete_issue_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     issue_id: int,
     current_user: User = Depends(get_admin_user)  # Admin only
 ) -> Any:
     """Delete issue - admin only"""
-    issue = get_issue(db, issue_id=issue_id)
+    issue = await get_issue(db, issue_id=issue_id)
     if not issue:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Issue not found"
         )
     
-    issue = delete_issue(db, issue_id=issue_id)
+    # Build the event while the issue can still be read
+    message = issue_update_message(issue, "deleted")
+    issue = await delete_issue(db, issue_id=issue_id)
+    access_cache.invalidate_issue(issue_id)
+    await manager.publish_to_issue(message, issue_id)
     return {"success": True, "data": issue}
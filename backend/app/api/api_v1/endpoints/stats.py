@@ -2,36 +2,38 @@ from typing import Any, List
 from datetime import date, datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db
+from app.api.deps import get_db, statement_timeout
+from app.core.config import settings
 from app.core.security import get_current_active_user, get_maintainer_or_admin_user
 from app.crud.stats_crud import get_daily_stats, get_daily_stats_range, create_or_update_daily_stats, get_dashboard_stats
 from app.models.user import User
 from app.schemas.stats import DailyStatsResponse, DailyStatsListResponse, DashboardResponse
 
-router = APIRouter()
+# Aggregations scan the issue tables, so stats routes get a longer statement budget
+router = APIRouter(dependencies=[Depends(statement_timeout(settings.DB_STATS_STATEMENT_TIMEOUT_MS))])
 
 @router.get("/dashboard", response_model=DashboardResponse)
 async def read_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """Get statistics for dashboard"""
-    stats = get_dashboard_stats(db)
+    stats = await get_dashboard_stats(db)
     return {"success": True, "data": stats}
 
 @router.get("/daily", response_model=DailyStatsResponse)
 async def read_daily_stats_endpoint(
     stats_date: date = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_maintainer_or_admin_user)  # Only maintainers and admins
 ) -> Any:
     """Get daily statistics for a specific date"""
     if stats_date is None:
         stats_date = date.today()
     
-    stats = get_daily_stats(db, stats_date=stats_date)
+    stats = await get_daily_stats(db, stats_date=stats_date)
     if not stats:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -44,7 +46,7 @@ async def read_daily_stats_endpoint(
 async def read_daily_stats_range_endpoint(
     start_date: date = Query(...),
     end_date: date = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_maintainer_or_admin_user)  # Only maintainers and admins
 ) -> Any:
     """Get daily statistics for a date range"""
@@ -62,7 +64,7 @@ async def read_daily_stats_range_endpoint(
             detail="Date range cannot exceed 90 days"
         )
     
-    stats = get_daily_stats_range(db, start_date=start_date, end_date=end_date)
+    stats = await get_daily_stats_range(db, start_date=start_date, end_date=end_date)
     return {
         "success": True,
         "data": stats,
@@ -72,7 +74,7 @@ async def read_daily_stats_range_endpoint(
 @router.post("/daily/generate", response_model=DailyStatsResponse)
 async def generate_daily_stats_endpoint(
     stats_date: date = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_maintainer_or_admin_user)  # Only maintainers and admins
 ) -> Any:
     """Generate or update daily statistics for a specific date"""
@@ -86,5 +88,5 @@ async def generate_daily_stats_endpoint(
             detail="Cannot generate statistics for future dates"
         )
     
-    stats = create_or_update_daily_stats(db, stats_date=stats_date)
+    stats = await create_or_update_daily_stats(db, stats_date=stats_date)
     return {"success": True, "data": stats}
@@ -0,0 +1,210 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import get_db
+from app.core.blobs import UploadTooLarge, blob_store
+from app.core.config import settings
+from app.core.resumable import ChecksumMismatch, UploadBusy, locked_partial_upload, parse_upload_checksum, write_chunk
+from app.core.security import get_current_active_user
+from app.core.thumbnails import thumbnail_generator
+from app.crud.attachment_crud import create_attachment, store_staged_upload
+from app.crud.upload_crud import create_upload_session, delete_upload_session, get_upload_session, update_upload_offset
+from app.models.issue import Issue
+from app.models.upload_session import UploadSession
+from app.models.user import User
+from app.schemas.attachment import AttachmentCreate, AttachmentResponse
+from app.schemas.upload import UploadSessionCreate, UploadSessionResponse
+from app.websockets.routes import send_attachment_update
+
+router = APIRouter()
+
+# tus uses 460 for a chunk whose checksum does not match
+HTTP_460_CHECKSUM_MISMATCH = 460
+CHUNK_CONTENT_TYPE = "application/offset+octet-stream"
+
+async def get_own_upload_session(db: AsyncSession, upload_id: str, current_user: User) -> UploadSession:
+    """Get an upload session that belongs to the current user, or 404"""
+    upload_session = await get_upload_session(db, upload_id=upload_id)
+    if not upload_session or upload_session.uploader_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    return upload_session
+
+def offset_headers(upload_session: UploadSession) -> dict:
+    """tus headers describing an upload's progress"""
+    return {
+        "Upload-Offset": str(upload_session.offset),
+        "Upload-Length": str(upload_session.size),
+        "Cache-Control": "no-store",
+    }
+
+@router.post("/", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload_in: UploadSessionCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Start a resumable upload, then PATCH its bytes in order and POST complete"""
+    if upload_in.size > settings.RESUMABLE_UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.RESUMABLE_UPLOAD_MAX_SIZE / (1024 * 1024):.1f} MB"
+        )
+    if await db.get(Issue, upload_in.issue_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Issue not found"
+        )
+    
+    upload_session = await create_upload_session(db, upload_in=upload_in, uploader_id=current_user.id)
+    response.headers["Location"] = f"{settings.API_V1_STR}/uploads/{upload_session.upload_id}"
+    response.headers.update(offset_headers(upload_session))
+    return {"success": True, "data": upload_session}
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+async def read_upload(
+    upload_id: str,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Get an upload's progress, the offset to resume from"""
+    upload_session = await get_own_upload_session(db, upload_id, current_user)
+    response.headers.update(offset_headers(upload_session))
+    return {"success": True, "data": upload_session}
+
+@router.head("/{upload_id}")
+async def read_upload_offset(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Response:
+    """Get an upload's offset as tus headers"""
+    upload_session = await get_own_upload_session(db, upload_id, current_user)
+    return Response(status_code=status.HTTP_200_OK, headers=offset_headers(upload_session))
+
+@router.patch("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def append_upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    upload_checksum: str = Header(None, alias="Upload-Checksum"),
+    content_type: str = Header(None, alias="Content-Type"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Response:
+    """Append a chunk at Upload-Offset, streamed to disk so memory stays at one network read"""
+    if content_type != CHUNK_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Chunks must be sent as {CHUNK_CONTENT_TYPE}"
+        )
+    try:
+        checksum = parse_upload_checksum(upload_checksum) if upload_checksum else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    # Check ownership before the lock creates a partial file for the ID
+    await get_own_upload_session(db, upload_id, current_user)
+    try:
+        async with locked_partial_upload(blob_store.partial_path(upload_id)) as fd:
+            # Read the offset under the lock, a concurrent PATCH may have just moved it
+            upload_session = await get_own_upload_session(db, upload_id, current_user)
+            if upload_offset != upload_session.offset:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload-Offset does not match the current offset {upload_session.offset}",
+                    headers=offset_headers(upload_session)
+                )
+            # End the transaction so the pooled connection is free while a slow client sends the body
+            await db.commit()
+            try:
+                offset = await write_chunk(
+                    fd, upload_session.offset, request.stream(), max_offset=upload_session.size, checksum=checksum
+                )
+            except UploadTooLarge:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Chunk extends past the declared upload length"
+                )
+            except ChecksumMismatch:
+                raise HTTPException(
+                    status_code=HTTP_460_CHECKSUM_MISMATCH,
+                    detail="Chunk does not match Upload-Checksum"
+                )
+            upload_session = await update_upload_offset(db, upload_session, offset=offset)
+    except UploadBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another request is writing to this upload"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=offset_headers(upload_session))
+
+@router.post("/{upload_id}/complete", response_model=AttachmentResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """Turn a fully received upload into an attachment"""
+    await get_own_upload_session(db, upload_id, current_user)
+    try:
+        async with locked_partial_upload(blob_store.partial_path(upload_id)):
+            upload_session = await get_own_upload_session(db, upload_id, current_user)
+            if upload_session.offset != upload_session.size:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload is incomplete, {upload_session.offset} of {upload_session.size} bytes received",
+                    headers=offset_headers(upload_session)
+                )
+            # Hashing reads the whole file, hold no connection meanwhile
+            await db.commit()
+            
+            # Hash in chunks on a worker thread, then store like any other upload
+            partial_path = blob_store.partial_path(upload_id)
+            staged = await run_in_threadpool(blob_store.stage_file, partial_path, settings.UPLOAD_CHUNK_SIZE)
+            # Store a link, so the partial file survives a failure below and complete can be retried
+            staged = staged._replace(temp_path=await run_in_threadpool(blob_store.link_staged, partial_path))
+            try:
+                stored = await store_staged_upload(db, staged)
+                attachment_in = AttachmentCreate(
+                    filename=upload_session.filename,
+                    content_type=upload_session.content_type,
+                    size=stored.size,
+                    sha256=stored.sha256,
+                    issue_id=upload_session.issue_id,
+                    file_path=stored.file_path
+                )
+                await db.delete(upload_session)
+                attachment = await create_attachment(db, attachment_in=attachment_in, uploader_id=current_user.id)
+            except BaseException:
+                # Release the blob reference acquired above, a new blob's file is left for orphan collection
+                await db.rollback()
+                raise
+            await run_in_threadpool(blob_store.discard, partial_path)
+    except UploadBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another request is writing to this upload"
+        )
+    thumbnail_generator.schedule(attachment.sha256, attachment.file_path, attachment.content_type)
+    await send_attachment_update(attachment, "created")
+    return {"success": True, "data": attachment}
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(
+    upload_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Response:
+    """Abandon an upload and free its partial file"""
+    upload_session = await get_own_upload_session(db, upload_id, current_user)
+    await delete_upload_session(db, upload_session)
+    await run_in_threadpool(blob_store.discard, blob_store.partial_path(upload_id))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
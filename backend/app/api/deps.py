@@ -1,16 +1,13 @@
-from typing import Generator
-
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import SessionLocal
+# Re-export the session dependency so endpoints and auth dependencies share one session per request
+from app.db.database import get_db, set_statement_timeout
 from app.core.security import get_current_active_user, get_admin_user, get_maintainer_or_admin_user
 from app.models.user import User
 
-def get_db() -> Generator[Session, None, None]:
-    """Get database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def statement_timeout(timeout_ms: int):
+    """Dependency giving a route its own statement timeout budget"""
+    async def apply_statement_timeout(db: AsyncSession = Depends(get_db)):
+        await set_statement_timeout(db, timeout_ms)
+    return apply_statement_timeout
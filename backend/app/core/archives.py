@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable, List, NamedTuple, Set
+import asyncio
+import os
+import zipfile
+
+# Formats that are compressed already, deflating them again costs CPU and saves nothing
+COMPRESSED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".pdf", ".docx", ".xlsx", ".zip", ".gz", ".7z", ".mp4"
+}
+
+class ArchiveMember(NamedTuple):
+    """A file to add to a streamed archive, read lazily when its turn comes"""
+    name: str
+    size: int
+    modified: datetime
+    chunks: Callable[[], AsyncIterator[bytes]]
+
+class ZipOutput:
+    """Write-only file object collecting zipfile output until the stream drains it"""
+    
+    def __init__(self):
+        self._parts: List[bytes] = []
+    
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+def unique_names(names: Iterable[str]) -> List[str]:
+    """Make archive entry names unique, "report.pdf" then "report (2).pdf" """
+    seen: Set[str] = set()
+    unique = []
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        candidate, counter = name, 1
+        while candidate.lower() in seen:
+            counter += 1
+            candidate = f"{stem} ({counter}){extension}"
+        seen.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+async def stream_zip(members: Iterable[ArchiveMember]) -> AsyncIterator[bytes]:
+    """Build a ZIP on the fly, holding at most one chunk of each member in memory"""
+    output = ZipOutput()
+    # Without seek, zipfile writes sizes and CRCs in data descriptors after each member
+    archive = zipfile.ZipFile(output, mode="w")
+    for member in members:
+        info = zipfile.ZipInfo(member.name, date_time=max(member.modified, datetime(1980, 1, 1)).timetuple()[:6])
+        extension = os.path.splitext(member.name)[1].lower()
+        info.compress_type = zipfile.ZIP_STORED if extension in COMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        # The expected size decides whether zip64 headers are needed up front
+        info.file_size = member.size
+        entry = archive.open(info, mode="w")
+        async for chunk in member.chunks():
+            # Deflate and CRC are CPU work, keep them off the event loop
+            await asyncio.to_thread(entry.write, chunk)
+            data = output.drain()
+            if data:
+                yield data
+        await asyncio.to_thread(entry.close)
+        yield output.drain()
+    archive.close()
+    yield output.drain()
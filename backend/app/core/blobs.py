@@ -0,0 +1,185 @@
+from typing import BinaryIO, Iterable, Iterator, NamedTuple
+import hashlib
+import os
+import tempfile
+import time
+
+from app.core.config import settings
+
+# Blobs live under UPLOAD_DIR/blobs/ab/cd/<sha256>, two fan-out levels keep directories small
+BLOB_DIR = "blobs"
+STAGING_DIR = "tmp"
+THUMBNAIL_DIR = "thumbnails"
+# Unreferenced files wait here, under their original key, before they are deleted
+QUARANTINE_DIR = "quarantine"
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit while it is being stored"""
+
+class StoredFile(NamedTuple):
+    """A file found by scanning the store"""
+    key: str
+    size: int
+    mtime: float
+
+class StagedUpload(NamedTuple):
+    """An upload written to a temp file, not yet moved to its content address"""
+    temp_path: str
+    size: int
+    sha256: str
+
+def blob_key(sha256: str) -> str:
+    """Storage key of a blob, relative to the upload directory"""
+    return "/".join((BLOB_DIR, sha256[:2], sha256[2:4], sha256))
+
+def thumbnail_key(sha256: str, size: int) -> str:
+    """Storage key of a thumbnail, derived from the blob it was rendered from"""
+    return "/".join((THUMBNAIL_DIR, sha256[:2], sha256[2:4], f"{sha256}-{size}.webp"))
+
+def is_blob_key(file_path: str) -> bool:
+    """Whether an attachment path is a content-addressed blob rather than a legacy per-issue file"""
+    return file_path.startswith(BLOB_DIR + "/")
+
+class BlobStore:
+    """Content-addressed files on the local filesystem, file operations block so run them on a worker thread"""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def path(self, key: str) -> str:
+        """Filesystem path of a storage key"""
+        return os.path.join(self.root, key)
+    
+    def staging_dir(self) -> str:
+        """Directory for temp files, created on first use"""
+        staging_dir = os.path.join(self.root, STAGING_DIR)
+        os.makedirs(staging_dir, exist_ok=True)
+        return staging_dir
+    
+    def stage(self, source: BinaryIO, max_size: int, chunk_size: int) -> StagedUpload:
+        """Copy a file object to a temp file in chunks, hashing as it goes"""
+        # Same filesystem as the blobs, so committing is an atomic rename
+        fd, temp_path = tempfile.mkstemp(dir=self.staging_dir(), prefix="upload-", suffix=".part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                while chunk := source.read(chunk_size):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLarge()
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+        except BaseException:
+            self.discard(temp_path)
+            raise
+        return StagedUpload(temp_path=temp_path, size=size, sha256=digest.hexdigest())
+    
+    def partial_path(self, upload_id: str) -> str:
+        """Path of a resumable upload's partial file, staged beside other uploads"""
+        return os.path.join(self.root, STAGING_DIR, f"resumable-{upload_id}.part")
+    
+    def stage_file(self, temp_path: str, chunk_size: int) -> StagedUpload:
+        """Hash a completed file in the staging directory so it can be committed"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, "rb") as temp_file:
+            while chunk := temp_file.read(chunk_size):
+                size += len(chunk)
+                digest.update(chunk)
+        return StagedUpload(temp_path=temp_path, size=size, sha256=digest.hexdigest())
+    
+    def link_staged(self, path: str) -> str:
+        """Hard link a staged file under a new temp name, committing the link leaves the original in place"""
+        fd, temp_path = tempfile.mkstemp(dir=self.staging_dir(), prefix="upload-", suffix=".part")
+        os.close(fd)
+        os.remove(temp_path)
+        os.link(path, temp_path)
+        return temp_path
+    
+    def commit(self, staged: StagedUpload) -> str:
+        """Move a staged upload to its content address and return the key"""
+        key = blob_key(staged.sha256)
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(staged.temp_path, destination)
+        # Renaming onto a link to the same file leaves both names, e.g. when a failed complete is retried
+        self.discard(staged.temp_path)
+        return key
+    
+    def discard(self, temp_path: str):
+        """Remove a staged upload that is not needed, e.g. a duplicate"""
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    def remove(self, keys: Iterable[str]):
+        """Remove blobs whose last reference is gone"""
+        for key in keys:
+            path = self.path(key)
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def scan(self, directory: str = "") -> Iterator[StoredFile]:
+        """Walk the files under a directory lazily, the quarantine is skipped unless it is the one asked for"""
+        top = os.path.normpath(os.path.join(self.root, directory))
+        for dirpath, dirnames, filenames in os.walk(top):
+            if not directory and dirpath == top and QUARANTINE_DIR in dirnames:
+                dirnames.remove(QUARANTINE_DIR)
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat_result = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(path, top).replace(os.sep, "/")
+                yield StoredFile(key=key, size=stat_result.st_size, mtime=stat_result.st_mtime)
+    
+    def quarantine(self, key: str, older_than: float) -> bool:
+        """Move an unreferenced file aside unless it changed since it was found, e.g. recommitted"""
+        path = self.path(key)
+        try:
+            if os.stat(path).st_mtime > older_than:
+                return False
+        except FileNotFoundError:
+            return False
+        destination = os.path.join(self.root, QUARANTINE_DIR, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+        # The quarantine grace period counts from now
+        os.utime(destination)
+        directory, _, _ = key.rpartition("/")
+        if directory and directory.split("/", 1)[0] not in (BLOB_DIR, THUMBNAIL_DIR, STAGING_DIR):
+            # Drop emptied legacy per-issue directories, fan-out directories are reused by commits
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+        return True
+    
+    def quarantine_all(self, keys: Iterable[str]):
+        """Move released files aside now, whatever their age"""
+        now = time.time()
+        for key in keys:
+            self.quarantine(key, older_than=now)
+    
+    def restore(self, key: str):
+        """Move a quarantined file back, or drop it when its key has been stored again meanwhile"""
+        source = os.path.join(self.root, QUARANTINE_DIR, key)
+        destination = self.path(key)
+        if os.path.exists(destination):
+            os.remove(source)
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(source, destination)
+    
+    def purge(self, key: str):
+        """Delete a quarantined file for good"""
+        path = os.path.join(self.root, QUARANTINE_DIR, key)
+        if os.path.exists(path):
+            os.remove(path)
+
+# Create a global blob store instance
+blob_store = BlobStore(settings.UPLOAD_DIR)
@@ -0,0 +1,166 @@
+from typing import Dict, Optional
+import json
+import time
+
+from app.core.config import settings
+from app.core.metrics import (
+    CONCURRENCY_IN_FLIGHT, CONCURRENCY_LIMIT, CONCURRENCY_REQUEST_SECONDS, CONCURRENCY_SHED_REQUESTS
+)
+
+# Route classes with their latency targets, bulk classes yield to interactive ones under load
+ROUTE_CLASS_TARGETS_MS = {
+    "auth": 500,
+    "crud": 250,
+    "search": 1000,
+    "stats": 2000,
+    "export": 5000,
+    "upload": 30000,
+}
+BULK_ROUTE_CLASSES = {"search", "stats", "export", "upload"}
+
+def classify_request(scope: dict) -> Optional[str]:
+    """Map an HTTP request to its route class, None for routes that are never shed"""
+    path: str = scope.get("path", "")
+    api_prefix = settings.API_V1_STR
+    if not path.startswith(api_prefix):
+        return None
+    path = path[len(api_prefix):]
+    if path.startswith("/auth"):
+        return "auth"
+    if path.startswith("/stats"):
+        return "stats"
+    if path.endswith(("/archive", "/export")):
+        return "export"
+    # Latency of a request with a body includes receiving it, so uploads are judged separately
+    if path.startswith("/uploads") and scope.get("method") == "PATCH":
+        return "upload"
+    if path.rstrip("/") == "/attachments" and scope.get("method") == "POST":
+        return "upload"
+    if scope.get("method") == "GET" and path.rstrip("/") == "/issues" and b"search=" in scope.get("query_string", b""):
+        return "search"
+    return "crud"
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one per window of fast responses and shrinks on slow or failed ones"""
+    
+    def __init__(
+        self,
+        route_class: str,
+        target_seconds: float,
+        initial_limit: float,
+        min_limit: int,
+        max_limit: int,
+        backoff: float = 0.9
+    ):
+        self.route_class = route_class
+        self.target_seconds = target_seconds
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        CONCURRENCY_LIMIT.labels(route_class=route_class).set_function(lambda: self.limit)
+        CONCURRENCY_IN_FLIGHT.labels(route_class=route_class).set_function(lambda: self.in_flight)
+    
+    @property
+    def saturated(self) -> bool:
+        """Whether every slot under the current limit is taken"""
+        return self.in_flight >= int(self.limit)
+    
+    def try_acquire(self, limit: Optional[float] = None) -> bool:
+        """Take a slot if in-flight requests are under the limit"""
+        if self.in_flight >= int(self.limit if limit is None else limit):
+            return False
+        self.in_flight += 1
+        return True
+    
+    def release(self, latency: float, overloaded: bool = False):
+        """Free a slot and adapt the limit from the request's latency"""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if overloaded or latency > self.target_seconds:
+            # Back off at most once per target latency, a burst of slow responses is one signal
+            if now - self._last_decrease >= self.target_seconds:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+class AdaptiveConcurrencyMiddleware:
+    """ASGI middleware shedding excess requests per route class with 503 and Retry-After"""
+    
+    def __init__(self, app, limiters: Optional[Dict[str, AIMDLimiter]] = None):
+        self.app = app
+        self.limiters = limiters if limiters is not None else {
+            route_class: AIMDLimiter(
+                route_class,
+                target_seconds=target_ms / 1000,
+                initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+                min_limit=settings.CONCURRENCY_MIN_LIMIT,
+                max_limit=settings.CONCURRENCY_MAX_LIMIT
+            )
+            for route_class, target_ms in ROUTE_CLASS_TARGETS_MS.items()
+        }
+    
+    def interactive_saturated(self) -> bool:
+        """Whether any interactive route class is at its limit"""
+        return any(
+            limiter.saturated for route_class, limiter in self.limiters.items()
+            if route_class not in BULK_ROUTE_CLASSES
+        )
+    
+    async def __call__(self, scope, receive, send):
+        route_class = classify_request(scope) if scope["type"] == "http" else None
+        limiter = self.limiters.get(route_class) if route_class else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        
+        # Bulk work drops to its minimum share while interactive requests are queueing
+        limit = None
+        reason = "limit"
+        if route_class in BULK_ROUTE_CLASSES and self.interactive_saturated():
+            limit = limiter.min_limit
+            reason = "priority"
+        if not limiter.try_acquire(limit):
+            CONCURRENCY_SHED_REQUESTS.labels(route_class=route_class, reason=reason).inc()
+            await self.shed(send)
+            return
+        
+        started = time.perf_counter()
+        latency: Optional[float] = None
+        overloaded = False
+        
+        async def send_wrapper(message):
+            nonlocal latency, overloaded
+            if message["type"] == "http.response.start":
+                # Time to first byte, so streamed exports are judged by how fast they start
+                latency = time.perf_counter() - started
+                overloaded = message["status"] == 503
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            overloaded = True
+            raise
+        finally:
+            if latency is None:
+                latency = time.perf_counter() - started
+            limiter.release(latency, overloaded=overloaded)
+            CONCURRENCY_REQUEST_SECONDS.labels(route_class=route_class).observe(latency)
+    
+    async def shed(self, send):
+        """Reject a request before it reaches the application"""
+        body = json.dumps({"detail": "Server is busy, try again shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(settings.CONCURRENCY_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
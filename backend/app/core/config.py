@@ -13,6 +13,14 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    PRINCIPAL_CACHE_SIZE: int = 10000  # Verified tokens whose user is served without a query
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60  # Per process, bounds staleness across workers
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000  # Expected unexpired revocations
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE: float = 0.001  # Share of checks confirmed in the database
+    TOKEN_REVOCATION_REFRESH_SECONDS: int = 30  # Rebuild interval, bounds cross-process revocation delay
+    BCRYPT_ROUNDS: int = 12  # Changing this rehashes passwords on the next successful login
+    PASSWORD_HASH_WORKERS: int = 2  # Processes running bcrypt
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # Waiting hash operations before answering 503
     
     # CORS settings
     CORS_ORIGINS: List[str]
@@ -27,14 +35,76 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: Optional[str] = None  # GET requests and the stats worker read here when set
+    DB_READ_YOUR_WRITES_SECONDS: int = 10  # Keep a user's reads on the primary this long after a write
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 10  # Wait for a free connection before failing the request
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000  # Default budget for CRUD routes, 0 disables
+    DB_SEARCH_STATEMENT_TIMEOUT_MS: int = 15000
+    DB_STATS_STATEMENT_TIMEOUT_MS: int = 30000
     
     # File upload settings
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes held in memory at once while storing an upload
+    RESUMABLE_UPLOAD_MAX_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, for uploads sent in PATCH chunks
+    RESUMABLE_UPLOAD_EXPIRE_HOURS: int = 24  # Sessions idle this long are garbage collected
+    ORPHAN_MIN_AGE_HOURS: int = 1  # Younger unreferenced files may belong to an upload still committing
+    ORPHAN_QUARANTINE_HOURS: int = 72  # Quarantined files are deleted after this, move them back to restore
+    ORPHAN_GC_BATCH_SIZE: int = 500  # Files checked per database query
+    ORPHAN_GC_BATCH_PAUSE_SECONDS: float = 0.5  # Pause between batches so the scan leaves I/O to live traffic
+    STORAGE_BACKEND: str = "local"  # "local" for UPLOAD_DIR or "s3" for an S3-compatible bucket
+    S3_BUCKET: Optional[str] = None
+    S3_REGION: str = "us-east-1"
+    S3_ENDPOINT_URL: Optional[str] = None  # For MinIO and other S3-compatible stores, AWS when unset
+    S3_PUBLIC_ENDPOINT_URL: Optional[str] = None  # Endpoint clients reach for presigned URLs, if different
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    PRESIGNED_URL_EXPIRE_SECONDS: int = 900
+    DIRECT_UPLOAD_MAX_SIZE: int = 5 * 1024 * 1024 * 1024  # 5GB, the S3 single PUT limit
+    DOWNLOAD_OFFLOAD: str = ""  # "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd) to let the proxy send files
+    DOWNLOAD_OFFLOAD_PREFIX: str = "/protected-uploads"  # nginx internal location aliased to UPLOAD_DIR
+    SIGNED_URL_EXPIRE_SECONDS: int = 300  # Lifetime of download links that need no Authorization header
+    THUMBNAIL_SIZES: List[int] = [64, 256, 1024]  # Bounding box edges in pixels, rendered together
+    THUMBNAIL_WORKERS: int = 2  # Processes decoding and resizing images
+    THUMBNAIL_MAX_QUEUE: int = 16  # Waiting renders before lazy requests get 503
+    THUMBNAIL_MAX_PIXELS: int = 50_000_000  # Larger images are refused as decompression bombs
     ALLOWED_UPLOAD_EXTENSIONS: List[str] = [
         ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".doc", ".docx", ".xls", ".xlsx", ".txt"
     ]
     
+    # Activity feed settings
+    FEED_RETENTION_DAYS: int = 90  # Older activity is pruned from feeds and never shown
+    FEED_FANOUT_MAX_PARTICIPANTS: int = 50  # Activity on issues with more is stored once and merged into feeds on read
+    FEED_PRUNE_BATCH_SIZE: int = 5000  # Expired feed entries deleted per transaction
+    
+    # WebSocket settings
+    WS_COALESCE_WINDOW_MS: int = 100  # Merge per-issue updates within this window, 0 disables
+    WS_ACCESS_CACHE_SIZE: int = 10000  # Cached (user, issue) subscribe decisions
+    WS_ACCESS_CACHE_TTL_SECONDS: int = 300
+    WS_MAX_BATCH_SUBSCRIBE: int = 100  # Issue IDs accepted in one subscribe message
+    WS_HEARTBEAT_INTERVAL_SECONDS: int = 30  # Server ping interval, 0 disables heartbeats
+    WS_HEARTBEAT_TIMEOUT_SECONDS: int = 90  # Reap connections silent for longer than this
+    WS_MAX_CONNECTIONS: int = 10000
+    WS_MAX_CONNECTIONS_PER_USER: int = 10
+    WS_MAX_SUBSCRIPTIONS_PER_USER: int = 500
+    WS_MAX_FILTERS_PER_USER: int = 20
+    WS_REPLAY_BUFFER_SIZE: int = 5000  # Recent issue frames kept for reconnect replay
+    
+    # Metrics settings
+    METRICS_PORT: int = 0  # Serve Prometheus metrics unauthenticated on this port only, 0 serves /metrics to admins on the API
+    METRICS_HOST: str = "127.0.0.1"  # Interface the metrics port binds to, keep it off the public network
+    
+    # Load shedding settings, limits adapt per route class between the min and max
+    LOAD_SHEDDING_ENABLED: bool = True
+    CONCURRENCY_INITIAL_LIMIT: int = 20
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: int = 200
+    CONCURRENCY_RETRY_AFTER_SECONDS: int = 1
+    
     # Environment settings
     ENVIRONMENT: str
     
@@ -0,0 +1,216 @@
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, List, Optional, Tuple
+import os
+import stat
+import uuid
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+# More ranges than this, e.g. a scan for many tiny slices, get the whole file instead
+MAX_RANGES = 16
+# ASGI extension letting the server sendfile() straight from our file descriptor
+ZERO_COPY_EXTENSION = "http.response.zerocopysend"
+# Content-addressed files never change, others are revalidated with their ETag
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+class RangeNotSatisfiable(Exception):
+    """Raised when none of the requested byte ranges overlap the file"""
+
+def parse_range_header(value: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a bytes Range header into sorted, merged inclusive ranges, None to serve the whole file"""
+    unit, _, specs = value.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip() or size == 0:
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        start_text, separator, end_text = spec.strip().partition("-")
+        if not separator:
+            return None
+        try:
+            if not start_text:
+                # Suffix range, the last N bytes
+                length = int(end_text)
+                if length <= 0:
+                    continue
+                ranges.append((max(0, size - length), size - 1))
+                continue
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        except ValueError:
+            return None
+        if start < 0 or (end_text and end < start):
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+    
+    # Overlapping and adjacent ranges are served as one
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def not_modified_since(header: str, mtime: float) -> bool:
+    """Whether a file is unchanged since an If-Modified-Since date"""
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with conditional requests, byte ranges and zero-copy sends when the server supports them"""
+    
+    def __init__(self, path: str, *, etag: Optional[str] = None, immutable: bool = False, **kwargs):
+        super().__init__(path, **kwargs)
+        if etag is not None:
+            self.headers["etag"] = etag
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    
+    def set_stat_headers(self, stat_result: os.stat_result):
+        # A quoted validator, usable for If-Range, when the caller has no content hash
+        self.headers.setdefault("etag", f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"')
+        super().set_stat_headers(stat_result)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(self.stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(self.stat_result)
+        request_headers = Headers(scope=scope)
+        size = self.stat_result.st_size
+        
+        if self.is_not_modified(request_headers):
+            await self.send_empty(send, 304, [
+                (name, self.headers[name]) for name in ("etag", "last-modified", "cache-control")
+            ])
+            return
+        
+        ranges = None
+        range_header = request_headers.get("range")
+        if range_header and self.if_range_matches(request_headers):
+            try:
+                ranges = parse_range_header(range_header, size)
+            except RangeNotSatisfiable:
+                await self.send_empty(send, 416, [("content-range", f"bytes */{size}")])
+                return
+        
+        if ranges is None:
+            segments = [(b"", 0, size)]
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            segments = [(b"", start, end - start + 1)]
+        else:
+            segments = self.multipart_segments(ranges, size)
+        self.headers["content-length"] = str(sum(len(prefix) + length for prefix, _, length in segments))
+        
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            await self.send_segments(scope, send, segments)
+        if self.background is not None:
+            await self.background()
+    
+    def is_not_modified(self, request_headers: Headers) -> bool:
+        """Evaluate If-None-Match, falling back to If-Modified-Since as RFC 9110 orders them"""
+        if "if-none-match" in request_headers:
+            return etag_matches(request_headers["if-none-match"], self.headers["etag"])
+        if "if-modified-since" in request_headers:
+            return not_modified_since(request_headers["if-modified-since"], self.stat_result.st_mtime)
+        return False
+    
+    def if_range_matches(self, request_headers: Headers) -> bool:
+        """Whether a Range request may be honoured, the client's copy must be the current one"""
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == self.headers["etag"]
+        return if_range == self.headers["last-modified"]
+    
+    def multipart_segments(self, ranges: List[Tuple[int, int]], size: int) -> List[Tuple[bytes, int, int]]:
+        """Body segments of a multipart/byteranges response, as (part header, offset, length)"""
+        boundary = uuid.uuid4().hex
+        self.status_code = 206
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        segments = [
+            (
+                (
+                    f"\r\n--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1"),
+                start,
+                end - start + 1
+            )
+            for start, end in ranges
+        ]
+        segments.append((f"\r\n--{boundary}--\r\n".encode("latin-1"), 0, 0))
+        return segments
+    
+    async def send_segments(self, scope: Scope, send: Send, segments: List[Tuple[bytes, int, int]]):
+        """Send each segment's prefix then its slice of the file"""
+        zero_copy = ZERO_COPY_EXTENSION in scope.get("extensions", {})
+        file: BinaryIO = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for index, (prefix, offset, length) in enumerate(segments):
+                last = index == len(segments) - 1
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": not last or length > 0})
+                if length == 0:
+                    continue
+                if zero_copy:
+                    await send({
+                        "type": ZERO_COPY_EXTENSION,
+                        "file": file,
+                        "offset": offset,
+                        "count": length,
+                        "more_body": not last,
+                    })
+                    continue
+                # pread keeps no file position, so each slice is read independently
+                end = offset + length
+                while offset < end:
+                    chunk = await anyio.to_thread.run_sync(
+                        os.pread, file.fileno(), min(self.chunk_size, end - offset), offset
+                    )
+                    if not chunk:
+                        raise RuntimeError(f"File at path {self.path} was truncated while sending.")
+                    offset += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": not last or offset < end})
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+        if not segments[-1][0] and segments[-1][2] == 0:
+            # An empty file still needs its closing body message
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+    
+    async def send_empty(self, send: Send, status_code: int, headers: List[Tuple[str, str]]):
+        """Send a response without a body, e.g. 304 or 416"""
+        raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        if status_code != 304:
+            raw_headers.append((b"content-length", b"0"))
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
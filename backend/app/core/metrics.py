@@ -0,0 +1,109 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# WebSocket broadcast metrics
+WS_BROADCASTS = Counter(
+    "ws_broadcasts_total",
+    "WebSocket broadcasts sent",
+    ["scope"]
+)
+WS_BROADCAST_RECIPIENTS = Counter(
+    "ws_broadcast_recipients_total",
+    "WebSocket frames delivered by broadcasts",
+    ["scope"]
+)
+WS_BROADCAST_BYTES = Counter(
+    "ws_broadcast_bytes_total",
+    "Uncompressed WebSocket payload bytes delivered by broadcasts",
+    ["scope"]
+)
+WS_BROADCAST_ENCODE_SECONDS = Histogram(
+    "ws_broadcast_encode_seconds",
+    "Time spent serializing a broadcast payload",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+WS_BROADCAST_SEND_SECONDS = Histogram(
+    "ws_broadcast_send_seconds",
+    "Time spent handing a broadcast to every recipient",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+# WebSocket connection metrics
+WS_ACTIVE_CONNECTIONS = Gauge(
+    "ws_active_connections",
+    "Open WebSocket connections"
+)
+WS_ACTIVE_USERS = Gauge(
+    "ws_active_users",
+    "Users with at least one open WebSocket connection"
+)
+WS_ISSUE_SUBSCRIPTIONS = Gauge(
+    "ws_issue_subscriptions",
+    "Issue subscriptions held by connected users"
+)
+WS_BOOKKEEPING_BYTES_PER_CONNECTION = Gauge(
+    "ws_bookkeeping_bytes_per_connection",
+    "Shallow size of connection manager containers per open connection, excluding sockets and snapshots"
+)
+WS_REAPED_CONNECTIONS = Counter(
+    "ws_reaped_connections_total",
+    "WebSocket connections purged by the server",
+    ["reason"]
+)
+WS_REJECTED_CONNECTIONS = Counter(
+    "ws_rejected_connections_total",
+    "WebSocket connections refused by connection caps",
+    ["reason"]
+)
+
+# Database connection pool metrics
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+    ["engine"]
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond the configured pool size",
+    ["engine"]
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check out a pooled connection",
+    ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up waiting for a pooled connection",
+    ["engine"]
+)
+
+# Adaptive concurrency metrics
+CONCURRENCY_LIMIT = Gauge(
+    "concurrency_limit",
+    "Current adaptive concurrency limit",
+    ["route_class"]
+)
+CONCURRENCY_IN_FLIGHT = Gauge(
+    "concurrency_in_flight_requests",
+    "Requests currently admitted",
+    ["route_class"]
+)
+CONCURRENCY_REQUEST_SECONDS = Histogram(
+    "concurrency_request_seconds",
+    "Time to first response byte for admitted requests",
+    ["route_class"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+CONCURRENCY_SHED_REQUESTS = Counter(
+    "concurrency_shed_requests_total",
+    "Requests rejected with 503 by the load shedder",
+    ["route_class", "reason"]
+)
+
+# Token revocation metrics
+TOKEN_REVOCATION_CHECKS = Counter(
+    "token_revocation_checks_total",
+    "Token revocation checks by outcome, filter_miss is answered from memory",
+    ["result"]
+)
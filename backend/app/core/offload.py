@@ -0,0 +1,70 @@
+from typing import Optional
+from urllib.parse import quote, urlencode
+import hashlib
+import hmac
+import os
+import time
+
+from starlette.responses import Response
+
+from app.core.blobs import blob_store
+from app.core.config import settings
+from app.core.downloads import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, RangeFileResponse
+from app.core.storage import content_disposition
+
+# Values of DOWNLOAD_OFFLOAD, the header the front proxy acts on
+X_ACCEL_REDIRECT = "x-accel-redirect"
+X_SENDFILE = "x-sendfile"
+
+def file_signature(key: str, filename: str, content_type: str, expires: int) -> str:
+    """HMAC of everything a signed file URL controls, so none of it can be changed"""
+    message = "\n".join((key, filename, content_type, str(expires)))
+    return hmac.new(settings.SECRET_KEY.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+def signed_file_url(key: str, filename: str, content_type: str, expires_in: int) -> str:
+    """Short-lived URL of a stored file that needs no Authorization header, e.g. for <img> or a plain link"""
+    expires = int(time.time()) + expires_in
+    query = urlencode({
+        "name": filename,
+        "type": content_type,
+        "expires": expires,
+        "signature": file_signature(key, filename, content_type, expires),
+    })
+    return f"{settings.API_V1_STR}/files/{quote(key)}?{query}"
+
+def verify_file_signature(key: str, filename: str, content_type: str, expires: int, signature: str) -> bool:
+    """Whether a signed file URL is authentic and not yet expired"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(file_signature(key, filename, content_type, expires), signature)
+
+def file_response(
+    key: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+    content_disposition_type: str = "attachment"
+) -> Response:
+    """Send a file under UPLOAD_DIR, or have the front proxy send it once the request is authorized"""
+    if settings.DOWNLOAD_OFFLOAD == X_ACCEL_REDIRECT:
+        # nginx maps this internal location onto UPLOAD_DIR and handles ranges and validators itself
+        headers = {"X-Accel-Redirect": f"{settings.DOWNLOAD_OFFLOAD_PREFIX.rstrip('/')}/{quote(key)}"}
+    elif settings.DOWNLOAD_OFFLOAD == X_SENDFILE:
+        headers = {"X-Sendfile": os.path.abspath(blob_store.path(key))}
+    else:
+        return RangeFileResponse(
+            path=blob_store.path(key),
+            filename=filename,
+            media_type=media_type,
+            etag=etag,
+            immutable=immutable,
+            content_disposition_type=content_disposition_type
+        )
+    
+    headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    if filename is not None:
+        headers["Content-Disposition"] = content_disposition(filename, content_disposition_type)
+    if etag is not None:
+        headers["ETag"] = etag
+    return Response(media_type=media_type, headers=headers)
@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+import asyncio
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool and its queue are full"""
+
+@lru_cache(maxsize=None)
+def password_context(rounds: int) -> CryptContext:
+    """Bcrypt context where hashes with a different cost are flagged for rehashing"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_desired_rounds=rounds,
+        bcrypt__max_desired_rounds=rounds,
+    )
+
+def hash_password(password: str, rounds: int) -> str:
+    """Hash a password, runs in a pool worker"""
+    return password_context(rounds).hash(password)
+
+def verify_and_update_password(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a new hash if the stored cost is outdated, runs in a pool worker"""
+    return password_context(rounds).verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """Runs bcrypt in a size-limited process pool so hashing never blocks the event loop"""
+    
+    def __init__(self, workers: int, max_queue: int, rounds: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def capacity(self) -> int:
+        """Operations allowed at once, running plus queued"""
+        return self.workers + self.max_queue
+    
+    async def _run(self, function, *args):
+        # Fail fast rather than queue behind a login burst
+        if self.in_flight >= self.capacity:
+            raise PasswordHasherBusy()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self.in_flight -= 1
+    
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured cost"""
+        return await self._run(hash_password, password, self.rounds)
+    
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password, returning a replacement hash when the cost parameters changed"""
+        return await self._run(verify_and_update_password, password, hashed_password, self.rounds)
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create a global password hasher instance
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    rounds=settings.BCRYPT_ROUNDS
+)
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any, Dict, Optional, Set, Tuple
+import time
+
+from app.core.config import settings
+
+class PrincipalCache:
+    """Bounded LRU cache of verified tokens -> user column values with a TTL, indexed by user id"""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # token hash -> (user_id, user column values, monotonic expiry, token ID)
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any], float, Optional[str]]]" = OrderedDict()
+        # user_id -> token hashes cached for that user
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+    
+    @staticmethod
+    def token_hash(token: str) -> str:
+        """Hash a token so raw bearer tokens are never held as keys"""
+        return sha256(token.encode()).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Get the cached user values for a token, or None if missing or expired"""
+        cached = self.lookup(token)
+        return cached[0] if cached is not None else None
+    
+    def lookup(self, token: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        """Get the cached user values and token ID, so callers can still check revocation"""
+        key = self.token_hash(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1], entry[3]
+    
+    def set(
+        self,
+        token: str,
+        user_id: Any,
+        values: Dict[str, Any],
+        token_expires_at: Optional[float] = None,
+        jti: Optional[str] = None
+    ):
+        """Cache a verified token's user, never beyond the token's own expiry"""
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        key = self.token_hash(token)
+        user_id = str(user_id)
+        self._remove(key)
+        self._entries[key] = (user_id, values, time.monotonic() + ttl, jti)
+        self._tokens_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+    
+    def invalidate_token(self, token: str):
+        """Drop a single cached token, e.g. after it is revoked"""
+        self._remove(self.token_hash(token))
+    
+    def invalidate_user(self, user_id: Any):
+        """Drop every cached token of a user, e.g. after an update, deletion or deactivation"""
+        for key in self._tokens_by_user.pop(str(user_id), set()):
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop all cached principals"""
+        self._entries.clear()
+        self._tokens_by_user.clear()
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._tokens_by_user.get(entry[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tokens_by_user[entry[0]]
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Create a global principal cache instance, per process, so keep the TTL short
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
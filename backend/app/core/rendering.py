@@ -0,0 +1,116 @@
+from functools import lru_cache
+from html import escape
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+import re
+import threading
+
+import markdown
+
+# Everything else Markdown could emit, and any HTML a user typed, is dropped or escaped
+ALLOWED_TAGS = {
+    "a", "b", "blockquote", "br", "code", "dd", "del", "dl", "dt", "em", "h1", "h2", "h3", "h4", "h5", "h6",
+    "hr", "i", "img", "li", "ol", "p", "pre", "strong", "table", "tbody", "td", "th", "thead", "tr", "ul",
+}
+ALLOWED_ATTRIBUTES: Dict[str, Set[str]] = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title"},
+    "code": {"class"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_SCHEMES = {"a": {"", "http", "https", "mailto"}, "img": {"", "http", "https"}}
+VOID_TAGS = {"br", "hr", "img"}
+# Their text is code, not content, so it goes with them
+DROP_CONTENT_TAGS = {"script", "style"}
+CODE_CLASS_PATTERN = re.compile(r"language-[\w+-]+")
+# Browsers ignore these inside a URL scheme, e.g. "java\tscript:"
+URL_IGNORED_CHARACTERS = re.compile(r"[\x00-\x20\x7f]+")
+
+class HTMLSanitizer(HTMLParser):
+    """Allowlist HTML sanitizer, rebuilds the document from parsed tags so nothing unexpected passes through"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output: List[str] = []
+        self.open_tags: List[str] = []
+        self.dropping = 0
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if tag not in ALLOWED_TAGS or self.dropping:
+            return
+        rendered = "".join(
+            f' {name}="{escape(value, quote=True)}"' for name, value in self.allowed_attributes(tag, attrs)
+        )
+        if tag == "a":
+            rendered += ' rel="nofollow noopener noreferrer"'
+        self.output.append(f"<{tag}{rendered}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+    
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in VOID_TAGS:
+            self.handle_starttag(tag, attrs)
+    
+    def handle_endtag(self, tag: str):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if tag not in self.open_tags or self.dropping:
+            return
+        # Close anything left open inside it, so the output is always well nested
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+    
+    def handle_data(self, data: str):
+        if not self.dropping:
+            self.output.append(escape(data, quote=False))
+    
+    def allowed_attributes(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, str]]:
+        """Attributes of a tag that are allowed, with URLs limited to safe schemes"""
+        allowed = []
+        for name, value in attrs:
+            if value is None or name not in ALLOWED_ATTRIBUTES.get(tag, ()):
+                continue
+            if name in URL_ATTRIBUTES:
+                scheme = urlsplit(URL_IGNORED_CHARACTERS.sub("", value)).scheme.lower()
+                if scheme not in ALLOWED_SCHEMES[tag]:
+                    continue
+            if name == "class" and not CODE_CLASS_PATTERN.fullmatch(value):
+                continue
+            allowed.append((name, value))
+        return allowed
+    
+    def result(self) -> str:
+        self.close()
+        return "".join(self.output) + "".join(f"</{tag}>" for tag in reversed(self.open_tags))
+
+def sanitize_html(html: str) -> str:
+    """Reduce HTML to the allowed tags, attributes and URL schemes"""
+    sanitizer = HTMLSanitizer()
+    sanitizer.feed(html)
+    return sanitizer.result()
+
+_local = threading.local()
+
+def _markdown() -> markdown.Markdown:
+    """A Markdown converter per thread, building one loads every extension"""
+    converter = getattr(_local, "converter", None)
+    if converter is None:
+        converter = markdown.Markdown(extensions=["fenced_code", "tables", "sane_lists"], output_format="html")
+        # Raw HTML in the source is shown as text rather than passed through
+        converter.preprocessors.deregister("html_block")
+        converter.inlinePatterns.deregister("html")
+        _local.converter = converter
+    return converter
+
+@lru_cache(maxsize=1024)
+def render_markdown(text: str) -> str:
+    """Render Markdown to sanitized HTML, cached by content for rows stored before rendering on write"""
+    return sanitize_html(_markdown().reset().convert(text))
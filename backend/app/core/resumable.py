@@ -0,0 +1,86 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import base64
+import binascii
+import fcntl
+import hashlib
+import os
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from app.core.blobs import UploadTooLarge
+
+class UploadBusy(Exception):
+    """Raised when another request is already writing to the same upload"""
+
+class ChecksumMismatch(Exception):
+    """Raised when a chunk does not match its Upload-Checksum header"""
+
+def parse_upload_checksum(header: str) -> bytes:
+    """Parse a tus Upload-Checksum header, "sha256 <base64 digest>", into the raw digest"""
+    algorithm, _, encoded = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise ValueError("Only sha256 checksums are supported")
+    try:
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except binascii.Error:
+        raise ValueError("Checksum is not valid base64")
+    if len(digest) != hashlib.sha256().digest_size:
+        raise ValueError("Checksum has the wrong length")
+    return digest
+
+def open_locked(path: str) -> int:
+    """Open a partial upload for writing, holding an exclusive lock across processes"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        raise UploadBusy()
+    return fd
+
+@asynccontextmanager
+async def locked_partial_upload(path: str) -> AsyncIterator[int]:
+    """Hold a partial upload's lock, read the session offset only after entering"""
+    fd = await run_in_threadpool(open_locked, path)
+    try:
+        yield fd
+    finally:
+        # Closing releases the lock
+        await run_in_threadpool(os.close, fd)
+
+async def write_chunk(
+    fd: int,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    max_offset: int,
+    checksum: Optional[bytes] = None
+) -> int:
+    """Append a request body at offset as it streams in, returning the new offset"""
+    # Drop bytes past the recorded offset, left by a write whose offset was never committed
+    await run_in_threadpool(os.ftruncate, fd, offset)
+    digest = hashlib.sha256()
+    position = offset
+    try:
+        async for data in chunks:
+            if not data:
+                continue
+            if position + len(data) > max_offset:
+                raise UploadTooLarge()
+            digest.update(data)
+            await run_in_threadpool(os.pwrite, fd, data, position)
+            position += len(data)
+        if checksum is not None and digest.digest() != checksum:
+            raise ChecksumMismatch()
+    except ClientDisconnect:
+        # Without a checksum every received byte is good, so the client resumes from here
+        if checksum is not None:
+            await run_in_threadpool(os.ftruncate, fd, offset)
+            raise
+    except BaseException:
+        await run_in_threadpool(os.ftruncate, fd, offset)
+        raise
+    await run_in_threadpool(os.fsync, fd)
+    return position
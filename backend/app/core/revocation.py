@@ -0,0 +1,123 @@
+from hashlib import blake2b
+from typing import AsyncContextManager, Callable, Dict, Iterable, Optional
+import asyncio
+import logging
+import math
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import TOKEN_REVOCATION_CHECKS
+from app.crud.token_crud import get_unexpired_revoked_jtis, is_token_revoked, revoke_token
+from app.db.database import primary_session
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, no false negatives and a bounded false positive rate"""
+    
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing, k positions from the two halves of one digest
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+    
+    def add(self, item: str):
+        """Add an item to the filter"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, item: str) -> bool:
+        """Whether an item was probably added, False is always exact"""
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+# A revocation is seen at once by the process that made it and by other processes on their next
+# rebuild, so those accept a revoked token for up to refresh_seconds plus the time a rebuild takes.
+# Cached principals are checked against the same filter, so the principal cache adds no delay.
+class RevocationStore:
+    """Token revocations in the database, fronted by a per-process Bloom filter"""
+    
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        refresh_seconds: float,
+        session_factory: Callable[[], AsyncContextManager[AsyncSession]]
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        # Sessions pinned to the primary, a lagging replica would miss fresh revocations
+        self.session_factory = session_factory
+        self._filter = BloomFilter(capacity, error_rate)
+        self._built_at: Optional[float] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        # Revocations made by this process, re-added on rebuild in case the read lags the write
+        self._local_revocations: Dict[str, float] = {}
+    
+    async def rebuild(self):
+        """Rebuild the filter from unexpired revocations, picking up other processes' revocations"""
+        async with self.session_factory() as db:
+            jtis = await get_unexpired_revoked_jtis(db)
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        cutoff = time.monotonic() - 2 * self.refresh_seconds
+        self._local_revocations = {
+            jti: revoked_at for jti, revoked_at in self._local_revocations.items() if revoked_at > cutoff
+        }
+        for jti in self._local_revocations:
+            bloom.add(jti)
+        self._filter = bloom
+        self._built_at = time.monotonic()
+    
+    def refresh(self) -> asyncio.Task:
+        """Start a rebuild in the background unless one is running, callers share the one in flight"""
+        if self._rebuild_task is None or self._rebuild_task.done():
+            self._rebuild_task = asyncio.ensure_future(self.rebuild())
+            self._rebuild_task.add_done_callback(log_rebuild_failure)
+        return self._rebuild_task
+    
+    async def is_revoked(self, jti: str) -> bool:
+        """Check a token ID, answering from memory unless the filter reports a probable hit"""
+        if self._built_at is None:
+            # Nothing to answer from yet, wait for the single rebuild, shielded from this request's cancellation
+            await asyncio.shield(self.refresh())
+        elif time.monotonic() - self._built_at >= self.refresh_seconds:
+            # Keep answering from the current filter while a fresh one is built
+            self.refresh()
+        if jti not in self._filter:
+            TOKEN_REVOCATION_CHECKS.labels(result="filter_miss").inc()
+            return False
+        async with self.session_factory() as db:
+            revoked = await is_token_revoked(db, jti)
+        TOKEN_REVOCATION_CHECKS.labels(result="revoked" if revoked else "false_positive").inc()
+        return revoked
+    
+    async def revoke(self, db: AsyncSession, jti: str, expires_at, user_id: Optional[int] = None) -> bool:
+        """Revoke a token ID, visible to this process immediately and to others on their next rebuild"""
+        revoked = await revoke_token(db, jti=jti, expires_at=expires_at, user_id=user_id)
+        self._filter.add(jti)
+        self._local_revocations[jti] = time.monotonic()
+        return revoked
+
+def log_rebuild_failure(task: asyncio.Task):
+    """Log a failed background rebuild, the stale filter keeps serving until the next one"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Rebuilding the token revocation filter failed: {task.exception()}")
+
+# Create a global revocation store instance
+revocation_store = RevocationStore(
+    capacity=settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+    refresh_seconds=settings.TOKEN_REVOCATION_REFRESH_SECONDS,
+    session_factory=primary_session
+)
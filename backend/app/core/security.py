@@ -1,18 +1,25 @@
 from datetime import datetime, timedelta
 from typing import Any, Optional, Union
+import uuid
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from app.core.config import settings
-from app.db.database import get_db
+from app.core.passwords import password_context
+from app.core.principals import principal_cache
+from app.core.revocation import revocation_store
+from app.crud.statements import user_by_id
+from app.db.database import get_db, recent_writes
+from app.db.routing import bind_session_user
 from app.models.user import User, UserRole
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing, the API uses app.core.passwords.password_hasher to keep bcrypt off the event loop
+pwd_context = password_context(settings.BCRYPT_ROUNDS)
 
 # OAuth2 token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
@@ -29,7 +36,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     """Create a JWT access token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -37,7 +44,7 @@ def create_refresh_token(data: dict) -> str:
     """Create a JWT refresh token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -52,13 +59,25 @@ def decode_jwt_token(token: str) -> dict:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
     """Get current user from JWT token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # A cached token was verified within its lifetime, so authorize without decoding or a query
+    cached = principal_cache.lookup(token)
+    if cached is not None:
+        values, jti = cached
+        # Logout only evicts the token from its own process, so every hit is checked against the in-memory filter
+        if jti and await revocation_store.is_revoked(jti):
+            principal_cache.invalidate_token(token)
+            raise credentials_exception
+        bind_session_user(db.info, values["id"], recent_writes)
+        return await attach_cached_user(db, values)
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
@@ -67,11 +86,28 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    bind_session_user(db.info, user_id, recent_writes)
+    # Tokens issued before jti was added cannot be revoked, they expire within ACCESS_TOKEN_EXPIRE_MINUTES
+    if payload.get("jti") and await revocation_store.is_revoked(payload["jti"]):
+        raise credentials_exception
+    user = await db.scalar(user_by_id(), {"user_id": int(user_id)})
     if user is None:
         raise credentials_exception
+    principal_cache.set(
+        token, user.id, user_column_values(user), token_expires_at=payload.get("exp"), jti=payload.get("jti")
+    )
     return user
 
+def user_column_values(user: User) -> dict:
+    """Copy a user's column attributes for the principal cache"""
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+async def attach_cached_user(db: AsyncSession, values: dict) -> User:
+    """Rebuild a cached user as a persistent object in this session without a query"""
+    user = User(**values)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user"""
     if not current_user.is_active:
@@ -0,0 +1,420 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncContextManager, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import tempfile
+
+import httpx
+
+from app.core.blobs import QUARANTINE_DIR, StagedUpload, blob_key, blob_store
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+# Tag on objects PUT straight by clients until an attachment claims them, a bucket lifecycle rule expires the rest
+PENDING_UPLOAD_TAG = "pending=true"
+
+class StorageError(Exception):
+    """Raised when the storage backend rejects or fails an operation"""
+
+class PresignedRequest(dict):
+    """A presigned request a client sends straight to storage: method, url and headers"""
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+def sigv4_signature(
+    method: str,
+    url: str,
+    query: List[Tuple[str, str]],
+    headers: Dict[str, str],
+    payload_hash: str,
+    timestamp: datetime,
+    region: str,
+    secret_key: str
+) -> Tuple[str, str]:
+    """AWS Signature Version 4 for S3, returns the signature and the signed header list"""
+    parts = urlsplit(url)
+    headers = {name.lower(): " ".join(value.split()) for name, value in headers.items()}
+    headers.setdefault("host", parts.netloc)
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join((
+        method,
+        _uri_encode(parts.path or "/", safe="/-_.~"),
+        "&".join(f"{_uri_encode(name)}={_uri_encode(value)}" for name, value in sorted(query)),
+        "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+        signed_headers,
+        payload_hash,
+    ))
+    date = timestamp.strftime("%Y%m%d")
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join((
+        "AWS4-HMAC-SHA256",
+        timestamp.strftime("%Y%m%dT%H%M%SZ"),
+        scope,
+        hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ))
+    signing_key = _hmac(_hmac(_hmac(_hmac(f"AWS4{secret_key}".encode(), date), region), "s3"), "aws4_request")
+    return hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest(), signed_headers
+
+def presign_url(
+    method: str,
+    url: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    expires_seconds: int,
+    headers: Optional[Dict[str, str]] = None,
+    query: Optional[Dict[str, str]] = None,
+    timestamp: Optional[datetime] = None
+) -> str:
+    """Presign an S3 URL with query-string SigV4, headers given here must be sent unchanged"""
+    timestamp = timestamp or datetime.utcnow()
+    headers = headers or {}
+    params = dict(query or {})
+    params.update({
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": f"{access_key}/{timestamp:%Y%m%d}/{region}/s3/aws4_request",
+        "X-Amz-Date": timestamp.strftime("%Y%m%dT%H%M%SZ"),
+        "X-Amz-Expires": str(expires_seconds),
+        "X-Amz-SignedHeaders": ";".join(sorted({"host", *(name.lower() for name in headers)})),
+    })
+    signature, _ = sigv4_signature(
+        method, url, list(params.items()), headers, UNSIGNED_PAYLOAD, timestamp, region, secret_key
+    )
+    params["X-Amz-Signature"] = signature
+    return url + "?" + "&".join(f"{_uri_encode(name)}={_uri_encode(value)}" for name, value in sorted(params.items()))
+
+def content_disposition(filename: str, disposition_type: str = "attachment") -> str:
+    """Content-Disposition value for a download, RFC 5987 encoded when not plain ASCII"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition_type}; filename*=utf-8''{quoted}"
+    return f'{disposition_type}; filename="{filename}"'
+
+async def read_file_chunks(path: str, chunk_size: int) -> AsyncIterator[bytes]:
+    """Read a local file in chunks on a worker thread"""
+    source = await asyncio.to_thread(open, path, "rb")
+    try:
+        while chunk := await asyncio.to_thread(source.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(source.close)
+
+class StorageBackend:
+    """Where attachment blobs live, staging and thumbnails always stay on local disk"""
+    
+    # Whether clients can move bytes to and from storage without passing through the API
+    supports_presigned_urls = False
+    
+    async def store(self, staged: StagedUpload) -> str:
+        """Move a staged upload to its content address and return the key"""
+        raise NotImplementedError
+    
+    async def size(self, key: str) -> Optional[int]:
+        """Size of a stored file, None if it does not exist"""
+        raise NotImplementedError
+    
+    async def delete(self, keys: Iterable[str]):
+        """Delete stored files, missing ones are ignored"""
+        raise NotImplementedError
+    
+    async def release(self, keys: Iterable[str]):
+        """Get rid of blobs whose last reference is gone"""
+        await self.delete(keys)
+    
+    async def restore(self, key: str) -> bool:
+        """Bring back a released blob that is referenced again, returns False when it is gone"""
+        return False
+    
+    def iter_chunks(self, key: str, chunk_size: int) -> AsyncIterator[bytes]:
+        """Stream a stored file without holding more than a chunk in memory"""
+        raise NotImplementedError
+    
+    def local_copy(self, key: str) -> AsyncContextManager[str]:
+        """A local file with the stored content, e.g. to render thumbnails"""
+        raise NotImplementedError
+    
+    def presigned_download(self, key: str, filename: str, content_type: str) -> Optional[str]:
+        """URL downloading a file straight from storage, None when unsupported"""
+        return None
+    
+    def presigned_upload(self, sha256: str, size: int, content_type: str) -> Optional[PresignedRequest]:
+        """Request uploading a blob straight to storage, bound to its hash and size, None when unsupported"""
+        return None
+    
+    async def claim_upload(self, key: str):
+        """Keep a blob uploaded through a presigned request, before an attachment refers to it"""
+    
+    async def close(self):
+        """Release connections"""
+
+class LocalStorage(StorageBackend):
+    """Blobs in UPLOAD_DIR, served by the API"""
+    
+    async def store(self, staged: StagedUpload) -> str:
+        return await asyncio.to_thread(blob_store.commit, staged)
+    
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(os.stat, blob_store.path(key))).st_size
+        except FileNotFoundError:
+            return None
+    
+    async def delete(self, keys: Iterable[str]):
+        await asyncio.to_thread(blob_store.remove, list(keys))
+    
+    async def release(self, keys: Iterable[str]):
+        # Quarantine rather than unlink, orphan collection restores a blob an upload of the same content took back
+        await asyncio.to_thread(blob_store.quarantine_all, list(keys))
+    
+    async def restore(self, key: str) -> bool:
+        if os.path.exists(os.path.join(blob_store.root, QUARANTINE_DIR, key)):
+            await asyncio.to_thread(blob_store.restore, key)
+        return await self.size(key) is not None
+    
+    def iter_chunks(self, key: str, chunk_size: int) -> AsyncIterator[bytes]:
+        return read_file_chunks(blob_store.path(key), chunk_size)
+    
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        yield blob_store.path(key)
+
+class S3Storage(StorageBackend):
+    """Blobs in an S3-compatible bucket, clients transfer them with presigned URLs"""
+    
+    supports_presigned_urls = True
+    
+    def __init__(
+        self,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        endpoint_url: Optional[str] = None,
+        public_endpoint_url: Optional[str] = None,
+        presign_expire_seconds: int = 900,
+        chunk_size: int = 1024 * 1024,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.endpoint_url = endpoint_url
+        # Presigned URLs sign the host, so they must name the one clients can reach
+        self.public_endpoint_url = public_endpoint_url or endpoint_url
+        self.presign_expire_seconds = presign_expire_seconds
+        self.chunk_size = chunk_size
+        self._client = client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+        return self._client
+    
+    def object_url(self, key: str, public: bool = False) -> str:
+        """URL of an object, path-style for custom endpoints such as MinIO"""
+        endpoint = self.public_endpoint_url if public else self.endpoint_url
+        if endpoint:
+            return f"{endpoint.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+    
+    def sign(
+        self,
+        method: str,
+        key: str,
+        payload_hash: str = UNSIGNED_PAYLOAD,
+        headers: Optional[Dict[str, str]] = None,
+        query: Optional[Dict[str, str]] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        """URL and Authorization-signed headers of a request for an object"""
+        url = self.object_url(key)
+        query = query or {}
+        timestamp = datetime.utcnow()
+        headers = {
+            **(headers or {}),
+            "x-amz-date": timestamp.strftime("%Y%m%dT%H%M%SZ"),
+            "x-amz-content-sha256": payload_hash,
+        }
+        signature, signed_headers = sigv4_signature(
+            method, url, list(query.items()), headers, payload_hash, timestamp, self.region, self.secret_key
+        )
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{timestamp:%Y%m%d}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        if query:
+            url += "?" + "&".join(f"{_uri_encode(name)}={_uri_encode(value)}" for name, value in sorted(query.items()))
+        return url, headers
+    
+    async def request(
+        self,
+        method: str,
+        key: str,
+        payload_hash: str = UNSIGNED_PAYLOAD,
+        headers: Optional[Dict[str, str]] = None,
+        query: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a signed request for an object"""
+        url, headers = self.sign(method, key, payload_hash, headers, query)
+        try:
+            return await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            raise StorageError(f"{method} {key} failed: {e}")
+    
+    async def store(self, staged: StagedUpload) -> str:
+        key = blob_key(staged.sha256)
+        # The content hash doubles as the signed payload hash, so S3 verifies what it received
+        response = await self.request(
+            "PUT",
+            key,
+            payload_hash=staged.sha256,
+            headers={"content-length": str(staged.size)},
+            content=read_file_chunks(staged.temp_path, self.chunk_size)
+        )
+        if response.status_code != 200:
+            raise StorageError(f"PUT {key} returned {response.status_code}")
+        await asyncio.to_thread(blob_store.discard, staged.temp_path)
+        return key
+    
+    async def size(self, key: str) -> Optional[int]:
+        response = await self.request("HEAD", key)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise StorageError(f"HEAD {key} returned {response.status_code}")
+        return int(response.headers["content-length"])
+    
+    async def delete(self, keys: Iterable[str]):
+        for key in keys:
+            try:
+                response = await self.request("DELETE", key)
+            except StorageError as e:
+                logger.warning(str(e))
+                continue
+            if response.status_code not in (200, 204, 404):
+                logger.warning(f"DELETE {key} returned {response.status_code}")
+    
+    async def copy(self, source: str, key: str) -> bool:
+        """Copy an object within the bucket, returns False when the source does not exist"""
+        response = await self.request("PUT", key, headers={"x-amz-copy-source": quote(f"/{self.bucket}/{source}")})
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise StorageError(f"PUT {key} copying {source} returned {response.status_code}")
+        return True
+    
+    async def release(self, keys: Iterable[str]):
+        # Quarantine rather than delete, an upload of the same content may take the blob back meanwhile,
+        # a bucket lifecycle rule expires the quarantine
+        for key in keys:
+            try:
+                if await self.copy(key, f"{QUARANTINE_DIR}/{key}"):
+                    await self.delete([key])
+            except StorageError as e:
+                logger.warning(str(e))
+    
+    async def restore(self, key: str) -> bool:
+        quarantined = f"{QUARANTINE_DIR}/{key}"
+        if not await self.copy(quarantined, key):
+            return await self.size(key) is not None
+        await self.delete([quarantined])
+        return True
+    
+    async def iter_chunks(self, key: str, chunk_size: int) -> AsyncIterator[bytes]:
+        url, headers = self.sign("GET", key)
+        try:
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code != 200:
+                    raise StorageError(f"GET {key} returned {response.status_code}")
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+        except httpx.HTTPError as e:
+            raise StorageError(f"GET {key} failed: {e}")
+    
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        fd, temp_path = tempfile.mkstemp(dir=blob_store.staging_dir(), prefix="download-", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                async for chunk in self.iter_chunks(key, self.chunk_size):
+                    await asyncio.to_thread(target.write, chunk)
+            yield temp_path
+        finally:
+            await asyncio.to_thread(blob_store.discard, temp_path)
+    
+    def presigned_download(self, key: str, filename: str, content_type: str) -> Optional[str]:
+        return presign_url(
+            "GET",
+            self.object_url(key, public=True),
+            self.access_key,
+            self.secret_key,
+            self.region,
+            self.presign_expire_seconds,
+            query={
+                "response-content-disposition": content_disposition(filename),
+                "response-content-type": content_type,
+            }
+        )
+    
+    def presigned_upload(self, sha256: str, size: int, content_type: str) -> Optional[PresignedRequest]:
+        # Signing the checksum and length makes S3 reject any other content under this key
+        headers = {
+            "content-length": str(size),
+            "content-type": content_type,
+            "x-amz-checksum-sha256": base64.b64encode(bytes.fromhex(sha256)).decode(),
+            # Uploads never completed expire through the bucket's lifecycle rule for this tag
+            "x-amz-tagging": PENDING_UPLOAD_TAG,
+        }
+        url = presign_url(
+            "PUT",
+            self.object_url(blob_key(sha256), public=True),
+            self.access_key,
+            self.secret_key,
+            self.region,
+            self.presign_expire_seconds,
+            headers=headers
+        )
+        return PresignedRequest(method="PUT", url=url, headers=headers)
+    
+    async def claim_upload(self, key: str):
+        # Untag before the attachment is committed, a referenced object must never be left to expire
+        response = await self.request("DELETE", key, query={"tagging": ""})
+        if response.status_code not in (200, 204):
+            raise StorageError(f"DELETE {key}?tagging returned {response.status_code}")
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def create_storage_backend() -> StorageBackend:
+    """Build the backend chosen by STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY_ID,
+            secret_key=settings.S3_SECRET_ACCESS_KEY,
+            region=settings.S3_REGION,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            public_endpoint_url=settings.S3_PUBLIC_ENDPOINT_URL,
+            presign_expire_seconds=settings.PRESIGNED_URL_EXPIRE_SECONDS,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE
+        )
+    return LocalStorage()
+
+# Create a global storage backend instance
+storage = create_storage_backend()
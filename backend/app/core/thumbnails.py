@@ -0,0 +1,136 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set
+import asyncio
+import logging
+import os
+
+from PIL import Image, ImageOps
+
+from app.core.blobs import blob_store, thumbnail_key
+from app.core.config import settings
+from app.core.storage import StorageError, storage
+from app.models.attachment import THUMBNAIL_CONTENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_MEDIA_TYPE = "image/webp"
+
+class ThumbnailerBusy(Exception):
+    """Raised when the thumbnail pool and its queue are full"""
+
+class ThumbnailFailed(Exception):
+    """Raised when an attachment cannot be decoded as an image"""
+
+def render_thumbnails(source_path: str, destinations: Dict[int, str], max_pixels: int) -> List[int]:
+    """Render every thumbnail size from one decode of the source image, runs in a pool worker"""
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(source_path) as image:
+        # JPEG can decode at a fraction of full size, much cheaper for large photos
+        image.draft("RGB", (max(destinations), max(destinations)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        # Largest first, so each smaller size is scaled down from the previous one
+        for size in sorted(destinations, reverse=True):
+            image.thumbnail((size, size))
+            destination = destinations[size]
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            temp_path = f"{destination}.{os.getpid()}.part"
+            image.save(temp_path, THUMBNAIL_FORMAT, quality=80, method=4)
+            os.replace(temp_path, destination)
+    return sorted(destinations)
+
+class ThumbnailGenerator:
+    """Renders thumbnails of image blobs in a size-limited process pool, cached on disk by blob hash"""
+    
+    def __init__(self, sizes: List[int], workers: int, max_queue: int, max_pixels: int):
+        self.sizes = sorted(sizes)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_pixels = max_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Renders in progress by blob hash, so concurrent requests share one render
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Blobs that failed to decode, not retried by this process
+        self._failed: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+    
+    @staticmethod
+    def supports(content_type: Optional[str]) -> bool:
+        """Whether attachments of a MIME type get thumbnails"""
+        return content_type in THUMBNAIL_CONTENT_TYPES
+    
+    def path(self, sha256: str, size: int) -> str:
+        """Filesystem path of a cached thumbnail"""
+        return blob_store.path(thumbnail_key(sha256, size))
+    
+    async def get(self, sha256: str, key: str, size: int) -> str:
+        """Path of a thumbnail, rendering every size on the first request"""
+        path = self.path(sha256, size)
+        if not await asyncio.to_thread(os.path.exists, path):
+            await self.generate(sha256, key)
+        return path
+    
+    async def render(self, sha256: str, key: str):
+        """Render from a local copy of the stored blob in the pool"""
+        destinations = {size: self.path(sha256, size) for size in self.sizes}
+        async with storage.local_copy(key) as source_path:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, render_thumbnails, source_path, destinations, self.max_pixels
+            )
+    
+    async def generate(self, sha256: str, key: str):
+        """Render all sizes of a blob's thumbnails, joining a render already in progress"""
+        if sha256 in self._failed:
+            raise ThumbnailFailed()
+        future = self._in_flight.get(sha256)
+        if future is None:
+            # Fail fast rather than queue behind an upload burst
+            if len(self._in_flight) >= self.workers + self.max_queue:
+                raise ThumbnailerBusy()
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = asyncio.ensure_future(self.render(sha256, key))
+            self._in_flight[sha256] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(sha256, None))
+        try:
+            await asyncio.shield(future)
+        except StorageError as e:
+            # Not the image's fault, so a later request may retry
+            logger.warning(f"Could not fetch blob {sha256} for thumbnails: {e}")
+            raise ThumbnailFailed()
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            if len(self._failed) >= 10000:
+                self._failed.clear()
+            self._failed.add(sha256)
+            logger.warning(f"Could not render thumbnails for blob {sha256}: {e}")
+            raise ThumbnailFailed()
+    
+    def schedule(self, sha256: Optional[str], key: str, content_type: Optional[str]):
+        """Precompute thumbnails after an upload, skipped when the pool is busy since they render lazily"""
+        if not sha256 or not self.supports(content_type):
+            return
+        
+        async def run():
+            try:
+                await self.generate(sha256, key)
+            except (ThumbnailerBusy, ThumbnailFailed):
+                pass
+        
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create a global thumbnail generator instance
+thumbnail_generator = ThumbnailGenerator(
+    sizes=settings.THUMBNAIL_SIZES,
+    workers=settings.THUMBNAIL_WORKERS,
+    max_queue=settings.THUMBNAIL_MAX_QUEUE,
+    max_pixels=settings.THUMBNAIL_MAX_PIXELS
+)
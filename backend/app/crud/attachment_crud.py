@@ -1,82 +1,102 @@
-import os
-import uuid
-from typing import List, Optional, Tuple, BinaryIO
+from typing import List, NamedTuple, Optional, Tuple
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 
+from app.core.blobs import StagedUpload, blob_key, blob_store
+from app.core.storage import storage
+from app.crud.blob_crud import acquire_blob
+from app.crud.statements import attachment_by_id
 from app.models.attachment import Attachment
 from app.models.user import User, UserRole
 from app.core.config import settings
 from app.schemas.attachment import AttachmentCreate
 
-async def save_upload_file(upload_file: UploadFile, issue_id: int) -> str:
-    """Save uploaded file to disk and return file path"""
-    # Create issue directory if it doesn't exist
-    issue_dir = os.path.join(settings.UPLOAD_DIR, f"issue_{issue_id}")
-    os.makedirs(issue_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(upload_file.filename)[1] if upload_file.filename else ""
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(issue_dir, unique_filename)
-    
-    # Save file
-    with open(file_path, "wb") as f:
-        content = await upload_file.read()
-        f.write(content)
+class StoredUpload(NamedTuple):
+    """An upload stored in the blob store"""
+    file_path: str  # Blob key, relative to UPLOAD_DIR or the bucket
+    size: int
+    sha256: str
+
+async def save_upload_file(db: AsyncSession, upload_file: UploadFile) -> StoredUpload:
+    """Stream an uploaded file into the blob store and reference it in the current transaction"""
+    # upload_file.size comes from the client and may be missing, so count the bytes actually written
+    staged = await run_in_threadpool(
+        blob_store.stage, upload_file.file, settings.MAX_UPLOAD_SIZE, settings.UPLOAD_CHUNK_SIZE
+    )
+    return await store_staged_upload(db, staged)
+
+async def store_staged_upload(db: AsyncSession, staged: StagedUpload) -> StoredUpload:
+    """Move a staged upload into storage and reference it in the current transaction"""
+    try:
+        is_new = await acquire_blob(db, sha256=staged.sha256, size=staged.size)
+    except BaseException:
+        await run_in_threadpool(blob_store.discard, staged.temp_path)
+        raise
     
-    # Return relative path for storage in database
-    return os.path.join(f"issue_{issue_id}", unique_filename)
+    # Duplicate content costs a metadata row and no extra disk
+    if is_new:
+        try:
+            file_path = await storage.store(staged)
+        except BaseException:
+            await run_in_threadpool(blob_store.discard, staged.temp_path)
+            raise
+    else:
+        await run_in_threadpool(blob_store.discard, staged.temp_path)
+        file_path = blob_key(staged.sha256)
+    return StoredUpload(file_path=file_path, size=staged.size, sha256=staged.sha256)
 
-def get_attachment(db: Session, attachment_id: int) -> Optional[Attachment]:
+async def get_attachment(db: AsyncSession, attachment_id: int) -> Optional[Attachment]:
     """Get attachment by ID with uploader data"""
-    return db.query(Attachment).options(joinedload(Attachment.uploader)).filter(Attachment.id == attachment_id).first()
+    result = await db.execute(attachment_by_id(), {"attachment_id": attachment_id})
+    return result.scalars().first()
 
-def get_attachments_by_issue(
-    db: Session, 
+async def get_attachments_by_issue(
+    db: AsyncSession, 
     issue_id: int, 
     skip: int = 0, 
     limit: int = 100
 ) -> Tuple[List[Attachment], int]:
     """Get attachments for an issue with pagination"""
-    query = db.query(Attachment).options(joinedload(Attachment.uploader)).filter(Attachment.issue_id == issue_id)
+    query = select(Attachment).filter(Attachment.issue_id == issue_id)
     
     # Get total count for pagination
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
     # Apply pagination
-    attachments = query.order_by(Attachment.created_at.desc()).offset(skip).limit(limit).all()
+    result = await db.execute(
+        query.options(joinedload(Attachment.uploader)).order_by(Attachment.created_at.desc()).offset(skip).limit(limit)
+    )
+    attachments = result.scalars().all()
     
     return attachments, total
 
-def create_attachment(db: Session, attachment_in: AttachmentCreate, uploader_id: int) -> Attachment:
+async def create_attachment(db: AsyncSession, attachment_in: AttachmentCreate, uploader_id: int) -> Attachment:
     """Create new attachment record"""
     db_attachment = Attachment(
         filename=attachment_in.filename,
         file_path=attachment_in.file_path,
         content_type=attachment_in.content_type,
         size=attachment_in.size,
+        sha256=attachment_in.sha256,
         issue_id=attachment_in.issue_id,
         uploader_id=uploader_id
     )
     db.add(db_attachment)
-    db.commit()
-    db.refresh(db_attachment)
-    return db_attachment
+    await db.commit()
+    # Reload with the uploader, async sessions cannot lazy load it later
+    return await get_attachment(db, attachment_id=db_attachment.id)
 
-def delete_attachment(db: Session, attachment_id: int) -> Optional[Attachment]:
-    """Delete attachment and file"""
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+async def delete_attachment(db: AsyncSession, attachment_id: int) -> Optional[Attachment]:
+    """Delete attachment, its file is removed on commit once nothing else references it"""
+    attachment = await db.get(Attachment, attachment_id)
     if attachment:
-        # Delete file from disk
-        file_path = os.path.join(settings.UPLOAD_DIR, attachment.file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
         # Delete record from database
-        db.delete(attachment)
-        db.commit()
+        await db.delete(attachment)
+        await db.commit()
     return attachment
 
 def can_modify_attachment(attachment: Attachment, user: User) -> bool:
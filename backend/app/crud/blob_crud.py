@@ -0,0 +1,93 @@
+from typing import List
+import asyncio
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.blobs import blob_key, blob_store, is_blob_key, thumbnail_key
+from app.core.config import settings
+from app.core.storage import storage
+from app.db.database import primary_session
+from app.models.attachment import Attachment
+from app.models.blob import Blob
+
+# Session.info keys of blobs, and of thumbnails and legacy files on local disk, released in the current transaction
+RELEASED_BLOBS_KEY = "released_blobs"
+RELEASED_LOCAL_FILES_KEY = "released_local_files"
+# Deletions in flight, held so they are not garbage collected before they finish
+_pending_deletes = set()
+
+async def acquire_blob(db: AsyncSession, sha256: str, size: int) -> bool:
+    """Add a reference to a blob in the current transaction, returns True if the blob is new"""
+    result = await db.execute(
+        update(Blob).filter(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + 1)
+    )
+    if result.rowcount:
+        return False
+    try:
+        async with db.begin_nested():
+            db.add(Blob(sha256=sha256, size=size, ref_count=1))
+    except IntegrityError:
+        # A concurrent upload of the same content created it first
+        await db.execute(update(Blob).filter(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + 1))
+        return False
+    return True
+
+@event.listens_for(Session, "after_flush")
+def release_deleted_blobs(session, flush_context):
+    """Drop a reference for each deleted attachment, including ones deleted by cascade with their issue"""
+    for obj in session.deleted:
+        if not isinstance(obj, Attachment):
+            continue
+        if not is_blob_key(obj.file_path):
+            # Files stored before the blob store belong to a single attachment
+            session.info.setdefault(RELEASED_LOCAL_FILES_KEY, set()).add(obj.file_path)
+            continue
+        if not obj.sha256:
+            continue
+        session.execute(update(Blob).filter(Blob.sha256 == obj.sha256).values(ref_count=Blob.ref_count - 1))
+        result = session.execute(delete(Blob).filter(Blob.sha256 == obj.sha256, Blob.ref_count <= 0))
+        if result.rowcount:
+            session.info.setdefault(RELEASED_BLOBS_KEY, set()).add(blob_key(obj.sha256))
+            # Derived thumbnails go with the blob, they are always on local disk
+            session.info.setdefault(RELEASED_LOCAL_FILES_KEY, set()).update(
+                thumbnail_key(obj.sha256, size) for size in settings.THUMBNAIL_SIZES
+            )
+
+async def release_blobs(keys: List[str]):
+    """Release blobs whose last reference was deleted, skipping any that an upload of the same content took back"""
+    if not keys:
+        return
+    shas = {key: key.rsplit("/", 1)[1] for key in keys}
+    async with primary_session() as db:
+        live = set((await db.execute(select(Blob.sha256).filter(Blob.sha256.in_(list(shas.values()))))).scalars())
+    # An upload still in flight is invisible here, the storage quarantine covers that window
+    await storage.release([key for key, sha256 in shas.items() if sha256 not in live])
+
+@event.listens_for(Session, "after_commit")
+def remove_released_blobs(session):
+    """Remove blobs without references once the deletion is committed"""
+    keys = list(session.info.pop(RELEASED_BLOBS_KEY, ()))
+    local_files = list(session.info.pop(RELEASED_LOCAL_FILES_KEY, ()))
+    if not keys and not local_files:
+        return
+    # Deleting blocks on disk or network, so keep it off the event loop when there is one
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Scripts without an event loop skip the re-check
+        blob_store.remove(local_files)
+        asyncio.run(storage.release(keys))
+    else:
+        loop.run_in_executor(None, blob_store.remove, local_files)
+        task = loop.create_task(release_blobs(keys))
+        _pending_deletes.add(task)
+        task.add_done_callback(_pending_deletes.discard)
+
+@event.listens_for(Session, "after_rollback")
+def forget_released_blobs(session):
+    """Keep blobs whose release was rolled back"""
+    session.info.pop(RELEASED_BLOBS_KEY, None)
+    session.info.pop(RELEASED_LOCAL_FILES_KEY, None)
@@ -1,35 +1,43 @@
 from typing import List, Optional, Tuple
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, undefer
+from sqlalchemy import func, select
 
+from app.crud.statements import comment_by_id
 from app.models.comment import Comment
 from app.models.user import User, UserRole
 from app.schemas.comment import CommentCreate, CommentUpdate
 
-def get_comment(db: Session, comment_id: int) -> Optional[Comment]:
+async def get_comment(db: AsyncSession, comment_id: int, with_html: bool = False) -> Optional[Comment]:
     """Get comment by ID with user data"""
-    return db.query(Comment).options(joinedload(Comment.user)).filter(Comment.id == comment_id).first()
+    result = await db.execute(comment_by_id(with_html), {"comment_id": comment_id})
+    return result.scalars().first()
 
-def get_comments_by_issue(
-    db: Session, 
-    issue_id: int, 
-    skip: int = 0, 
+async def get_comments_by_issue(
+    db: AsyncSession,
+    issue_id: int,
+    skip: int = 0,
     limit: int = 100,
-    current_user: Optional[User] = None
+    current_user: Optional[User] = None,
+    with_html: bool = False
 ) -> Tuple[List[Comment], int]:
     """Get comments for an issue with pagination"""
-    query = db.query(Comment).options(joinedload(Comment.user)).filter(Comment.issue_id == issue_id)
+    query = select(Comment).filter(Comment.issue_id == issue_id)
     
     # Get total count for pagination
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
     # Apply pagination
-    comments = query.order_by(Comment.created_at.asc()).offset(skip).limit(limit).all()
+    query = query.options(joinedload(Comment.user))
+    if with_html:
+        query = query.options(undefer(Comment.rendered_content))
+    result = await db.execute(query.order_by(Comment.created_at.asc()).offset(skip).limit(limit))
+    comments = result.scalars().all()
     
     return comments, total
 
-def create_comment(db: Session, comment_in: CommentCreate, user_id: int) -> Comment:
+async def create_comment(db: AsyncSession, comment_in: CommentCreate, user_id: int) -> Comment:
     """Create new comment"""
     db_comment = Comment(
         content=comment_in.content,
@@ -37,27 +45,26 @@ def create_comment(db: Session, comment_in: CommentCreate, user_id: int) -> Comm
         user_id=user_id
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
-    return db_comment
+    await db.commit()
+    # Reload with the author, async sessions cannot lazy load it later
+    return await get_comment(db, comment_id=db_comment.id)
 
-def update_comment(db: Session, db_comment: Comment, comment_in: CommentUpdate) -> Comment:
+async def update_comment(db: AsyncSession, db_comment: Comment, comment_in: CommentUpdate) -> Comment:
     """Update comment"""
     update_data = comment_in.model_dump(exclude_unset=True)
     
     for field, value in update_data.items():
         setattr(db_comment, field, value)
     
-    db.commit()
-    db.refresh(db_comment)
-    return db_comment
+    await db.commit()
+    return await get_comment(db, comment_id=db_comment.id)
 
-def delete_comment(db: Session, comment_id: int) -> Comment:
+async def delete_comment(db: AsyncSession, comment_id: int) -> Comment:
     """Delete comment"""
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await db.get(Comment, comment_id)
     if comment:
-        db.delete(comment)
-        db.commit()
+        await db.delete(comment)
+        await db.commit()
     return comment
 
 def can_modify_comment(comment: Comment, user: User) -> bool:
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+import re
+
+from sqlalchemy import delete, event, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.models.comment import Comment
+from app.models.feed_entry import FeedEntry, FeedEventType
+from app.models.issue import Issue, IssueStatus
+from app.models.issue_history import IssueHistory
+
+SUMMARY_LENGTH = 255
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def excerpt(text: str, length: int = SUMMARY_LENGTH) -> str:
+    """Text on a single line, shortened to fit a feed summary"""
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return text if len(text) <= length else text[:length - 1].rstrip() + "…"
+
+def feed_event(obj) -> Optional[Tuple[FeedEventType, int, str]]:
+    """Event type, actor and summary of a new row that belongs in feeds, None for other rows"""
+    if isinstance(obj, IssueHistory):
+        if obj.old_status is None:
+            return FeedEventType.STATUS_CHANGED, obj.user_id, "Opened"
+        summary = f"{IssueStatus(obj.old_status).value} → {IssueStatus(obj.new_status).value}"
+        return FeedEventType.STATUS_CHANGED, obj.user_id, summary
+    if isinstance(obj, Comment):
+        return FeedEventType.COMMENT_ADDED, obj.user_id, excerpt(obj.content)
+    if isinstance(obj, Attachment):
+        return FeedEventType.ATTACHMENT_ADDED, obj.uploader_id, excerpt(obj.filename)
+    return None
+
+def issue_participants(session: Session, issue_id: int, limit: int) -> Optional[Set[int]]:
+    """Reporter, assignee and commenters of an issue, None when there are more than the limit"""
+    row = session.execute(select(Issue.reporter_id, Issue.assignee_id).filter(Issue.id == issue_id)).first()
+    if row is None:
+        return set()
+    commenters = session.execute(
+        select(Comment.user_id).filter(Comment.issue_id == issue_id).distinct().limit(limit + 1)
+    ).scalars().all()
+    participants = {row.reporter_id, row.assignee_id, *commenters} - {None}
+    return participants if len(participants) <= limit else None
+
+@event.listens_for(Session, "after_flush")
+def fan_out_feed_entries(session, flush_context):
+    """Copy new status changes, comments and attachments into the feeds of the issue's participants"""
+    rows = []
+    for obj in session.new:
+        activity = feed_event(obj)
+        if activity is None:
+            continue
+        event_type, actor_id, summary = activity
+        entry = dict(
+            event_type=event_type,
+            object_id=obj.id,
+            summary=summary,
+            issue_id=obj.issue_id,
+            actor_id=actor_id,
+            created_at=obj.created_at,
+            updated_at=obj.created_at
+        )
+        participants = issue_participants(session, obj.issue_id, settings.FEED_FANOUT_MAX_PARTICIPANTS)
+        if participants is None:
+            # Popular issue, one shared row that feeds pick up on read instead of a row per participant
+            rows.append(dict(entry, user_id=None))
+        else:
+            # Nobody needs to be told about their own activity
+            rows.extend(dict(entry, user_id=user_id) for user_id in sorted(participants - {actor_id}))
+    
+    removed = {}
+    for obj in session.deleted:
+        if isinstance(obj, Comment):
+            removed.setdefault(FeedEventType.COMMENT_ADDED, []).append(obj.id)
+        elif isinstance(obj, Attachment):
+            removed.setdefault(FeedEventType.ATTACHMENT_ADDED, []).append(obj.id)
+    for event_type, object_ids in removed.items():
+        # Deleted comments and files should not live on in other people's feeds
+        session.execute(
+            delete(FeedEntry).filter(FeedEntry.event_type == event_type, FeedEntry.object_id.in_(object_ids))
+        )
+    if rows:
+        session.execute(insert(FeedEntry), rows)
+
+def feed_cutoff() -> datetime:
+    """Creation time of the oldest activity still shown in feeds"""
+    return datetime.utcnow() - timedelta(days=settings.FEED_RETENTION_DAYS)
+
+async def get_feed(db: AsyncSession, user_id: int, before: Optional[int] = None, limit: int = 50) -> List[FeedEntry]:
+    """A user's feed newest first, starting below the entry ID given as cursor"""
+    def page(*criteria):
+        query = select(FeedEntry).options(joinedload(FeedEntry.issue, innerjoin=True)).filter(
+            FeedEntry.created_at >= feed_cutoff(), *criteria
+        )
+        if before is not None:
+            query = query.filter(FeedEntry.id < before)
+        return query.order_by(FeedEntry.id.desc()).limit(limit)
+    
+    own = (await db.execute(page(FeedEntry.user_id == user_id))).scalars().all()
+    # Activity on popular issues is stored once, so merge in the shared rows of issues the user takes part in
+    participating = select(Issue.id).filter(or_(Issue.reporter_id == user_id, Issue.assignee_id == user_id)).union(
+        select(Comment.issue_id).filter(Comment.user_id == user_id)
+    )
+    shared = (await db.execute(page(
+        FeedEntry.user_id.is_(None),
+        FeedEntry.issue_id.in_(participating),
+        FeedEntry.actor_id != user_id
+    ))).scalars().all()
+    return sorted([*own, *shared], key=lambda entry: entry.id, reverse=True)[:limit]
+
+async def delete_expired_feed_entries(db: AsyncSession, batch_size: int) -> int:
+    """Delete activity older than the retention window, in batches so no transaction holds many locks"""
+    deleted = 0
+    while True:
+        expired = select(FeedEntry.id).filter(FeedEntry.created_at < feed_cutoff()).limit(batch_size)
+        result = await db.execute(delete(FeedEntry).filter(FeedEntry.id.in_(expired)))
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
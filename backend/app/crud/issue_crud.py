@@ -1,37 +1,63 @@
-from typing import Any, Dict, Optional, Union, List, Tuple
+from typing import Any, Dict, NamedTuple, Optional, Union, List, Tuple
 from datetime import datetime
 
-from sqlalchemy import func, or_, and_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, undefer
 
+from app.crud.statements import issue_by_id
 from app.models.issue import Issue, IssueStatus, IssueSeverity
 from app.models.user import User, UserRole
 from app.models.issue_history import IssueHistory
 from app.schemas.issue import IssueCreate, IssueUpdate, IssueStatusUpdate
 
-def get_issue(db: Session, issue_id: int) -> Optional[Issue]:
+async def get_issue(db: AsyncSession, issue_id: int, with_html: bool = False) -> Optional[Issue]:
     """Get issue by ID with related data"""
-    return db.query(Issue).options(
-        joinedload(Issue.reporter),
-        joinedload(Issue.assignee),
-        joinedload(Issue.tags),
-    ).filter(Issue.id == issue_id).first()
+    result = await db.execute(issue_by_id(with_html), {"issue_id": issue_id})
+    return result.unique().scalars().first()
+
+def can_view_issue(issue: Issue, user: User) -> bool:
+    """Check if user can see an issue and everything attached to it"""
+    # Reporters can only see their own issues
+    if user.role == UserRole.REPORTER:
+        return issue.reporter_id == user.id
+    return True
+
+class IssueAccess(NamedTuple):
+    """What decides whether a user may see issues, None role for users that do not exist"""
+    role: Optional[UserRole]
+    is_active: bool
+    reporter_ids: Dict[int, int]  # Issue ID -> reporter ID, for the issues that exist
 
-def get_issues(
-    db: Session, 
-    skip: int = 0, 
+async def get_issue_access(db: AsyncSession, user_id: int, issue_ids: List[int]) -> IssueAccess:
+    """Get a user's current role and active flag with the reporter IDs of existing issues, in one id-only query"""
+    result = await db.execute(
+        select(User.role, User.is_active, Issue.id, Issue.reporter_id)
+        .select_from(User)
+        .outerjoin(Issue, Issue.id.in_(issue_ids))
+        .filter(User.id == user_id)
+    )
+    rows = result.all()
+    if not rows:
+        return IssueAccess(role=None, is_active=False, reporter_ids={})
+    return IssueAccess(
+        role=rows[0].role,
+        is_active=bool(rows[0].is_active),
+        reporter_ids={row.id: row.reporter_id for row in rows if row.id is not None}
+    )
+
+async def get_issues(
+    db: AsyncSession,
+    skip: int = 0,
     limit: int = 100,
     current_user: Optional[User] = None,
     status: Optional[IssueStatus] = None,
     severity: Optional[IssueSeverity] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    with_html: bool = False
 ) -> Tuple[List[Issue], int]:
     """Get issues with filters and RBAC"""
-    query = db.query(Issue).options(
-        joinedload(Issue.reporter),
-        joinedload(Issue.assignee),
-        joinedload(Issue.tags),
-    )
+    query = select(Issue)
     
     # Apply role-based access control
     if current_user:
@@ -54,14 +80,22 @@ def get_issues(
         )
     
     # Get total count for pagination
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
     # Apply pagination
-    issues = query.order_by(Issue.created_at.desc()).offset(skip).limit(limit).all()
+    query = query.options(
+        joinedload(Issue.reporter),
+        joinedload(Issue.assignee),
+        joinedload(Issue.tags),
+    )
+    if with_html:
+        query = query.options(undefer(Issue.rendered_description))
+    result = await db.execute(query.order_by(Issue.created_at.desc()).offset(skip).limit(limit))
+    issues = result.unique().scalars().all()
     
     return issues, total
 
-def create_issue(db: Session, issue_in: IssueCreate, reporter_id: int) -> Issue:
+async def create_issue(db: AsyncSession, issue_in: IssueCreate, reporter_id: int) -> Issue:
     """Create new issue"""
     db_issue = Issue(
         title=issue_in.title,
@@ -72,8 +106,8 @@ def create_issue(db: Session, issue_in: IssueCreate, reporter_id: int) -> Issue:
         assignee_id=issue_in.assignee_id
     )
     db.add(db_issue)
-    db.commit()
-    db.refresh(db_issue)
+    await db.commit()
+    await db.refresh(db_issue)
     
     # Create initial history entry
     history_entry = IssueHistory(
@@ -84,11 +118,11 @@ def create_issue(db: Session, issue_in: IssueCreate, reporter_id: int) -> Issue:
         comment="Issue created"
     )
     db.add(history_entry)
-    db.commit()
+    await db.commit()
     
     return db_issue
 
-def update_issue(db: Session, db_issue: Issue, issue_in: Union[IssueUpdate, Dict[str, Any]], user_id: int) -> Issue:
+async def update_issue(db: AsyncSession, db_issue: Issue, issue_in: Union[IssueUpdate, Dict[str, Any]], user_id: int) -> Issue:
     """Update issue"""
     if isinstance(issue_in, dict):
         update_data = issue_in
@@ -103,8 +137,7 @@ def update_issue(db: Session, db_issue: Issue, issue_in: Union[IssueUpdate, Dict
     for field, value in update_data.items():
         setattr(db_issue, field, value)
     
-    db.commit()
-    db.refresh(db_issue)
+    await db.commit()
     
     # Create history entry if status changed
     if new_status and old_status != new_status:
@@ -116,19 +149,19 @@ def update_issue(db: Session, db_issue: Issue, issue_in: Union[IssueUpdate, Dict
             comment=f"Status changed from {old_status} to {new_status}"
         )
         db.add(history_entry)
-        db.commit()
+        await db.commit()
     
-    return db_issue
+    # Reload with relationships, async sessions cannot lazy load them later
+    return await get_issue(db, issue_id=db_issue.id)
 
-def update_issue_status(db: Session, db_issue: Issue, status_update: IssueStatusUpdate, user_id: int) -> Issue:
+async def update_issue_status(db: AsyncSession, db_issue: Issue, status_update: IssueStatusUpdate, user_id: int) -> Issue:
     """Update issue status with validation"""
     if not db_issue.can_transition_to(status_update.status):
         raise ValueError(f"Cannot transition from {db_issue.status} to {status_update.status}")
     
     old_status = db_issue.status
     db_issue.status = status_update.status
-    db.commit()
-    db.refresh(db_issue)
+    await db.commit()
     
     # Create history entry
     history_entry = IssueHistory(
@@ -139,32 +172,37 @@ def update_issue_status(db: Session, db_issue: Issue, status_update: IssueStatus
         comment=status_update.comment
     )
     db.add(history_entry)
-    db.commit()
+    await db.commit()
     
-    return db_issue
+    # Reload with relationships, async sessions cannot lazy load them later
+    return await get_issue(db, issue_id=db_issue.id)
 
-def delete_issue(db: Session, issue_id: int) -> Issue:
+async def delete_issue(db: AsyncSession, issue_id: int) -> Issue:
     """Delete issue"""
-    issue = db.query(Issue).filter(Issue.id == issue_id).first()
+    issue = await db.get(Issue, issue_id)
     if issue:
-        db.delete(issue)
-        db.commit()
+        await db.delete(issue)
+        await db.commit()
     return issue
 
-def get_issue_counts_by_status(db: Session) -> Dict[str, int]:
+async def get_issue_counts_by_status(db: AsyncSession) -> Dict[str, int]:
     """Get issue counts grouped by status"""
-    results = db.query(
-        Issue.status,
-        func.count(Issue.id).label("count")
-    ).group_by(Issue.status).all()
+    result = await db.execute(
+        select(
+            Issue.status,
+            func.count(Issue.id).label("count")
+        ).group_by(Issue.status)
+    )
     
-    return {status.value: count for status, count in results}
+    return {status.value: count for status, count in result.all()}
 
-def get_issue_counts_by_severity(db: Session) -> Dict[str, int]:
+async def get_issue_counts_by_severity(db: AsyncSession) -> Dict[str, int]:
     """Get issue counts grouped by severity"""
-    results = db.query(
-        Issue.severity,
-        func.count(Issue.id).label("count")
-    ).group_by(Issue.severity).all()
+    result = await db.execute(
+        select(
+            Issue.severity,
+            func.count(Issue.id).label("count")
+        ).group_by(Issue.severity)
+    )
     
-    return {severity.value: count for severity, count in results}
+    return {severity.value: count for severity, count in result.all()}
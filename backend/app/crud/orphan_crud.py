@@ -0,0 +1,112 @@
+from itertools import islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import asyncio
+import re
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.blobs import BLOB_DIR, QUARANTINE_DIR, STAGING_DIR, THUMBNAIL_DIR, BlobStore, StoredFile
+from app.models.attachment import Attachment
+from app.models.blob import Blob
+from app.models.upload_session import UploadSession
+
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+THUMBNAIL_PATTERN = re.compile(r"([0-9a-f]{64})-\d+\.webp")
+PARTIAL_PATTERN = re.compile(r"resumable-([0-9a-f]+)\.part")
+
+class OrphanReport(NamedTuple):
+    """Outcome of one garbage collection run"""
+    scanned: int
+    quarantined: int
+    deleted: int
+    restored: int
+    reclaimed_bytes: int
+
+def file_owner(key: str) -> Tuple[Optional[type], Optional[str]]:
+    """The model whose rows keep a stored file alive and the value to look up, (None, None) for temp files"""
+    directory, _, name = key.rpartition("/")
+    top = directory.split("/", 1)[0]
+    if top == BLOB_DIR:
+        return (Blob, name) if SHA256_PATTERN.fullmatch(name) else (None, None)
+    if top == THUMBNAIL_DIR:
+        match = THUMBNAIL_PATTERN.fullmatch(name)
+        return (Blob, match.group(1)) if match else (None, None)
+    if key.startswith(STAGING_DIR + "/"):
+        # Staged uploads never outlive their request, only resumable partials have an owner
+        match = PARTIAL_PATTERN.fullmatch(name)
+        return (UploadSession, match.group(1)) if match else (None, None)
+    # Anything else is a legacy per-issue file, e.g. issue_12/report.pdf
+    return Attachment, key
+
+async def find_orphans(db: AsyncSession, keys: List[str]) -> List[str]:
+    """The keys of a batch that no blob, attachment or resumable upload refers to"""
+    lookups: Dict[type, Dict[str, List[str]]] = {Blob: {}, Attachment: {}, UploadSession: {}}
+    orphans = []
+    for key in keys:
+        model, value = file_owner(key)
+        if model is None:
+            orphans.append(key)
+        else:
+            lookups[model].setdefault(value, []).append(key)
+    
+    columns = {Blob: Blob.sha256, Attachment: Attachment.file_path, UploadSession: UploadSession.upload_id}
+    for model, values in lookups.items():
+        if not values:
+            continue
+        column = columns[model]
+        live = set((await db.execute(select(column).filter(column.in_(list(values))))).scalars())
+        orphans.extend(key for value, value_keys in values.items() if value not in live for key in value_keys)
+    return orphans
+
+def next_batch(files: Iterator[StoredFile], batch_size: int) -> List[StoredFile]:
+    """Take the next batch from a directory walk, runs on a worker thread"""
+    return list(islice(files, batch_size))
+
+async def collect_orphaned_files(
+    db: AsyncSession,
+    store: BlobStore,
+    min_age_seconds: float,
+    quarantine_seconds: float,
+    batch_size: int,
+    batch_pause_seconds: float
+) -> OrphanReport:
+    """Delete files quarantined past the grace period, then quarantine newly found orphans"""
+    now = time.time()
+    deleted = restored = reclaimed_bytes = 0
+    quarantined_files = store.scan(QUARANTINE_DIR)
+    while batch := await asyncio.to_thread(next_batch, quarantined_files, batch_size):
+        # Check again, the same content may have been uploaded since, and put those files back right away
+        orphans = set(await find_orphans(db, [stored.key for stored in batch]))
+        for stored in batch:
+            if stored.key not in orphans:
+                await asyncio.to_thread(store.restore, stored.key)
+                restored += 1
+            elif now - stored.mtime >= quarantine_seconds:
+                await asyncio.to_thread(store.purge, stored.key)
+                deleted += 1
+                reclaimed_bytes += stored.size
+        # Yield the disk and database to live traffic between batches, holding no transaction open
+        await db.commit()
+        await asyncio.sleep(batch_pause_seconds)
+    
+    scanned = quarantined = 0
+    older_than = now - min_age_seconds
+    files = store.scan()
+    while batch := await asyncio.to_thread(next_batch, files, batch_size):
+        scanned += len(batch)
+        # Recent files may belong to an upload whose transaction has not committed yet
+        candidates = [stored.key for stored in batch if stored.mtime <= older_than]
+        for key in await find_orphans(db, candidates):
+            if await asyncio.to_thread(store.quarantine, key, older_than):
+                quarantined += 1
+        await db.commit()
+        await asyncio.sleep(batch_pause_seconds)
+    return OrphanReport(
+        scanned=scanned,
+        quarantined=quarantined,
+        deleted=deleted,
+        restored=restored,
+        reclaimed_bytes=reclaimed_bytes
+    )
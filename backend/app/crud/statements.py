@@ -0,0 +1,49 @@
+from functools import lru_cache
+
+from sqlalchemy import Select, bindparam, select
+from sqlalchemy.orm import joinedload, undefer
+
+from app.models.attachment import Attachment
+from app.models.comment import Comment
+from app.models.issue import Issue
+from app.models.issue_history import IssueHistory  # noqa: F401, Issue's relationships resolve it by name
+from app.models.issue_tag import IssueTag  # noqa: F401, Issue's relationships resolve it by name
+from app.models.user import User
+
+# Hot lookups are built once, on first use so every mapper is configured, with bound
+# parameters. Executing the same statement object skips rebuilding the ORM construct and
+# reuses its memoized cache key, so SQLAlchemy's compiled cache hits without re-walking
+# the statement on every call.
+
+@lru_cache(maxsize=None)
+def issue_by_id(with_html: bool = False) -> Select:
+    """Issue with reporter, assignee and tags, and the rendered description if asked, parameter issue_id"""
+    statement = select(Issue).options(
+        joinedload(Issue.reporter),
+        joinedload(Issue.assignee),
+        joinedload(Issue.tags),
+    ).filter(Issue.id == bindparam("issue_id")).execution_options(populate_existing=True)
+    return statement.options(undefer(Issue.rendered_description)) if with_html else statement
+
+@lru_cache(maxsize=None)
+def user_by_id() -> Select:
+    """User, parameter user_id"""
+    return select(User).filter(User.id == bindparam("user_id"))
+
+@lru_cache(maxsize=None)
+def user_by_email() -> Select:
+    """User, parameter email"""
+    return select(User).filter(User.email == bindparam("email"))
+
+@lru_cache(maxsize=None)
+def comment_by_id(with_html: bool = False) -> Select:
+    """Comment with its author, and the rendered content if asked, parameter comment_id"""
+    statement = select(Comment).options(joinedload(Comment.user)).filter(Comment.id == bindparam("comment_id"))
+    return statement.options(undefer(Comment.rendered_content)) if with_html else statement
+
+@lru_cache(maxsize=None)
+def attachment_by_id() -> Select:
+    """Attachment with its uploader, parameter attachment_id"""
+    return select(Attachment).options(
+        joinedload(Attachment.uploader)
+    ).filter(Attachment.id == bindparam("attachment_id"))
@@ -1,94 +1,92 @@
 from typing import List, Dict, Any, Optional
 from datetime import date, datetime, timedelta
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.routing import USE_PRIMARY_KEY
 from app.models.daily_stats import DailyStats
 from app.models.issue import Issue, IssueStatus, IssueSeverity
 from app.models.issue_history import IssueHistory
 
-def get_daily_stats(db: Session, stats_date: date) -> Optional[DailyStats]:
+async def get_daily_stats(db: AsyncSession, stats_date: date) -> Optional[DailyStats]:
     """Get daily statistics for a specific date"""
-    return db.query(DailyStats).filter(DailyStats.date == stats_date).first()
+    return await db.scalar(select(DailyStats).filter(DailyStats.date == stats_date))
 
-def get_daily_stats_range(db: Session, start_date: date, end_date: date) -> List[DailyStats]:
+async def get_daily_stats_range(db: AsyncSession, start_date: date, end_date: date) -> List[DailyStats]:
     """Get daily statistics for a date range"""
-    return db.query(DailyStats)\
+    result = await db.execute(
+        select(DailyStats)\
         .filter(DailyStats.date >= start_date, DailyStats.date <= end_date)\
-        .order_by(DailyStats.date.asc())\
-        .all()
+        .order_by(DailyStats.date.asc())
+    )
+    return result.scalars().all()
 
-def create_or_update_daily_stats(db: Session, stats_date: date) -> DailyStats:
+async def create_or_update_daily_stats(db: AsyncSession, stats_date: date) -> DailyStats:
     """Create or update daily statistics for a specific date"""
-    # Check if stats already exist for this date
-    db_stats = get_daily_stats(db, stats_date)
-    if not db_stats:
-        # Create new stats
-        db_stats = DailyStats(date=stats_date)
-        db.add(db_stats)
+    values: Dict[str, Any] = {}
     
     # Calculate issue counts by status
-    status_counts = db.query(
+    status_counts = (await db.execute(select(
         Issue.status,
         func.count(Issue.id)
     ).filter(
         func.date(Issue.created_at) <= stats_date
-    ).group_by(Issue.status).all()
+    ).group_by(Issue.status))).all()
     
     # Update status counts
     for status, count in status_counts:
         if status == IssueStatus.OPEN:
-            db_stats.open_count = count
+            values["open_count"] = count
         elif status == IssueStatus.TRIAGED:
-            db_stats.triaged_count = count
+            values["triaged_count"] = count
         elif status == IssueStatus.IN_PROGRESS:
-            db_stats.in_progress_count = count
+            values["in_progress_count"] = count
         elif status == IssueStatus.DONE:
-            db_stats.done_count = count
+            values["done_count"] = count
     
     # Calculate issue counts by severity
-    severity_counts = db.query(
+    severity_counts = (await db.execute(select(
         Issue.severity,
         func.count(Issue.id)
     ).filter(
         func.date(Issue.created_at) <= stats_date
-    ).group_by(Issue.severity).all()
+    ).group_by(Issue.severity))).all()
     
     # Update severity counts
     for severity, count in severity_counts:
         if severity == IssueSeverity.LOW:
-            db_stats.low_severity_count = count
+            values["low_severity_count"] = count
         elif severity == IssueSeverity.MEDIUM:
-            db_stats.medium_severity_count = count
+            values["medium_severity_count"] = count
         elif severity == IssueSeverity.HIGH:
-            db_stats.high_severity_count = count
+            values["high_severity_count"] = count
         elif severity == IssueSeverity.CRITICAL:
-            db_stats.critical_severity_count = count
+            values["critical_severity_count"] = count
     
     # Calculate total issues
-    db_stats.total_issues = db.query(func.count(Issue.id)).filter(
+    values["total_issues"] = await db.scalar(select(func.count(Issue.id)).filter(
         func.date(Issue.created_at) <= stats_date
-    ).scalar() or 0
+    )) or 0
     
     # Calculate new issues for this day
-    db_stats.new_issues = db.query(func.count(Issue.id)).filter(
+    values["new_issues"] = await db.scalar(select(func.count(Issue.id)).filter(
         func.date(Issue.created_at) == stats_date
-    ).scalar() or 0
+    )) or 0
     
     # Calculate closed issues for this day
-    db_stats.closed_issues = db.query(func.count(IssueHistory.id)).filter(
+    values["closed_issues"] = await db.scalar(select(func.count(IssueHistory.id)).filter(
         func.date(IssueHistory.created_at) == stats_date,
         IssueHistory.new_status == IssueStatus.DONE
-    ).scalar() or 0
+    )) or 0
     
     # Calculate average resolution time for issues closed on this day
     # This is more complex and would require joining with issue history
     # For simplicity, we'll use a placeholder calculation
-    closed_issues = db.query(Issue).join(IssueHistory).filter(
+    closed_issues = (await db.execute(select(Issue).join(IssueHistory).filter(
         func.date(IssueHistory.created_at) == stats_date,
         IssueHistory.new_status == IssueStatus.DONE
-    ).all()
+    ))).scalars().all()
     
     if closed_issues:
         total_hours = 0
@@ -98,35 +96,47 @@ def create_or_update_daily_stats(db: Session, stats_date: date) -> DailyStats:
             resolution_time = (issue.updated_at - issue.created_at).total_seconds() / 3600
             total_hours += resolution_time
         
-        db_stats.avg_resolution_time = int(total_hours / len(closed_issues))
+        values["avg_resolution_time"] = int(total_hours / len(closed_issues))
+    
+    # Aggregates may be read from the replica, but a lagging replica could miss an existing row,
+    # so the row is looked up and written on the primary
+    db.info[USE_PRIMARY_KEY] = True
+    db_stats = await get_daily_stats(db, stats_date)
+    if not db_stats:
+        # Create new stats
+        db_stats = DailyStats(date=stats_date)
+        db.add(db_stats)
+    for field, value in values.items():
+        setattr(db_stats, field, value)
     
-    db.commit()
-    db.refresh(db_stats)
+    await db.commit()
+    await db.refresh(db_stats)
     return db_stats
 
-def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+async def get_dashboard_stats(db: AsyncSession) -> Dict[str, Any]:
     """Get statistics for dashboard"""
     # Get issue counts by status
-    status_counts = db.query(
+    status_counts = (await db.execute(select(
         Issue.status,
         func.count(Issue.id)
-    ).group_by(Issue.status).all()
+    ).group_by(Issue.status))).all()
     
     issue_counts_by_status = {status.value: count for status, count in status_counts}
     
     # Get issue counts by severity
-    severity_counts = db.query(
+    severity_counts = (await db.execute(select(
         Issue.severity,
         func.count(Issue.id)
-    ).group_by(Issue.severity).all()
+    ).group_by(Issue.severity))).all()
     
     issue_counts_by_severity = {severity.value: count for severity, count in severity_counts}
     
     # Get recent activity (last 10 status changes)
-    recent_activity = db.query(IssueHistory)\
+    recent_activity = (await db.execute(
+        select(IssueHistory)\
         .order_by(IssueHistory.created_at.desc())\
-        .limit(10)\
-        .all()
+        .limit(10)
+    )).scalars().all()
     
     recent_activity_data = [
         {
@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.revoked_token import RevokedToken
+
+async def revoke_token(db: AsyncSession, jti: str, expires_at: datetime, user_id: Optional[int] = None) -> bool:
+    """Record a revoked token, returns False if it was already revoked"""
+    db.add(RevokedToken(jti=jti, expires_at=expires_at, user_id=user_id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+async def is_token_revoked(db: AsyncSession, jti: str) -> bool:
+    """Check the revocation table for a token ID"""
+    return await db.scalar(select(RevokedToken.id).filter(RevokedToken.jti == jti)) is not None
+
+async def get_unexpired_revoked_jtis(db: AsyncSession) -> List[str]:
+    """Get the IDs of revoked tokens that have not expired yet"""
+    result = await db.execute(select(RevokedToken.jti).filter(RevokedToken.expires_at > datetime.utcnow()))
+    return result.scalars().all()
+
+async def delete_expired_revoked_tokens(db: AsyncSession) -> int:
+    """Delete revocations of tokens that have expired anyway"""
+    result = await db.execute(delete(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()))
+    await db.commit()
+    return result.rowcount
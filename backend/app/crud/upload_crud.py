@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.upload_session import UploadSession
+from app.schemas.upload import UploadSessionCreate
+
+def upload_session_expiry() -> datetime:
+    """Expiry of a session that just made progress"""
+    return datetime.utcnow() + timedelta(hours=settings.RESUMABLE_UPLOAD_EXPIRE_HOURS)
+
+async def create_upload_session(db: AsyncSession, upload_in: UploadSessionCreate, uploader_id: int) -> UploadSession:
+    """Create a resumable upload session"""
+    upload_session = UploadSession(
+        upload_id=uuid.uuid4().hex,
+        filename=upload_in.filename,
+        content_type=upload_in.content_type,
+        size=upload_in.size,
+        offset=0,
+        expires_at=upload_session_expiry(),
+        issue_id=upload_in.issue_id,
+        uploader_id=uploader_id
+    )
+    db.add(upload_session)
+    await db.commit()
+    return upload_session
+
+async def get_upload_session(db: AsyncSession, upload_id: str) -> Optional[UploadSession]:
+    """Get an upload session by its public ID, always re-reading the offset"""
+    return await db.scalar(
+        select(UploadSession).filter(UploadSession.upload_id == upload_id).execution_options(populate_existing=True)
+    )
+
+async def update_upload_offset(db: AsyncSession, upload_session: UploadSession, offset: int) -> UploadSession:
+    """Record received bytes and push back the session's expiry"""
+    upload_session.offset = offset
+    upload_session.expires_at = upload_session_expiry()
+    await db.commit()
+    return upload_session
+
+async def delete_upload_session(db: AsyncSession, upload_session: UploadSession):
+    """Delete an upload session record"""
+    await db.delete(upload_session)
+    await db.commit()
+
+async def get_expired_upload_sessions(db: AsyncSession, limit: int = 500) -> List[UploadSession]:
+    """Get abandoned upload sessions, oldest first"""
+    result = await db.execute(
+        select(UploadSession)
+        .filter(UploadSession.expires_at <= datetime.utcnow())
+        .order_by(UploadSession.expires_at)
+        .limit(limit)
+    )
+    return result.scalars().all()
@@ -1,53 +1,58 @@
 from typing import Any, Dict, Optional, Union, List
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.core.principals import principal_cache
+from app.core.passwords import password_hasher
+from app.crud.statements import user_by_id, user_by_email
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate
 
-def get_user(db: Session, user_id: int) -> Optional[User]:
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
     """Get user by ID"""
-    return db.query(User).filter(User.id == user_id).first()
+    return await db.scalar(user_by_id(), {"user_id": user_id})
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email"""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(user_by_email(), {"email": email})
 
-def get_users(
-    db: Session, skip: int = 0, limit: int = 100, role: Optional[UserRole] = None
+async def get_users(
+    db: AsyncSession, skip: int = 0, limit: int = 100, role: Optional[UserRole] = None
 ) -> List[User]:
     """Get users with optional role filter"""
-    query = db.query(User)
+    query = select(User)
     if role:
         query = query.filter(User.role == role)
-    return query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
-def create_user(db: Session, user_in: UserCreate) -> User:
+async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     """Create new user"""
     db_user = User(
         email=user_in.email,
         name=user_in.name,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await password_hasher.hash(user_in.password),
         role=user_in.role,
         is_active=user_in.is_active,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def create_oauth_user(db: Session, email: str, name: str, provider: str, profile_image: Optional[str] = None) -> User:
+async def create_oauth_user(db: AsyncSession, email: str, name: str, provider: str, profile_image: Optional[str] = None) -> User:
     """Create or update OAuth user"""
-    db_user = get_user_by_email(db, email)
+    db_user = await get_user_by_email(db, email)
     if db_user:
         # Update existing user with OAuth info
         db_user.is_oauth_user = True
         db_user.oauth_provider = provider
         if profile_image:
             db_user.profile_image = profile_image
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        principal_cache.invalidate_user(db_user.id)
+        await db.refresh(db_user)
         return db_user
     
     # Create new OAuth user
@@ -62,11 +67,11 @@ def create_oauth_user(db: Session, email: str, name: str, provider: str, profile
         profile_image=profile_image
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, db_user: User, user_in: Union[UserUpdate, Dict[str, Any]]) -> User:
+async def update_user(db: AsyncSession, db_user: User, user_in: Union[UserUpdate, Dict[str, Any]]) -> User:
     """Update user"""
     if isinstance(user_in, dict):
         update_data = user_in
@@ -75,29 +80,37 @@ def update_user(db: Session, db_user: User, user_in: Union[UserUpdate, Dict[str,
     
     # Handle password update
     if "password" in update_data and update_data["password"]:
-        update_data["hashed_password"] = get_password_hash(update_data["password"])
+        update_data["hashed_password"] = await password_hasher.hash(update_data["password"])
         del update_data["password"]
     
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    # Role and is_active changes, including deactivation, must not be served from the cache
+    principal_cache.invalidate_user(db_user.id)
+    await db.refresh(db_user)
     return db_user
 
-def delete_user(db: Session, user_id: int) -> User:
+async def delete_user(db: AsyncSession, user_id: int) -> User:
     """Delete user"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if user:
-        db.delete(user)
-        db.commit()
+        await db.delete(user)
+        await db.commit()
+        principal_cache.invalidate_user(user_id)
     return user
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authenticate user with email and password"""
-    user = get_user_by_email(db, email=email)
+    user = await get_user_by_email(db, email=email)
     if not user or user.is_oauth_user or not user.hashed_password:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # The cost parameters changed since this hash was made, upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
     return user
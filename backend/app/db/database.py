@@ -1,22 +1,130 @@
-from sqlalchemy import create_engine
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from fastapi import Request
+from sqlalchemy import Delete, Insert, Update, create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.db.pool import TimedAsyncAdaptedQueuePool, instrument_engine
+from app.db.routing import RecentWrites, USE_PRIMARY_KEY, USER_ID_KEY, WROTE_KEY
+
+# Session.info key holding the statement timeout for the session's transactions
+STATEMENT_TIMEOUT_KEY = "statement_timeout_ms"
+
+# Async drivers used for each database backend
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """Map a sync database URL to its async driver, e.g. postgresql:// to postgresql+asyncpg://"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS and url.get_driver_name() != ASYNC_DRIVERS[backend]:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url.render_as_string(hide_password=False)
 
-# Create SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL)
+def get_engine_options(database_url: str) -> Dict[str, Any]:
+    """Pool options from settings, SQLite keeps SQLAlchemy's default pool"""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Create SQLAlchemy engine, kept for migrations and scripts
+engine = create_engine(settings.DATABASE_URL, **get_engine_options(settings.DATABASE_URL))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def create_instrumented_async_engine(database_url: str, engine_name: str) -> AsyncEngine:
+    """Create an async engine with the configured pool and pool metrics"""
+    options = get_engine_options(database_url)
+    if options:
+        options["poolclass"] = TimedAsyncAdaptedQueuePool
+    async_engine = create_async_engine(get_async_database_url(database_url), **options)
+    instrument_engine(async_engine.sync_engine, engine_name)
+    return async_engine
+
+# Create async engine used by the API and worker so queries don't block the event loop
+async_engine = create_instrumented_async_engine(settings.DATABASE_URL, "primary")
+
+# Optional read replica, reads fall back to the primary when it is not configured
+replica_engine: Optional[AsyncEngine] = (
+    create_instrumented_async_engine(settings.DATABASE_REPLICA_URL, "replica")
+    if settings.DATABASE_REPLICA_URL else None
+)
+
+# Users whose reads stay on the primary after a write, until the replica catches up
+recent_writes = RecentWrites(window_seconds=settings.DB_READ_YOUR_WRITES_SECONDS)
+
+class RoutingSession(Session):
+    """Session sending writes and pinned reads to the primary and other reads to the replica"""
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_engine is None
+            or self._flushing
+            or self.info.get(USE_PRIMARY_KEY)
+            or isinstance(clause, (Insert, Update, Delete))
+        ):
+            return async_engine.sync_engine
+        return replica_engine.sync_engine
+
+@event.listens_for(RoutingSession, "after_flush")
+def pin_session_to_primary(session, flush_context):
+    """Read the session's own writes back from the primary"""
+    session.info[USE_PRIMARY_KEY] = True
+    session.info[WROTE_KEY] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def mark_recent_write(session):
+    """Start the user's read-your-writes window once their write is committed"""
+    if session.info.pop(WROTE_KEY, False) and session.info.get(USER_ID_KEY):
+        recent_writes.mark(session.info[USER_ID_KEY])
+
+# Create AsyncSessionLocal class, objects stay readable after commit without a lazy reload
+# Sessions read from the replica unless pinned to the primary
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+def primary_session() -> AsyncSession:
+    """Session reading from the primary too, for reads that must not lag behind writes"""
+    db = AsyncSessionLocal()
+    db.info[USE_PRIMARY_KEY] = True
+    return db
+
 # Create Base class for models
 Base = declarative_base()
 
+@event.listens_for(Session, "after_begin")
+def apply_statement_timeout(session, transaction, connection):
+    """Apply the session's statement timeout to each transaction it begins"""
+    timeout_ms = session.info.get(STATEMENT_TIMEOUT_KEY)
+    if timeout_ms and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+async def set_statement_timeout(db: AsyncSession, timeout_ms: int):
+    """Change a session's statement timeout, including the transaction already in progress"""
+    db.info[STATEMENT_TIMEOUT_KEY] = timeout_ms
+    if db.in_transaction() and db.get_bind().dialect.name == "postgresql":
+        await db.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Get async database session, GET requests read from the replica"""
+    async with AsyncSessionLocal() as db:
+        db.info[STATEMENT_TIMEOUT_KEY] = settings.DB_STATEMENT_TIMEOUT_MS
+        if request.method not in ("GET", "HEAD"):
+            db.info[USE_PRIMARY_KEY] = True
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,97 @@
+from typing import Any, Dict, Optional
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_WAIT_SECONDS, DB_POOL_TIMEOUTS
+
+class PoolWaitStats:
+    """Running totals of time spent waiting for a pooled connection"""
+    
+    def __init__(self, engine_name: str):
+        self.engine_name = engine_name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+    
+    def record(self, seconds: float, timed_out: bool = False):
+        """Record one checkout attempt"""
+        if timed_out:
+            self.timeouts += 1
+            DB_POOL_TIMEOUTS.labels(engine=self.engine_name).inc()
+        else:
+            self.checkouts += 1
+        self.total_wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        DB_POOL_WAIT_SECONDS.labels(engine=self.engine_name).observe(seconds)
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Summarize the totals for the admin pool endpoint"""
+        attempts = self.checkouts + self.timeouts
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait_seconds / attempts * 1000, 3) if attempts else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+
+class TimedPoolMixin:
+    """Time each checkout so pool saturation shows up as wait time instead of only as errors"""
+    
+    wait_stats: Optional[PoolWaitStats] = None
+    
+    def _do_get(self):
+        if self.wait_stats is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+    
+    def recreate(self):
+        # Keep the totals when the engine is disposed or the pool is invalidated
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    """QueuePool with checkout timing"""
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout timing"""
+
+def pool_status(pool: Pool) -> Dict[str, Any]:
+    """Snapshot of a pool's size, usage and wait times"""
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # overflow() starts at -size and counts up as connections are opened
+            "overflow": max(pool.overflow(), 0),
+            "timeout_seconds": pool.timeout(),
+        })
+    if getattr(pool, "wait_stats", None) is not None:
+        status.update(pool.wait_stats.as_dict())
+    return status
+
+def instrument_engine(engine: Engine, engine_name: str):
+    """Start recording wait times and publish pool gauges for an engine"""
+    if isinstance(engine.pool, TimedPoolMixin):
+        engine.pool.wait_stats = PoolWaitStats(engine_name)
+    
+    # Read engine.pool on every scrape, the pool object is replaced on dispose
+    DB_POOL_CHECKED_OUT.labels(engine=engine_name).set_function(
+        lambda: pool_status(engine.pool).get("checked_out", 0)
+    )
+    DB_POOL_OVERFLOW.labels(engine=engine_name).set_function(
+        lambda: pool_status(engine.pool).get("overflow", 0)
+    )
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+import time
+
+# Session.info keys used to route statements between the primary and the replica
+USE_PRIMARY_KEY = "use_primary"
+USER_ID_KEY = "user_id"
+WROTE_KEY = "wrote"
+
+class RecentWrites:
+    """Users who wrote recently, whose reads stay on the primary until the replica catches up"""
+    
+    def __init__(self, window_seconds: float, max_size: int = 100000):
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._expires: "OrderedDict[Hashable, float]" = OrderedDict()
+    
+    def mark(self, user_id: Hashable):
+        """Pin a user's reads to the primary for the read-your-writes window"""
+        if self.window_seconds <= 0:
+            return
+        key = str(user_id)
+        self._expires[key] = time.monotonic() + self.window_seconds
+        self._expires.move_to_end(key)
+        # Entries are ordered by expiry, so expired and overflow entries sit at the front
+        now = time.monotonic()
+        while self._expires:
+            oldest_key, expires_at = next(iter(self._expires.items()))
+            if expires_at > now and len(self._expires) <= self.max_size:
+                break
+            del self._expires[oldest_key]
+    
+    def is_recent(self, user_id: Hashable) -> bool:
+        """Check whether a user is inside their read-your-writes window"""
+        expires_at = self._expires.get(str(user_id))
+        return expires_at is not None and expires_at > time.monotonic()
+    
+    def __len__(self) -> int:
+        return len(self._expires)
+
+def bind_session_user(info: Dict[str, Any], user_id: Hashable, recent_writes: RecentWrites):
+    """Attach the request's user to a session, pinning reads to the primary after a recent write"""
+    info[USER_ID_KEY] = str(user_id)
+    if recent_writes.is_recent(user_id):
+        info[USE_PRIMARY_KEY] = True
@@ -1,23 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+import logging
+
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest, start_http_server
+from sqlalchemy import exc
 
+from app.core.concurrency import AdaptiveConcurrencyMiddleware
 from app.core.config import settings
+from app.core.passwords import PasswordHasherBusy, password_hasher
+from app.core.storage import StorageError, storage
+from app.core.thumbnails import ThumbnailerBusy, thumbnail_generator
 from app.api.api_v1.api import api_router
-from app.core.security import get_current_active_user
+from app.core.security import get_admin_user, get_current_active_user
+from app.models.user import User
 from app.websockets.router import websocket_router
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Serve the metrics port on startup and release worker pools on shutdown"""
+    if settings.METRICS_PORT:
+        try:
+            start_http_server(settings.METRICS_PORT, addr=settings.METRICS_HOST)
+        except OSError as e:
+            # With several workers the first one to start owns the port
+            logger.warning(f"Metrics port {settings.METRICS_PORT} not served by this process: {e}")
+    yield
+    password_hasher.shutdown()
+    thumbnail_generator.shutdown()
+    await storage.close()
+
 # Create FastAPI app
 app = FastAPI(
     title="Issues & Insights Tracker API",
     description="API for tracking issues and insights",
     version="1.0.0",
     docs_url=None,  # Disable default docs
-    redoc_url=None  # Disable default redoc
+    redoc_url=None,  # Disable default redoc
+    lifespan=lifespan
 )
 
+# Shed excess load per route class, added before CORS so rejections still carry CORS headers
+if settings.LOAD_SHEDDING_ENABLED:
+    app.add_middleware(AdaptiveConcurrencyMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,14 +58,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Postgres SQLSTATE for a statement cancelled by statement_timeout
+QUERY_CANCELED_SQLSTATE = "57014"
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError):
+    """Answer 503 when no pooled connection frees up in time"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(exc.DBAPIError)
+async def statement_timeout_handler(request: Request, error: exc.DBAPIError):
+    """Answer 503 when a query exceeds its statement timeout"""
+    if getattr(error.orig, "sqlstate", None) != QUERY_CANCELED_SQLSTATE:
+        raise error
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database query timed out"},
+    )
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, error: PasswordHasherBusy):
+    """Answer 503 when too many logins or password changes are already in progress"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many password operations in progress, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(ThumbnailerBusy)
+async def thumbnailer_busy_handler(request: Request, error: ThumbnailerBusy):
+    """Answer 503 when too many thumbnails are already being rendered"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many thumbnails being rendered, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(StorageError)
+async def storage_error_handler(request: Request, error: StorageError):
+    """Answer 503 when the storage backend cannot be reached or refuses a request"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "File storage is unavailable, try again shortly"},
+        headers={"Retry-After": "5"},
+    )
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
 # Include WebSocket router
 app.include_router(websocket_router)
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Prometheus metrics expose routes, load and pool state, so without a private port only admins read them
+if not settings.METRICS_PORT:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(current_user: User = Depends(get_admin_user)) -> Response:
+        """Prometheus metrics of this process, for admins"""
+        return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
 
 # Custom API docs with authentication
 @app.get("/api/docs", include_in_schema=False)
@@ -1,14 +1,18 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
 
+# Image formats that get rendered thumbnails
+THUMBNAIL_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
 class Attachment(BaseModel):
     """Attachment model for issue file uploads"""
     filename = Column(String(255), nullable=False)
     file_path = Column(String(255), nullable=False)  # Path to file on disk or S3 key
     content_type = Column(String(100), nullable=False)  # MIME type
-    size = Column(Integer, nullable=False)  # File size in bytes
+    size = Column(BigInteger, nullable=False)  # File size in bytes, resumable and direct uploads exceed 2GB
+    sha256 = Column(String(64), nullable=True, index=True)  # Hex digest of the stored content
     
     # Foreign keys
     issue_id = Column(Integer, ForeignKey("issue.id"), nullable=False)
@@ -28,6 +32,11 @@ class Attachment(BaseModel):
         """Check if the attachment is a PDF"""
         return self.content_type == 'application/pdf'
     
+    @property
+    def has_thumbnail(self) -> bool:
+        """Check if thumbnails can be served instead of the full file"""
+        return self.sha256 is not None and self.content_type in THUMBNAIL_CONTENT_TYPES
+    
     @property
     def is_previewable(self) -> bool:
         """Check if the attachment can be previewed in browser"""
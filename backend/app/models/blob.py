@@ -0,0 +1,9 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+
+from app.models.base import BaseModel
+
+class Blob(BaseModel):
+    """Content-addressed file shared by every attachment with the same content"""
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)  # Hex digest, also the storage key
+    size = Column(BigInteger, nullable=False)  # File size in bytes
+    ref_count = Column(Integer, nullable=False, default=0)  # Attachment rows pointing at this blob
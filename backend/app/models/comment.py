@@ -1,11 +1,15 @@
-from sqlalchemy import Column, ForeignKey, Integer, Text
-from sqlalchemy.orm import relationship
+from typing import Optional
+from sqlalchemy import Column, ForeignKey, Integer, Text, event, inspect
+from sqlalchemy.orm import deferred, relationship
 
+from app.core.rendering import render_markdown
 from app.models.base import BaseModel
 
 class Comment(BaseModel):
     """Comment model for issues"""
     content = Column(Text, nullable=False)  # Can contain markdown
+    # Sanitized HTML of the content, rendered on write and only loaded for format=html
+    rendered_content = deferred(Column(Text, nullable=True))
     
     # Foreign keys
     issue_id = Column(Integer, ForeignKey("issue.id"), nullable=False)
@@ -14,3 +18,15 @@ class Comment(BaseModel):
     # Relationships
     issue = relationship("Issue", back_populates="comments")
     user = relationship("User", back_populates="comments")
+    
+    @property
+    def content_html(self) -> Optional[str]:
+        """Rendered content when the query loaded it, rows older than rendering on write render on demand"""
+        if "rendered_content" in inspect(self).unloaded:
+            return None
+        return self.rendered_content or render_markdown(self.content)
+
+@event.listens_for(Comment.content, "set")
+def render_content(target, value, oldvalue, initiator):
+    """Render and sanitize the content once, whenever it is written"""
+    target.rendered_content = render_markdown(value) if value is not None else None
@@ -0,0 +1,37 @@
+from enum import Enum as PyEnum
+from sqlalchemy import Column, Enum, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import relationship
+
+from app.models.base import BaseModel
+
+class FeedEventType(str, PyEnum):
+    """Enum for the kinds of activity shown in user feeds"""
+    STATUS_CHANGED = "STATUS_CHANGED"
+    COMMENT_ADDED = "COMMENT_ADDED"
+    ATTACHMENT_ADDED = "ATTACHMENT_ADDED"
+
+class FeedEntry(BaseModel):
+    """Activity on an issue, copied into each participant's feed when it happens"""
+    __table_args__ = (
+        # Keyset pagination walks a single feed newest first
+        Index("ix_feedentry_user_id_id", "user_id", "id"),
+        Index("ix_feedentry_event_type_object_id", "event_type", "object_id"),
+        Index("ix_feedentry_created_at", "created_at"),
+    )
+    
+    event_type = Column(Enum(FeedEventType), nullable=False)
+    object_id = Column(Integer, nullable=False)  # ID of the history entry, comment or attachment
+    summary = Column(String(255), nullable=False)
+    
+    # Foreign keys
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=True)  # Null for entries of popular issues, shared by every participant
+    issue_id = Column(Integer, ForeignKey("issue.id", ondelete="CASCADE"), nullable=False, index=True)
+    actor_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)  # User who did it
+    
+    # Relationships
+    issue = relationship("Issue")
+    
+    @property
+    def issue_title(self) -> str:
+        """Title of the issue the activity happened on"""
+        return self.issue.title
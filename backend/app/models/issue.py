@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from typing import Optional
+from sqlalchemy import Column, Enum, ForeignKey, Integer, String, Text, event, inspect
+from sqlalchemy.orm import deferred, relationship
 from enum import Enum as PyEnum
 
+from app.core.rendering import render_markdown
 from app.models.base import BaseModel
 
 class IssueSeverity(str, PyEnum):
@@ -22,6 +24,8 @@ class Issue(BaseModel):
     """Issue model with workflow states"""
     title = Column(String(255), nullable=False, index=True)
     description = Column(Text, nullable=False)  # Markdown content
+    # Sanitized HTML of the description, rendered on write and only loaded for format=html
+    rendered_description = deferred(Column(Text, nullable=True))
     severity = Column(Enum(IssueSeverity), default=IssueSeverity.MEDIUM, nullable=False)
     status = Column(Enum(IssueStatus), default=IssueStatus.OPEN, nullable=False)
     
@@ -46,3 +50,15 @@ class Issue(BaseModel):
             IssueStatus.DONE: [IssueStatus.IN_PROGRESS]
         }
         return new_status in valid_transitions.get(self.status, [])
+    
+    @property
+    def description_html(self) -> Optional[str]:
+        """Rendered description when the query loaded it, rows older than rendering on write render on demand"""
+        if "rendered_description" in inspect(self).unloaded:
+            return None
+        return self.rendered_description or render_markdown(self.description)
+
+@event.listens_for(Issue.description, "set")
+def render_description(target, value, oldvalue, initiator):
+    """Render and sanitize the description once, whenever it is written"""
+    target.rendered_description = render_markdown(value) if value is not None else None
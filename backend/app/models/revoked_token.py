@@ -0,0 +1,11 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+
+from app.models.base import BaseModel
+
+class RevokedToken(BaseModel):
+    """Revoked JWT, kept until the token would have expired anyway"""
+    jti = Column(String(64), unique=True, index=True, nullable=False)  # JWT ID claim
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    # Foreign keys
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=True)
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+
+from app.models.base import BaseModel
+
+class UploadSession(BaseModel):
+    """Resumable upload in progress, becomes an Attachment once every byte has arrived"""
+    upload_id = Column(String(32), unique=True, index=True, nullable=False)  # Public, unguessable ID
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False)  # MIME type
+    size = Column(BigInteger, nullable=False)  # Declared total length in bytes
+    offset = Column(BigInteger, nullable=False, default=0)  # Bytes received and verified so far
+    expires_at = Column(DateTime, nullable=False, index=True)  # Extended by every chunk
+    
+    # Foreign keys
+    issue_id = Column(Integer, ForeignKey("issue.id", ondelete="CASCADE"), nullable=False)
+    uploader_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
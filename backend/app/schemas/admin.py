@@ -0,0 +1,20 @@
+from typing import Dict, Optional
+
+from app.schemas.base import BaseSchema, BaseAPIResponse
+
+class PoolStatus(BaseSchema):
+    """Schema for a database connection pool snapshot"""
+    pool_class: str
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    checkouts: Optional[int] = None
+    timeouts: Optional[int] = None
+    avg_wait_ms: Optional[float] = None
+    max_wait_ms: Optional[float] = None
+
+class PoolStatusResponse(BaseAPIResponse):
+    """API response with connection pool status per engine"""
+    data: Dict[str, PoolStatus]
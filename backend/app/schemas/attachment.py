@@ -31,6 +31,7 @@ class AttachmentCreate(AttachmentBase):
     """Schema for creating an attachment"""
     issue_id: int
     file_path: str
+    sha256: Optional[str] = None
 
 class AttachmentInDB(AttachmentBase):
     """Schema for attachment data from database"""
@@ -38,17 +39,28 @@ class AttachmentInDB(AttachmentBase):
     issue_id: int
     uploader_id: int
     file_path: str
+    sha256: Optional[str] = None
     created_at: datetime
 
 class AttachmentWithUser(AttachmentInDB):
     """Schema for attachment with user data"""
     uploader: dict  # Simplified user info
     is_previewable: bool
+    has_thumbnail: bool = False  # Fetch /attachments/{id}/thumbnail?size= for list views
 
 class AttachmentResponse(BaseAPIResponse):
     """API response with attachment data"""
     data: AttachmentWithUser
 
+class DownloadUrl(BaseSchema):
+    """Short-lived link to an attachment's file"""
+    url: str
+    expires_in: int  # Seconds
+
+class DownloadUrlResponse(BaseAPIResponse):
+    """API response with a download link"""
+    data: DownloadUrl
+
 class AttachmentsResponse(BaseAPIResponse):
     """API response with multiple attachments"""
     data: List[AttachmentWithUser]
@@ -1,7 +1,13 @@
 from datetime import datetime
+from enum import Enum
 from typing import Optional
 from pydantic import BaseModel, ConfigDict
 
+class ContentFormat(str, Enum):
+    """How Markdown fields are returned, html adds their sanitized renderings"""
+    MARKDOWN = "markdown"
+    HTML = "html"
+
 class BaseSchema(BaseModel):
     """Base schema with common configuration"""
     model_config = ConfigDict(from_attributes=True)
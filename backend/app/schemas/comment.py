@@ -7,9 +7,8 @@ from app.schemas.base import BaseSchema, BaseAPIResponse
 
 # Custom validator functions
 def clean_comment(v: str) -> str:
-    """Clean and sanitize comment content"""
-    # Basic sanitization - in a real app, use a proper HTML sanitizer
-    return v.replace('<script>', '').replace('</script>', '')
+    """Normalize line endings, the source is kept as written and sanitized when rendered to HTML"""
+    return v.replace('\r\n', '\n')
 
 class CommentBase(BaseSchema):
     """Base schema for comment data"""
@@ -30,6 +29,7 @@ class CommentInDB(CommentBase):
     user_id: int
     created_at: datetime
     updated_at: datetime
+    content_html: Optional[str] = None  # Only with format=html
 
 class CommentWithUser(CommentInDB):
     """Schema for comment with user data"""
@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import List, Optional
+
+from app.models.feed_entry import FeedEventType
+from app.schemas.base import BaseSchema, BaseAPIResponse
+
+class FeedEntryInDB(BaseSchema):
+    """Schema for activity in a user's feed"""
+    id: int
+    event_type: FeedEventType
+    object_id: int  # ID of the history entry, comment or attachment
+    summary: str
+    issue_id: int
+    issue_title: str
+    actor_id: int
+    created_at: datetime
+
+class FeedResponse(BaseAPIResponse):
+    """API response with a page of the feed, pass next_cursor as before to get the next one"""
+    data: List[FeedEntryInDB]
+    next_cursor: Optional[int] = None
@@ -9,11 +9,10 @@ from app.schemas.base import BaseSchema, BaseAPIResponse
 
 # Custom validator functions
 def clean_markdown(v: Optional[str]) -> Optional[str]:
-    """Clean and sanitize markdown content"""
+    """Normalize line endings, the source is kept as written and sanitized when rendered to HTML"""
     if v is None:
         return v
-    # Basic sanitization - in a real app, use a proper HTML sanitizer
-    return v.replace('<script>', '').replace('</script>', '')
+    return v.replace('\r\n', '\n')
 
 class IssueBase(BaseSchema):
     """Base schema for issue data"""
@@ -64,6 +63,7 @@ class IssueInDB(IssueBase):
     assignee_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
+    description_html: Optional[str] = None  # Only with format=html
 
 class IssueWithRelations(IssueInDB):
     """Schema for issue with related data"""
@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Dict, Optional
+from pydantic import Field, AfterValidator
+from typing_extensions import Annotated
+
+from app.schemas.attachment import validate_file_extension, validate_filename
+from app.schemas.base import BaseSchema, BaseAPIResponse
+
+class UploadSessionCreate(BaseSchema):
+    """Schema for starting a resumable upload"""
+    issue_id: int
+    filename: Annotated[str, AfterValidator(validate_filename), AfterValidator(validate_file_extension)]
+    content_type: str = "application/octet-stream"
+    size: int = Field(..., gt=0, description="Total length of the file in bytes")
+
+class UploadSessionInDB(BaseSchema):
+    """Schema for resumable upload data from database"""
+    upload_id: str
+    issue_id: int
+    filename: str
+    content_type: str
+    size: int
+    offset: int
+    expires_at: datetime
+    created_at: datetime
+
+class UploadSessionResponse(BaseAPIResponse):
+    """API response with resumable upload data"""
+    data: UploadSessionInDB
+
+class DirectUploadCreate(BaseSchema):
+    """Schema for uploading a file straight to storage, identified by its content hash"""
+    issue_id: int
+    filename: Annotated[str, AfterValidator(validate_filename), AfterValidator(validate_file_extension)]
+    content_type: str = "application/octet-stream"
+    size: int = Field(..., gt=0, description="Length of the file in bytes")
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$", description="Hex SHA-256 of the file")
+
+class DirectUpload(BaseSchema):
+    """Presigned request for a direct upload, omitted when storage already has the content"""
+    exists: bool
+    upload_method: Optional[str] = None
+    upload_url: Optional[str] = None
+    upload_headers: Dict[str, str] = {}  # Must be sent exactly as given
+    expires_in: Optional[int] = None
+
+class DirectUploadResponse(BaseAPIResponse):
+    """API response with a presigned direct upload"""
+    data: DirectUpload
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import time
+
+from app.core.config import settings
+from app.crud.issue_crud import IssueAccess, get_issue_access
+from app.db.database import AsyncSessionLocal, recent_writes
+from app.db.routing import bind_session_user
+from app.models.user import UserRole
+
+# Access decisions returned for subscribe requests
+ACCESS_ALLOWED = "allowed"
+ACCESS_FORBIDDEN = "forbidden"
+ACCESS_NOT_FOUND = "not_found"
+
+class IssueAccessCache:
+    """Bounded LRU cache of (user_id, issue_id) -> allowed decisions with a TTL"""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[bool, float]]" = OrderedDict()
+    
+    def get(self, user_id: str, issue_id: int) -> Optional[bool]:
+        """Get a cached decision, or None if missing or expired"""
+        key = (str(user_id), issue_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        allowed, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return allowed
+    
+    def set(self, user_id: str, issue_id: int, allowed: bool):
+        """Cache a decision, evicting the least recently used entry when full"""
+        key = (str(user_id), issue_id)
+        self._entries[key] = (allowed, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def invalidate_issue(self, issue_id: int):
+        """Drop cached decisions for an issue"""
+        for key in [key for key in self._entries if key[1] == issue_id]:
+            del self._entries[key]
+    
+    def invalidate_user(self, user_id: str):
+        """Drop cached decisions for a user"""
+        user_id = str(user_id)
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+    
+    def clear(self):
+        """Drop all cached decisions"""
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+async def load_issue_access(issue_ids: List[int], user_id: str) -> IssueAccess:
+    """Load the user's current role with the issues' reporter IDs, using a short-lived async session"""
+    if not str(user_id).isdigit():
+        return IssueAccess(role=None, is_active=False, reporter_ids={})
+    async with AsyncSessionLocal() as db:
+        # Lets a user subscribe to an issue they just created before the replica has it
+        bind_session_user(db.info, user_id, recent_writes)
+        return await get_issue_access(db, user_id=int(user_id), issue_ids=issue_ids)
+
+async def load_user_role(user_id: str) -> Optional[UserRole]:
+    """The user's current role from the database, None when the user is missing or inactive"""
+    access = await load_issue_access([], user_id)
+    return access.role if access.is_active else None
+
+def may_see_issue(access: IssueAccess, user_id: str, reporter_id: int) -> bool:
+    """Whether a user may see an issue, denying users whose role is unknown"""
+    if not access.is_active:
+        return False
+    if access.role in (UserRole.ADMIN, UserRole.MAINTAINER):
+        return True
+    # Reporters can only see their own issues, as in get_issues
+    return access.role == UserRole.REPORTER and str(reporter_id) == str(user_id)
+
+async def check_issue_access(user_id: str, issue_ids: List[int]) -> Dict[int, str]:
+    """Decide which issues a user may subscribe to, using the cache before the database"""
+    decisions: Dict[int, str] = {}
+    missing: List[int] = []
+    for issue_id in issue_ids:
+        allowed = access_cache.get(user_id, issue_id)
+        if allowed is None:
+            missing.append(issue_id)
+        else:
+            decisions[issue_id] = ACCESS_ALLOWED if allowed else ACCESS_FORBIDDEN
+    
+    if missing:
+        # The role comes from the database, not the token, so demoted and deactivated users lose access
+        access = await load_issue_access(missing, user_id)
+        for issue_id in missing:
+            if issue_id not in access.reporter_ids:
+                # Not cached, the issue may still be created later
+                decisions[issue_id] = ACCESS_NOT_FOUND
+                continue
+            allowed = may_see_issue(access, user_id, access.reporter_ids[issue_id])
+            access_cache.set(user_id, issue_id, allowed)
+            decisions[issue_id] = ACCESS_ALLOWED if allowed else ACCESS_FORBIDDEN
+    
+    return decisions
+
+# Create a global access cache instance
+access_cache = IssueAccessCache(
+    max_size=settings.WS_ACCESS_CACHE_SIZE,
+    ttl_seconds=settings.WS_ACCESS_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models.issue import IssueSeverity, IssueStatus
+from app.models.user import UserRole
+
+# Issue fields a filter can match on
+FILTER_FIELDS = ("status", "severity", "assignee_id", "reporter_id", "tag")
+
+class FilterError(ValueError):
+    """Raised when a filter subscription is invalid or not permitted"""
+
+def normalize_filter(raw_filter: Any, user_id: str, role: Optional[str]) -> Dict[str, Set[Any]]:
+    """Validate a client filter into field -> accepted values, applying reporter RBAC scoping"""
+    if role not in {known.value for known in UserRole}:
+        # Without a known role there is no scope to apply, so nothing is matched
+        raise FilterError("Not enough permissions")
+    if not isinstance(raw_filter, dict) or not raw_filter:
+        raise FilterError("Filter must be a non-empty object")
+    
+    predicates: Dict[str, Set[Any]] = {}
+    for field, raw_values in raw_filter.items():
+        if field not in FILTER_FIELDS:
+            raise FilterError(f"Unsupported filter field: {field}")
+        values = raw_values if isinstance(raw_values, list) else [raw_values]
+        if not values:
+            raise FilterError(f"Filter field {field} needs at least one value")
+        
+        if field == "status":
+            allowed = {status.value for status in IssueStatus}
+        elif field == "severity":
+            allowed = {severity.value for severity in IssueSeverity}
+        else:
+            allowed = None
+        
+        normalized: Set[Any] = set()
+        for value in values:
+            if field in ("assignee_id", "reporter_id"):
+                # "me" lets a client filter on its own user without knowing the id
+                value = str(user_id) if value == "me" else str(value)
+            elif not isinstance(value, str) or (allowed is not None and value not in allowed):
+                raise FilterError(f"Invalid value for {field}: {value}")
+            normalized.add(value)
+        predicates[field] = normalized
+    
+    # Reporters can only see their own issues, as in get_issues
+    if role == UserRole.REPORTER.value:
+        if predicates.get("reporter_id", {str(user_id)}) != {str(user_id)}:
+            raise FilterError("Not enough permissions")
+        predicates["reporter_id"] = {str(user_id)}
+    
+    return predicates
+
+def issue_filter_values(issue: Dict[str, Any]) -> Iterable[Tuple[str, Any]]:
+    """List the (field, value) pairs of an issue event that filters can match"""
+    for field in ("status", "severity"):
+        if issue.get(field) is not None:
+            yield field, issue[field]
+    for field in ("assignee_id", "reporter_id"):
+        if issue.get(field) is not None:
+            yield field, str(issue[field])
+    for tag in issue.get("tags") or []:
+        yield "tag", tag
+
+class FilterIndex:
+    """Inverted index from (field, value) to filter ids, so events touch only candidate filters"""
+    
+    def __init__(self):
+        self._next_id = 1
+        # (field, value) -> ids of filters accepting that value
+        self._postings: Dict[Tuple[str, Any], Set[int]] = defaultdict(set)
+        # filter_id -> (owner user_id, predicates)
+        self.filters: Dict[int, Tuple[str, Dict[str, Set[Any]]]] = {}
+    
+    def add(self, user_id: str, predicates: Dict[str, Set[Any]]) -> int:
+        """Index a filter and return its id"""
+        filter_id = self._next_id
+        self._next_id += 1
+        self.filters[filter_id] = (str(user_id), predicates)
+        for field, values in predicates.items():
+            for value in values:
+                self._postings[(field, value)].add(filter_id)
+        return filter_id
+    
+    def remove(self, filter_id: int) -> Optional[str]:
+        """Remove a filter from the index, returning its owner"""
+        entry = self.filters.pop(filter_id, None)
+        if entry is None:
+            return None
+        user_id, predicates = entry
+        for field, values in predicates.items():
+            for value in values:
+                posting = self._postings.get((field, value))
+                if posting is not None:
+                    posting.discard(filter_id)
+                    if not posting:
+                        del self._postings[(field, value)]
+        return user_id
+    
+    def match(self, issue: Dict[str, Any]) -> Dict[str, List[int]]:
+        """Find filters matching an issue, grouped by owner user_id"""
+        matched_fields: Dict[int, Set[str]] = defaultdict(set)
+        for field, value in issue_filter_values(issue):
+            for filter_id in self._postings.get((field, value), ()):
+                matched_fields[filter_id].add(field)
+        
+        # A filter matches when every one of its fields has a matching value
+        matches: Dict[str, List[int]] = defaultdict(list)
+        for filter_id, fields in matched_fields.items():
+            user_id, predicates = self.filters[filter_id]
+            if len(fields) == len(predicates):
+                matches[user_id].append(filter_id)
+        return {user_id: sorted(filter_ids) for user_id, filter_ids in matches.items()}
+    
+    def __len__(self) -> int:
+        return len(self.filters)
@@ -1,36 +1,228 @@
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Any, Optional, Set, Tuple
 from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+import asyncio
 import json
-from uuid import UUID
+import logging
+import sys
+import time
+from uuid import UUID, uuid4
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from app.core.config import settings
+from app.websockets.filters import FilterIndex
+from app.core.metrics import (
+    WS_BROADCASTS, WS_BROADCAST_RECIPIENTS, WS_BROADCAST_BYTES,
+    WS_BROADCAST_ENCODE_SECONDS, WS_BROADCAST_SEND_SECONDS,
+    WS_ACTIVE_CONNECTIONS, WS_ACTIVE_USERS, WS_ISSUE_SUBSCRIPTIONS,
+    WS_BOOKKEEPING_BYTES_PER_CONNECTION, WS_REAPED_CONNECTIONS, WS_REJECTED_CONNECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+# Entity payload key carried by each event type
+EVENT_ENTITY_KEYS = {
+    "issue_update": "issue",
+    "comment_update": "comment",
+    "attachment_update": "attachment",
+}
+
+def encode_message(message: Any) -> str:
+    """Serialize a message to JSON text, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"))
+
+def merge_update_types(previous: str, current: str) -> str:
+    """Combine two update types for the same entity into one"""
+    if current == "deleted" or previous == "deleted":
+        return "deleted"
+    if previous == "created":
+        return "created"
+    return current
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        coalesce_window: Optional[float] = None,
+        heartbeat_interval: Optional[float] = None,
+        heartbeat_timeout: Optional[float] = None
+    ):
         # Store active connections by user_id
         self.active_connections: Dict[UUID, List[WebSocket]] = {}
         # Store active issue subscriptions by user_id
         self.issue_subscriptions: Dict[UUID, List[int]] = {}
+        # Filter subscriptions, indexed by predicate value, and their ids by user_id
+        self.filter_index = FilterIndex()
+        self.user_filters: Dict[UUID, List[int]] = {}
+        # Monotonic time of the last frame received on each connection
+        self.last_seen: Dict[WebSocket, float] = {}
+        # Seconds to hold per-issue events before flushing them as one frame
+        self.coalesce_window = (
+            settings.WS_COALESCE_WINDOW_MS / 1000 if coalesce_window is None else coalesce_window
+        )
+        # Seconds between server pings, 0 disables the heartbeat and reaper
+        self.heartbeat_interval = (
+            settings.WS_HEARTBEAT_INTERVAL_SECONDS if heartbeat_interval is None else heartbeat_interval
+        )
+        # Seconds without any client frame before a connection is reaped
+        self.heartbeat_timeout = (
+            settings.WS_HEARTBEAT_TIMEOUT_SECONDS if heartbeat_timeout is None else heartbeat_timeout
+        )
+        self.max_connections = settings.WS_MAX_CONNECTIONS
+        self.max_connections_per_user = settings.WS_MAX_CONNECTIONS_PER_USER
+        self.max_subscriptions_per_user = settings.WS_MAX_SUBSCRIPTIONS_PER_USER
+        self.max_filters_per_user = settings.WS_MAX_FILTERS_PER_USER
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Sequence numbers restart with every process, clients compare epochs before resuming
+        self.epoch = uuid4().hex
+        self.seq = 0
+        # Recent issue frames as (seq, issue_id, frame) for replay after a reconnect
+        self.replay_buffer: Deque[Tuple[int, int, Dict[str, Any]]] = deque(
+            maxlen=settings.WS_REPLAY_BUFFER_SIZE
+        )
+        # Seq at which each issue last had a frame nobody received, so resuming clients resync instead
+        self._unrecorded: "OrderedDict[int, int]" = OrderedDict()
+        # Highest seq forgotten from _unrecorded, gaps before it may hide unrecorded frames
+        self._unrecorded_floor = -1
+        # Pending events by issue_id, keyed by (event type, entity id) in arrival order
+        self._pending_events: Dict[int, Dict[Tuple[str, Any], Dict[str, Any]]] = {}
+        self._flush_tasks: Dict[int, asyncio.Task] = {}
+        # Last entity state sent to subscribers, by issue_id then (event type, entity id)
+        self._snapshots: Dict[int, Dict[Tuple[str, Any], Dict[str, Any]]] = {}
     
-    async def connect(self, websocket: WebSocket, user_id: UUID):
-        """Connect a user's WebSocket"""
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, user_id: UUID) -> bool:
+        """Connect a user's WebSocket, returning False when a connection cap is reached"""
+        if websocket.client_state == WebSocketState.CONNECTING:
+            await websocket.accept()
+        
+        if self.connection_count() >= self.max_connections:
+            WS_REJECTED_CONNECTIONS.labels(reason="global_limit").inc()
+            return False
+        if len(self.active_connections.get(user_id, [])) >= self.max_connections_per_user:
+            WS_REJECTED_CONNECTIONS.labels(reason="user_limit").inc()
+            return False
+        
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
         self.active_connections[user_id].append(websocket)
+        self.touch(websocket)
+        self._ensure_heartbeat()
+        return True
     
     def disconnect(self, websocket: WebSocket, user_id: UUID):
-        """Disconnect a user's WebSocket"""
+        """Disconnect a user's WebSocket, dropping subscriptions with the user's last connection"""
+        self.last_seen.pop(websocket, None)
         if user_id in self.active_connections:
             if websocket in self.active_connections[user_id]:
                 self.active_connections[user_id].remove(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
+        if user_id not in self.active_connections:
+            for issue_id in self.issue_subscriptions.get(user_id, [])[:]:
+                self.unsubscribe_from_issue(user_id, issue_id)
+            for filter_id in self.user_filters.get(user_id, [])[:]:
+                self.remove_filter(user_id, filter_id)
+    
+    def touch(self, websocket: WebSocket):
+        """Record activity on a connection"""
+        self.last_seen[websocket] = time.monotonic()
+    
+    def connection_count(self) -> int:
+        """Count open connections across all users"""
+        return sum(len(connections) for connections in self.active_connections.values())
+    
+    def subscription_count(self) -> int:
+        """Count issue subscriptions across all users"""
+        return sum(len(subscriptions) for subscriptions in self.issue_subscriptions.values())
+    
+    def bookkeeping_bytes(self) -> int:
+        """Shallow size of the bookkeeping containers, not of the sockets, frames or entity snapshots in them"""
+        size = sys.getsizeof(self.active_connections) + sys.getsizeof(self.issue_subscriptions)
+        size += sys.getsizeof(self.last_seen)
+        size += sum(sys.getsizeof(connections) for connections in self.active_connections.values())
+        size += sum(sys.getsizeof(subscriptions) for subscriptions in self.issue_subscriptions.values())
+        size += sum(sys.getsizeof(pending) for pending in self._pending_events.values())
+        size += sum(sys.getsizeof(snapshots) for snapshots in self._snapshots.values())
+        size += sys.getsizeof(self.filter_index.filters) + sys.getsizeof(self.user_filters)
+        return size
+    
+    def bookkeeping_bytes_per_connection(self) -> float:
+        """Average shallow bookkeeping size per open connection"""
+        return self.bookkeeping_bytes() / max(self.connection_count(), 1)
+    
+    def _ensure_heartbeat(self):
+        """Start the heartbeat loop on the running event loop if it is not already running"""
+        if self.heartbeat_interval <= 0:
+            return
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+    
+    async def _heartbeat_loop(self):
+        """Ping every connection and reap the ones that stopped answering"""
+        while self.active_connections:
+            await asyncio.sleep(self.heartbeat_interval)
+            await self.reap_idle_connections()
+            await self.ping_all()
+    
+    async def reap_idle_connections(self) -> int:
+        """Close and purge connections with no client frame within the heartbeat timeout"""
+        deadline = time.monotonic() - self.heartbeat_timeout
+        idle = [
+            (user_id, connection)
+            for user_id, connections in list(self.active_connections.items())
+            for connection in connections
+            if self.last_seen.get(connection, 0) < deadline
+        ]
+        for user_id, connection in idle:
+            await self._drop_connection(connection, user_id, reason="idle")
+        return len(idle)
     
-    def subscribe_to_issue(self, user_id: UUID, issue_id: int):
-        """Subscribe user to issue updates"""
+    async def ping_all(self):
+        """Ping every connection, sent directly so heartbeats stay out of the broadcast metrics"""
+        text = encode_message({"type": "ping"})
+        for user_id, connections in list(self.active_connections.items()):
+            for connection in connections[:]:
+                try:
+                    await connection.send_text(text)
+                except Exception:
+                    await self._drop_connection(connection, user_id, reason="send_failed")
+    
+    async def _drop_connection(self, websocket: WebSocket, user_id: UUID, reason: str):
+        """Purge a dead connection and close it if the socket still allows it"""
+        self.disconnect(websocket, user_id)
+        WS_REAPED_CONNECTIONS.labels(reason=reason).inc()
+        try:
+            await websocket.close(code=1001)  # Going away
+        except Exception:
+            pass
+    
+    def subscribe_to_issue(self, user_id: UUID, issue_id: int) -> bool:
+        """Subscribe user to issue updates, returning False when the user's cap is reached"""
         if user_id not in self.issue_subscriptions:
             self.issue_subscriptions[user_id] = []
         if issue_id not in self.issue_subscriptions[user_id]:
+            if len(self.issue_subscriptions[user_id]) >= self.max_subscriptions_per_user:
+                return False
             self.issue_subscriptions[user_id].append(issue_id)
+        return True
+    
+    def issue_snapshot(self, issue_id: int) -> Optional[Dict[str, Any]]:
+        """Frame with the full state behind an issue's deltas, None when nothing has been sent yet"""
+        snapshots = self._snapshots.get(issue_id)
+        if not snapshots:
+            return None
+        events = [
+            {"type": event_type, EVENT_ENTITY_KEYS[event_type]: dict(entity), "delta": False}
+            for (event_type, _), entity in snapshots.items()
+        ]
+        # Later frames with a higher seq are deltas against this state
+        return {"type": "snapshot", "issue_id": issue_id, "events": events, "seq": self.seq}
     
     def unsubscribe_from_issue(self, user_id: UUID, issue_id: int):
         """Unsubscribe user from issue updates"""
@@ -39,23 +231,206 @@ class ConnectionManager:
                 self.issue_subscriptions[user_id].remove(issue_id)
             if not self.issue_subscriptions[user_id]:
                 del self.issue_subscriptions[user_id]
+        if not self.has_issue_subscribers(issue_id):
+            self._snapshots.pop(issue_id, None)
+    
+    def add_filter(self, user_id: UUID, predicates: Dict[str, Any]) -> Optional[int]:
+        """Subscribe user to issues matching a filter, returning None when the user's cap is reached"""
+        if len(self.user_filters.get(user_id, [])) >= self.max_filters_per_user:
+            return None
+        filter_id = self.filter_index.add(user_id, predicates)
+        self.user_filters.setdefault(user_id, []).append(filter_id)
+        return filter_id
+    
+    def remove_filter(self, user_id: UUID, filter_id: int) -> bool:
+        """Remove one of the user's filter subscriptions"""
+        if filter_id not in self.user_filters.get(user_id, []):
+            return False
+        self.filter_index.remove(filter_id)
+        self.user_filters[user_id].remove(filter_id)
+        if not self.user_filters[user_id]:
+            del self.user_filters[user_id]
+        return True
+    
+    def has_issue_subscribers(self, issue_id: int) -> bool:
+        """Check if any user is subscribed to an issue"""
+        return any(issue_id in subscriptions for subscriptions in self.issue_subscriptions.values())
     
     async def send_personal_message(self, message: Any, user_id: UUID):
         """Send message to a specific user"""
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_json(message)
+        await self._send_to_users(message, [user_id], scope="user")
     
     async def broadcast_to_issue_subscribers(self, message: Any, issue_id: int):
-        """Send message to all subscribers of an issue"""
-        for user_id, subscriptions in self.issue_subscriptions.items():
-            if issue_id in subscriptions and user_id in self.active_connections:
-                await self.send_personal_message(message, user_id)
+        """Stamp message with the next sequence number and send it to all subscribers of an issue"""
+        message = self._record_issue_frame(message, issue_id)
+        user_ids = [
+            user_id for user_id, subscriptions in self.issue_subscriptions.items()
+            if issue_id in subscriptions
+        ]
+        await self._send_to_users(message, user_ids, scope="issue")
+    
+    def _skip_issue_frame(self, issue_id: int):
+        """Note that an issue frame was dropped unrecorded because nobody was subscribed"""
+        self._unrecorded[issue_id] = self.seq
+        self._unrecorded.move_to_end(issue_id)
+        if len(self._unrecorded) > self.replay_buffer.maxlen:
+            _, seq = self._unrecorded.popitem(last=False)
+            self._unrecorded_floor = max(self._unrecorded_floor, seq)
+    
+    def _record_issue_frame(self, message: Dict[str, Any], issue_id: int) -> Dict[str, Any]:
+        """Stamp an issue frame with a sequence number and keep it in the replay buffer"""
+        self.seq += 1
+        frame = {**message, "seq": self.seq}
+        self.replay_buffer.append((self.seq, issue_id, frame))
+        return frame
+    
+    def replay_since(self, epoch: Optional[str], last_seq: int, issue_ids: Set[int]) -> Optional[List[Dict[str, Any]]]:
+        """Get frames after last_seq for the issues, or None when the client must fully resync"""
+        if epoch != self.epoch or last_seq > self.seq:
+            return None
+        # Frames dropped while nobody was subscribed cannot be replayed
+        dropped = max([self._unrecorded_floor, *(self._unrecorded.get(issue_id, -1) for issue_id in issue_ids)])
+        if dropped >= last_seq:
+            return None
+        if last_seq == self.seq:
+            return []
+        # The gap is only recoverable if the buffer still holds the frame right after last_seq
+        if not self.replay_buffer or self.replay_buffer[0][0] > last_seq + 1:
+            return None
+        return [
+            frame for seq, issue_id, frame in self.replay_buffer
+            if seq > last_seq and issue_id in issue_ids
+        ]
     
     async def broadcast(self, message: Any):
         """Send message to all connected users"""
-        for user_id in self.active_connections:
-            await self.send_personal_message(message, user_id)
+        await self._send_to_users(message, list(self.active_connections), scope="all")
+    
+    async def _send_to_users(self, message: Any, user_ids: List[UUID], scope: str):
+        """Encode a message once and send the same text to every connection of the users"""
+        connections = [
+            (user_id, connection)
+            for user_id in user_ids
+            for connection in self.active_connections.get(user_id, [])
+        ]
+        if not connections:
+            return
+        
+        started = time.perf_counter()
+        text = encode_message(message)
+        encoded = time.perf_counter()
+        for user_id, connection in connections:
+            try:
+                await connection.send_text(text)
+            except Exception:
+                # A failed send means the peer is gone, don't let it block the others
+                await self._drop_connection(connection, user_id, reason="send_failed")
+        
+        WS_BROADCAST_ENCODE_SECONDS.observe(encoded - started)
+        WS_BROADCAST_SEND_SECONDS.observe(time.perf_counter() - encoded)
+        WS_BROADCASTS.labels(scope=scope).inc()
+        WS_BROADCAST_RECIPIENTS.labels(scope=scope).inc(len(connections))
+        WS_BROADCAST_BYTES.labels(scope=scope).inc(len(text.encode("utf-8")) * len(connections))
+    
+    async def publish_to_issue(self, message: Dict[str, Any], issue_id: int):
+        """Queue an entity event for issue subscribers, coalescing bursts into one delta frame"""
+        wanted_by_filters = message["type"] == "issue_update" and len(self.filter_index) > 0
+        if not wanted_by_filters and not self.has_issue_subscribers(issue_id):
+            # Nobody would receive it, so it is neither queued nor kept for replay
+            self._skip_issue_frame(issue_id)
+            return
+        
+        entity_key = EVENT_ENTITY_KEYS[message["type"]]
+        entity = message[entity_key]
+        event_key = (message["type"], entity["id"])
+        
+        pending = self._pending_events.setdefault(issue_id, {})
+        if event_key in pending:
+            # Later field values win, the update type keeps its strongest meaning
+            queued = pending[event_key]
+            queued["update_type"] = merge_update_types(queued["update_type"], message["update_type"])
+            queued[entity_key].update(entity)
+        else:
+            pending[event_key] = {**message, entity_key: dict(entity)}
+        
+        if self.coalesce_window <= 0:
+            await self.flush_issue(issue_id)
+        elif issue_id not in self._flush_tasks:
+            self._flush_tasks[issue_id] = asyncio.create_task(self._flush_after_window(issue_id))
+    
+    async def _flush_after_window(self, issue_id: int):
+        """Flush an issue's pending events once the coalescing window closes"""
+        try:
+            await asyncio.sleep(self.coalesce_window)
+        finally:
+            self._flush_tasks.pop(issue_id, None)
+        await self.flush_issue(issue_id)
+    
+    async def flush_issue(self, issue_id: int):
+        """Send pending events for an issue as a single frame of deltas"""
+        pending = self._pending_events.pop(issue_id, None)
+        if not pending:
+            return
+        
+        subscribed = self.has_issue_subscribers(issue_id)
+        # Deltas need a live baseline, keep snapshots only while someone listens
+        snapshots = self._snapshots.setdefault(issue_id, {}) if subscribed else {}
+        events = []
+        filter_matches: Dict[UUID, List[Tuple[List[int], Dict[str, Any]]]] = {}
+        for event_key, event in pending.items():
+            entity_key = EVENT_ENTITY_KEYS[event["type"]]
+            entity = event[entity_key]
+            
+            previous = snapshots.get(event_key)
+            is_delta = True
+            
+            if event["update_type"] == "deleted":
+                snapshots.pop(event_key, None)
+                delta = {"id": entity["id"]}
+            elif previous is None or event["update_type"] == "created":
+                snapshots[event_key] = dict(entity)
+                delta = dict(entity)
+                is_delta = False
+            else:
+                delta = {
+                    field: value for field, value in entity.items()
+                    if field == "id" or previous.get(field) != value
+                }
+                previous.update(entity)
+                # Nothing changed since the last frame, skip it entirely
+                if len(delta) == 1:
+                    continue
+            
+            # Filters match the full merged issue state, deltas would miss unchanged fields
+            if event["type"] == "issue_update" and len(self.filter_index):
+                for user_id, filter_ids in self.filter_index.match(entity).items():
+                    filter_matches.setdefault(user_id, []).append((filter_ids, event))
+            
+            events.append({**event, entity_key: delta, "delta": is_delta})
+        
+        if events and not subscribed:
+            self._skip_issue_frame(issue_id)
+        elif events:
+            if len(events) == 1:
+                frame = events[0]
+            else:
+                frame = {"type": "batch", "issue_id": issue_id, "events": events}
+            await self.broadcast_to_issue_subscribers(frame, issue_id)
+        
+        # Filter matches are best-effort, they carry no seq and are not replayed after a reconnect
+        for user_id, matches in filter_matches.items():
+            for filter_ids, event in matches:
+                await self._send_to_users(
+                    {"type": "filter_match", "filter_ids": filter_ids, "event": event},
+                    [user_id],
+                    scope="filter"
+                )
 
 # Create a global connection manager instance
 manager = ConnectionManager()
+
+# Report live connection gauges from the global manager
+WS_ACTIVE_CONNECTIONS.set_function(manager.connection_count)
+WS_ACTIVE_USERS.set_function(lambda: len(manager.active_connections))
+WS_ISSUE_SUBSCRIPTIONS.set_function(manager.subscription_count)
+WS_BOOKKEEPING_BYTES_PER_CONNECTION.set_function(manager.bookkeeping_bytes_per_connection)
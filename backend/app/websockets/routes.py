@@ -1,12 +1,14 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+import asyncio
 import json
 
-from app.db.database import SessionLocal
+from app.core.config import settings
 from app.core.security import decode_jwt_token
+from app.websockets.access import check_issue_access, load_user_role, ACCESS_ALLOWED, ACCESS_FORBIDDEN, ACCESS_NOT_FOUND
+from app.websockets.filters import normalize_filter, FilterError
 from app.websockets.manager import manager
-from app.crud.issue_crud import get_issue
 from app.models.user import User
 from app.models.issue import Issue
 
@@ -20,6 +22,58 @@ async def get_current_user_from_token(token: str) -> Optional[Dict[str, Any]]:
     except Exception:
         return None
 
+def parse_issue_ids(message: Dict[str, Any]) -> List[int]:
+    """Read issue_id or issue_ids from a message, dropping invalid and duplicate values"""
+    raw_ids = message.get("issue_ids")
+    if raw_ids is None:
+        raw_ids = [message.get("issue_id")]
+    if not isinstance(raw_ids, list):
+        return []
+    
+    issue_ids: List[int] = []
+    for raw_id in raw_ids[:settings.WS_MAX_BATCH_SUBSCRIBE]:
+        if isinstance(raw_id, int) and not isinstance(raw_id, bool) and raw_id > 0 and raw_id not in issue_ids:
+            issue_ids.append(raw_id)
+    return issue_ids
+
+async def subscribe_to_issues(user_id: str, issue_ids: List[int]) -> Tuple[List[int], List[int], Dict[int, str]]:
+    """Subscribe a user to the issues they may see, returning subscribed, allowed and all decisions"""
+    decisions = await check_issue_access(user_id, issue_ids)
+    allowed = [
+        issue_id for issue_id in issue_ids
+        if decisions[issue_id] == ACCESS_ALLOWED
+    ]
+    subscribed = [
+        issue_id for issue_id in allowed
+        if manager.subscribe_to_issue(user_id, issue_id)
+    ]
+    return subscribed, allowed, decisions
+
+async def resume_session(websocket: WebSocket, user_id: str, auth_message: Dict[str, Any]):
+    """Restore subscriptions from the auth message and replay the frames missed since last_seq"""
+    subscribed, _, _ = await subscribe_to_issues(user_id, parse_issue_ids(auth_message))
+    
+    # No await between subscribing and collecting the replay, so live frames can only follow it
+    last_seq = auth_message.get("last_seq")
+    frames = None
+    if isinstance(last_seq, int) and not isinstance(last_seq, bool):
+        frames = manager.replay_since(auth_message.get("epoch"), last_seq, set(subscribed))
+    
+    if frames is None:
+        # Gap is too old or from another server process, the client must refetch
+        await websocket.send_json({
+            "type": "resync",
+            "issue_ids": subscribed,
+            "seq": manager.seq
+        })
+    else:
+        await websocket.send_json({
+            "type": "replay",
+            "issue_ids": subscribed,
+            "events": frames,
+            "seq": manager.seq
+        })
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time updates"""
@@ -28,7 +82,13 @@ async def websocket_endpoint(websocket: WebSocket):
     
     try:
         # First message should contain the auth token
-        auth_message = await websocket.receive_json()
+        try:
+            auth_message = await asyncio.wait_for(
+                websocket.receive_json(), timeout=settings.WS_HEARTBEAT_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            await websocket.close(code=1008)  # Policy violation
+            return
         token = auth_message.get("token")
         
         if not token:
@@ -50,36 +110,66 @@ async def websocket_endpoint(websocket: WebSocket):
             return
         
         # Register connection
-        await manager.connect(websocket, user_id)
-        await websocket.send_json({"message": "Connected successfully"})
+        if not await manager.connect(websocket, user_id):
+            await websocket.send_json({"error": "Too many connections"})
+            await websocket.close(code=1013)  # Try again later
+            return
+        await websocket.send_json({
+            "message": "Connected successfully",
+            "epoch": manager.epoch,
+            "seq": manager.seq
+        })
+        
+        # Resume a previous session when the client reports the last sequence number it saw
+        if "last_seq" in auth_message:
+            await resume_session(websocket, user_id, auth_message)
         
         # Handle messages
         try:
             while True:
                 message = await websocket.receive_json()
+                manager.touch(websocket)
                 
-                # Handle subscription requests
+                # Handle subscription requests, for one issue_id or a batch of issue_ids
                 if message.get("type") == "subscribe":
-                    issue_id = message.get("issue_id")
-                    if issue_id:
-                        # Validate issue exists and user has access
-                        db = SessionLocal()
-                        try:
-                            issue = get_issue(db, issue_id=issue_id)
-                            if issue:
-                                manager.subscribe_to_issue(user_id, issue_id)
-                                await websocket.send_json({
-                                    "type": "subscription",
-                                    "status": "subscribed",
-                                    "issue_id": issue_id
-                                })
-                            else:
-                                await websocket.send_json({
-                                    "type": "error",
-                                    "message": "Issue not found"
-                                })
-                        finally:
-                            db.close()
+                    issue_ids = parse_issue_ids(message)
+                    if issue_ids:
+                        subscribed, allowed, decisions = await subscribe_to_issues(user_id, issue_ids)
+                        # Built before any await, so each baseline is exactly the state its seq describes
+                        snapshots = [manager.issue_snapshot(issue_id) for issue_id in subscribed]
+                        for snapshot in filter(None, snapshots):
+                            await websocket.send_json(snapshot)
+                        
+                        if "issue_ids" in message:
+                            await websocket.send_json({
+                                "type": "subscription",
+                                "status": "subscribed",
+                                "issue_ids": subscribed,
+                                "not_found": [i for i in issue_ids if decisions[i] == ACCESS_NOT_FOUND],
+                                "forbidden": [i for i in issue_ids if decisions[i] == ACCESS_FORBIDDEN],
+                                "limited": [i for i in allowed if i not in subscribed]
+                            })
+                        elif subscribed:
+                            await websocket.send_json({
+                                "type": "subscription",
+                                "status": "subscribed",
+                                "issue_id": issue_ids[0]
+                            })
+                        elif allowed:
+                            await websocket.send_json({
+                                "type": "error",
+                                "message": "Subscription limit reached"
+                            })
+                        elif decisions[issue_ids[0]] == ACCESS_FORBIDDEN:
+                            await websocket.send_json({
+                                "type": "error",
+                                "message": "Not enough permissions"
+                            })
+                        else:
+                            await websocket.send_json({
+                                "type": "error",
+                                "message": "Issue not found"
+                            })
                 
                 # Handle unsubscribe requests
                 elif message.get("type") == "unsubscribe":
@@ -92,11 +182,49 @@ async def websocket_endpoint(websocket: WebSocket):
                             "issue_id": issue_id
                         })
                 
+                # Handle filter subscriptions, e.g. {"severity": "CRITICAL"} or {"assignee_id": "me"}
+                elif message.get("type") == "subscribe_filter":
+                    try:
+                        role = await load_user_role(user_id)
+                        predicates = normalize_filter(message.get("filter"), user_id, role)
+                    except FilterError as e:
+                        await websocket.send_json({"type": "error", "message": str(e)})
+                        continue
+                    filter_id = manager.add_filter(user_id, predicates)
+                    if filter_id is None:
+                        await websocket.send_json({
+                            "type": "error",
+                            "message": "Subscription limit reached"
+                        })
+                    else:
+                        await websocket.send_json({
+                            "type": "subscription",
+                            "status": "subscribed",
+                            "filter_id": filter_id
+                        })
+                
+                # Handle filter unsubscribe requests
+                elif message.get("type") == "unsubscribe_filter":
+                    filter_id = message.get("filter_id")
+                    if manager.remove_filter(user_id, filter_id):
+                        await websocket.send_json({
+                            "type": "subscription",
+                            "status": "unsubscribed",
+                            "filter_id": filter_id
+                        })
+                
                 # Handle ping to keep connection alive
                 elif message.get("type") == "ping":
                     await websocket.send_json({"type": "pong"})
                 
+                # Pongs answer server heartbeats, receiving them already marked the connection alive
+                elif message.get("type") == "pong":
+                    pass
+        
         except WebSocketDisconnect:
+            pass
+        finally:
+            # Purge the connection however the loop ended, not only on a clean disconnect
             manager.disconnect(websocket, user_id)
     
     except WebSocketDisconnect:
@@ -110,10 +238,10 @@ async def websocket_endpoint(websocket: WebSocket):
         except:
             pass
 
-# Helper function to send issue update to subscribers
-async def send_issue_update(issue: Issue, update_type: str):
-    """Send issue update to all subscribers"""
-    message = {
+# Helper functions to build entity events, usable before the entity is deleted
+def issue_update_message(issue: Issue, update_type: str) -> Dict[str, Any]:
+    """Build an issue update event"""
+    return {
         "type": "issue_update",
         "update_type": update_type,
         "issue": {
@@ -121,15 +249,16 @@ async def send_issue_update(issue: Issue, update_type: str):
             "title": issue.title,
             "status": issue.status.value,
             "severity": issue.severity.value,
+            "reporter_id": issue.reporter_id,
+            "assignee_id": issue.assignee_id,
+            "tags": [tag.name for tag in issue.tags],
             "updated_at": issue.updated_at.isoformat()
         }
     }
-    await manager.broadcast_to_issue_subscribers(message, issue.id)
 
-# Helper function to send comment update to issue subscribers
-async def send_comment_update(comment: Any, update_type: str):
-    """Send comment update to all issue subscribers"""
-    message = {
+def comment_update_message(comment: Any, update_type: str) -> Dict[str, Any]:
+    """Build a comment update event"""
+    return {
         "type": "comment_update",
         "update_type": update_type,
         "comment": {
@@ -140,12 +269,10 @@ async def send_comment_update(comment: Any, update_type: str):
             "created_at": comment.created_at.isoformat()
         }
     }
-    await manager.broadcast_to_issue_subscribers(message, comment.issue_id)
 
-# Helper function to send attachment update to issue subscribers
-async def send_attachment_update(attachment: Any, update_type: str):
-    """Send attachment update to all issue subscribers"""
-    message = {
+def attachment_update_message(attachment: Any, update_type: str) -> Dict[str, Any]:
+    """Build an attachment update event"""
+    return {
         "type": "attachment_update",
         "update_type": update_type,
         "attachment": {
@@ -156,4 +283,18 @@ async def send_attachment_update(attachment: Any, update_type: str):
             "created_at": attachment.created_at.isoformat()
         }
     }
-    await manager.broadcast_to_issue_subscribers(message, attachment.issue_id)
+
+# Helper function to send issue update to subscribers
+async def send_issue_update(issue: Issue, update_type: str):
+    """Send issue update to all subscribers, coalesced with other updates to the issue"""
+    await manager.publish_to_issue(issue_update_message(issue, update_type), issue.id)
+
+# Helper function to send comment update to issue subscribers
+async def send_comment_update(comment: Any, update_type: str):
+    """Send comment update to all issue subscribers"""
+    await manager.publish_to_issue(comment_update_message(comment, update_type), comment.issue_id)
+
+# Helper function to send attachment update to issue subscribers
+async def send_attachment_update(attachment: Any, update_type: str):
+    """Send attachment update to all issue subscribers"""
+    await manager.publish_to_issue(attachment_update_message(attachment, update_type), attachment.issue_id)
@@ -1,5 +1,5 @@
+import asyncio
 import logging
-import time
 from app.worker.scheduler import init_scheduler
 
 # Configure logging
@@ -9,20 +9,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def run():
+    """Run the scheduler until the worker is cancelled"""
+    # Initialize the scheduler, jobs run as tasks on this event loop
+    scheduler = init_scheduler()
+    
+    try:
+        # Keep the event loop alive
+        await asyncio.Event().wait()
+    finally:
+        logger.info("Shutting down background worker")
+        scheduler.shutdown()
+
 def main():
     """Main worker entry point"""
     logger.info("Starting background worker")
     
-    # Initialize the scheduler
-    scheduler = init_scheduler()
-    
     try:
-        # Keep the main thread alive
-        while True:
-            time.sleep(1)
+        asyncio.run(run())
     except (KeyboardInterrupt, SystemExit):
-        logger.info("Shutting down background worker")
-        scheduler.shutdown()
+        pass
 
 if __name__ == "__main__":
     main()
@@ -1,33 +1,83 @@
+import asyncio
 import logging
 from datetime import datetime, date, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
-from sqlalchemy.orm import Session
 
-from app.db.database import SessionLocal
+from app.core.blobs import blob_store
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, STATEMENT_TIMEOUT_KEY, primary_session
 from app.crud.stats_crud import create_or_update_daily_stats
+from app.crud.feed_crud import delete_expired_feed_entries
+from app.crud.orphan_crud import collect_orphaned_files
+from app.crud.token_crud import delete_expired_revoked_tokens
+from app.crud.upload_crud import get_expired_upload_sessions
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_daily_stats():
+async def generate_daily_stats():
     """Generate daily statistics for yesterday"""
     yesterday = date.today() - timedelta(days=1)
     logger.info(f"Generating daily statistics for {yesterday}")
     
-    db = SessionLocal()
-    try:
-        stats = create_or_update_daily_stats(db, stats_date=yesterday)
-        logger.info(f"Daily statistics generated successfully for {yesterday}")
-        return stats
-    except Exception as e:
-        logger.error(f"Error generating daily statistics: {str(e)}")
-        raise
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        db.info[STATEMENT_TIMEOUT_KEY] = settings.DB_STATS_STATEMENT_TIMEOUT_MS
+        try:
+            stats = await create_or_update_daily_stats(db, stats_date=yesterday)
+            logger.info(f"Daily statistics generated successfully for {yesterday}")
+            return stats
+        except Exception as e:
+            logger.error(f"Error generating daily statistics: {str(e)}")
+            raise
+
+async def prune_revoked_tokens():
+    """Delete revocations of tokens that are past their expiry and rejected anyway"""
+    async with AsyncSessionLocal() as db:
+        deleted = await delete_expired_revoked_tokens(db)
+        logger.info(f"Pruned {deleted} expired token revocations")
+        return deleted
+
+async def expire_upload_sessions():
+    """Delete abandoned resumable uploads and their partial files, in batches"""
+    expired = 0
+    async with AsyncSessionLocal() as db:
+        while upload_sessions := await get_expired_upload_sessions(db):
+            for upload_session in upload_sessions:
+                await asyncio.to_thread(blob_store.discard, blob_store.partial_path(upload_session.upload_id))
+                await db.delete(upload_session)
+            await db.commit()
+            expired += len(upload_sessions)
+    logger.info(f"Expired {expired} abandoned uploads")
+    return expired
+
+async def collect_orphaned_uploads():
+    """Reclaim disk held by local files nothing references, S3 buckets rely on the lifecycle rules in the README"""
+    # A lagging replica could miss fresh references and get live files quarantined or purged
+    async with primary_session() as db:
+        report = await collect_orphaned_files(
+            db,
+            blob_store,
+            min_age_seconds=settings.ORPHAN_MIN_AGE_HOURS * 3600,
+            quarantine_seconds=settings.ORPHAN_QUARANTINE_HOURS * 3600,
+            batch_size=settings.ORPHAN_GC_BATCH_SIZE,
+            batch_pause_seconds=settings.ORPHAN_GC_BATCH_PAUSE_SECONDS
+        )
+    logger.info(
+        f"Scanned {report.scanned} stored files, quarantined {report.quarantined} orphans, "
+        f"restored {report.restored}, deleted {report.deleted} and reclaimed {report.reclaimed_bytes} bytes"
+    )
+    return report
+
+async def prune_feed_entries():
+    """Delete feed activity older than the retention window"""
+    async with AsyncSessionLocal() as db:
+        deleted = await delete_expired_feed_entries(db, batch_size=settings.FEED_PRUNE_BATCH_SIZE)
+        logger.info(f"Pruned {deleted} expired feed entries")
+        return deleted
 
 def job_execution_listener(event):
     """Monitor job execution and log status"""
@@ -39,8 +89,8 @@ def job_execution_listener(event):
         # Example: notify_job_failure(event.job_id, str(event.exception))
 
 def init_scheduler():
-    """Initialize the background scheduler"""
-    scheduler = BackgroundScheduler()
+    """Initialize the scheduler on the running event loop"""
+    scheduler = AsyncIOScheduler()
     
     # Schedule stats aggregation every 30 minutes as per requirements
     scheduler.add_job(
@@ -53,6 +103,46 @@ def init_scheduler():
         misfire_grace_time=300  # Allow 5-minute grace period for misfires
     )
     
+    # Keep the revocation table, and the Bloom filter rebuilt from it, bounded
+    scheduler.add_job(
+        prune_revoked_tokens,
+        IntervalTrigger(hours=1),
+        id="revoked_token_pruning_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    
+    # Free the disk held by uploads that were never completed
+    scheduler.add_job(
+        expire_upload_sessions,
+        IntervalTrigger(hours=1),
+        id="upload_session_expiry_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    
+    # Reconcile the upload directory against the database at night, when traffic is lowest
+    scheduler.add_job(
+        collect_orphaned_uploads,
+        CronTrigger(hour=3),
+        id="orphaned_upload_collection_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    
+    # Keep feeds bounded to the retention window
+    scheduler.add_job(
+        prune_feed_entries,
+        IntervalTrigger(hours=1),
+        id="feed_pruning_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    
     # Add job execution listener for monitoring
     scheduler.add_listener(
         job_execution_listener,
@@ -0,0 +1,107 @@
+"""Per-call Python overhead of the hot CRUD lookups, ad hoc statements vs prebuilt ones.
+
+Usage: python -m benchmarks.crud_lookups [--calls 2000]
+
+Runs against an in-memory SQLite database so the numbers are dominated by statement
+construction, cache key generation and ORM loading rather than by the network.
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.pool import StaticPool
+
+from app.crud.attachment_crud import get_attachment
+from app.crud.comment_crud import get_comment
+from app.crud.issue_crud import get_issue
+from app.crud.user_crud import get_user, get_user_by_email
+from app.db.database import Base
+from app.models.attachment import Attachment
+from app.models.comment import Comment
+from app.models.issue import Issue, IssueSeverity, IssueStatus
+from app.models.user import User, UserRole
+
+async def adhoc_issue(db: AsyncSession, issue_id: int):
+    result = await db.execute(
+        select(Issue).options(
+            joinedload(Issue.reporter),
+            joinedload(Issue.assignee),
+            joinedload(Issue.tags),
+        ).filter(Issue.id == issue_id).execution_options(populate_existing=True)
+    )
+    return result.unique().scalars().first()
+
+async def adhoc_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(User).filter(User.id == user_id))
+
+async def adhoc_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).filter(User.email == email))
+
+async def adhoc_comment(db: AsyncSession, comment_id: int):
+    result = await db.execute(select(Comment).options(joinedload(Comment.user)).filter(Comment.id == comment_id))
+    return result.scalars().first()
+
+async def adhoc_attachment(db: AsyncSession, attachment_id: int):
+    result = await db.execute(
+        select(Attachment).options(joinedload(Attachment.uploader)).filter(Attachment.id == attachment_id)
+    )
+    return result.scalars().first()
+
+async def seed(db: AsyncSession):
+    """Create one row of each model to look up"""
+    user = User(email="bench@example.com", name="Bench", hashed_password="x", role=UserRole.ADMIN)
+    db.add(user)
+    await db.flush()
+    issue = Issue(title="Bench", description="Bench", severity=IssueSeverity.LOW, status=IssueStatus.OPEN, reporter_id=user.id)
+    db.add(issue)
+    await db.flush()
+    db.add(Comment(content="Bench", issue_id=issue.id, user_id=user.id))
+    db.add(Attachment(filename="a.txt", file_path="a.txt", content_type="text/plain", size=1, issue_id=issue.id, uploader_id=user.id))
+    await db.commit()
+
+async def time_calls(db: AsyncSession, lookup: Callable[..., Awaitable], argument, calls: int) -> float:
+    """Return the mean microseconds per call after a warm-up"""
+    for _ in range(50):
+        await lookup(db, argument)
+    db.expunge_all()
+    started = time.perf_counter()
+    for _ in range(calls):
+        await lookup(db, argument)
+        # Fresh identity map per call, like one request per lookup
+        db.expunge_all()
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+async def run(calls: int):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    cases = [
+        ("get_issue", adhoc_issue, get_issue, 1),
+        ("get_user", adhoc_user, get_user, 1),
+        ("get_user_by_email", adhoc_user_by_email, get_user_by_email, "bench@example.com"),
+        ("get_comment", adhoc_comment, get_comment, 1),
+        ("get_attachment", adhoc_attachment, get_attachment, 1),
+    ]
+    async with session_factory() as db:
+        await seed(db)
+        print(f"{'lookup':<20}{'ad hoc us':>12}{'prebuilt us':>14}{'saved':>9}")
+        for name, adhoc, prebuilt, argument in cases:
+            adhoc_us = await time_calls(db, adhoc, argument, calls)
+            prebuilt_us = await time_calls(db, prebuilt, argument, calls)
+            print(f"{name:<20}{adhoc_us:>12.1f}{prebuilt_us:>14.1f}{(1 - prebuilt_us / adhoc_us) * 100:>8.1f}%")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="lookups timed per case")
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+if __name__ == "__main__":
+    main()
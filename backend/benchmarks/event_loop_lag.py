@@ -0,0 +1,94 @@
+"""Compare event loop lag while queries run through a sync Session and an AsyncSession.
+
+Usage: DATABASE_URL=postgresql://... python -m benchmarks.event_loop_lag [--queries 20] [--sleep 0.2]
+
+Each query sleeps in the database (pg_sleep) so it stands in for a slow request.
+A ticker task measures how late the loop wakes it up, which is the latency every
+other request and WebSocket connection on the worker sees at the same time.
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.database import get_async_database_url
+
+TICK_SECONDS = 0.005
+
+async def measure_lag(stop: asyncio.Event, lags: List[float]):
+    """Record how late each tick fires"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+def slow_query(sleep: float) -> str:
+    """Build a query that holds the connection for the given number of seconds"""
+    if settings.DATABASE_URL.startswith("sqlite"):
+        # SQLite has no sleep function, use a recursive CTE that burns roughly the same time
+        return f"WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < {int(sleep * 5_000_000)}) SELECT max(x) FROM c"
+    return f"SELECT pg_sleep({sleep})"
+
+def pool_options(queries: int) -> dict:
+    """Size the pool so every query gets its own connection"""
+    return {} if settings.DATABASE_URL.startswith("sqlite") else {"pool_size": queries}
+
+async def run_sync(queries: int, sleep: float) -> List[float]:
+    """Run queries through a sync Session inside coroutines, as the old endpoints did"""
+    session_factory = sessionmaker(bind=create_engine(settings.DATABASE_URL, **pool_options(queries)))
+    statement = text(slow_query(sleep))
+    
+    async def query():
+        with session_factory() as db:
+            db.execute(statement)
+    
+    return await measure(lambda: asyncio.gather(*(query() for _ in range(queries))))
+
+async def run_async(queries: int, sleep: float) -> List[float]:
+    """Run queries through an AsyncSession"""
+    engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), **pool_options(queries))
+    session_factory = async_sessionmaker(engine, class_=AsyncSession)
+    statement = text(slow_query(sleep))
+    
+    async def query():
+        async with session_factory() as db:
+            await db.execute(statement)
+    
+    try:
+        return await measure(lambda: asyncio.gather(*(query() for _ in range(queries))))
+    finally:
+        await engine.dispose()
+
+async def measure(workload) -> List[float]:
+    """Run a workload alongside the lag ticker and return the observed lags"""
+    stop = asyncio.Event()
+    lags: List[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(TICK_SECONDS * 2)
+    await workload()
+    stop.set()
+    await ticker
+    return lags
+
+def report(name: str, lags: List[float]):
+    """Print lag percentiles in milliseconds"""
+    lags = sorted(lags) or [0.0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{name:>6}: ticks={len(lags):5d}  max={lags[-1] * 1000:8.1f} ms  p99={p99 * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20, help="concurrent slow queries")
+    parser.add_argument("--sleep", type=float, default=0.2, help="seconds each query holds the database")
+    args = parser.parse_args()
+    
+    report("sync", asyncio.run(run_sync(args.queries, args.sleep)))
+    report("async", asyncio.run(run_async(args.queries, args.sleep)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import pytest
+
+from app.core.blobs import blob_store
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.core.thumbnails import thumbnail_generator
+from app.models.attachment import Attachment
+from app.models.issue import Issue
+from app.models.user import User, UserRole
+
+@pytest.fixture
+def reported_issue(db, tmp_path, monkeypatch):
+    """Create an issue with one attachment, its reporter and another reporter"""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(blob_store, "root", str(tmp_path))
+    (tmp_path / "log.txt").write_bytes(b"log")
+    owner, other = (
+        User(email=f"{name}@example.com", name=name, role=UserRole.REPORTER, is_active=True)
+        for name in ("owner", "other")
+    )
+    db.add_all([owner, other])
+    db.commit()
+    issue = Issue(title="Crash", description="It crashes", reporter_id=owner.id)
+    db.add(issue)
+    db.commit()
+    attachment = Attachment(
+        filename="log.txt", file_path="log.txt", content_type="text/plain",
+        size=3, issue_id=issue.id, uploader_id=owner.id
+    )
+    db.add(attachment)
+    db.commit()
+    tokens = {
+        user.name: create_access_token({"sub": str(user.id), "email": user.email, "role": user.role.value})
+        for user in (owner, other)
+    }
+    return issue.id, attachment.id, tokens
+
+def test_archive_is_forbidden_to_other_reporters(client, reported_issue):
+    """Test that a reporter cannot download the attachments of someone else's issue"""
+    issue_id, _, tokens = reported_issue
+    response = client.get(
+        f"/api/v1/attachments/issue/{issue_id}/archive",
+        headers={"Authorization": f"Bearer {tokens['other']}"}
+    )
+    assert response.status_code == 403
+    
+    response = client.get(
+        f"/api/v1/attachments/issue/{issue_id}/archive",
+        headers={"Authorization": f"Bearer {tokens['owner']}"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+@pytest.mark.parametrize("path", ["download", "download-url"])
+def test_files_are_forbidden_to_other_reporters(client, reported_issue, path):
+    """Test that reporters can neither download nor get a signed link to files on someone else's issue"""
+    _, attachment_id, tokens = reported_issue
+    response = client.get(
+        f"/api/v1/attachments/{attachment_id}/{path}",
+        headers={"Authorization": f"Bearer {tokens['other']}"}
+    )
+    assert response.status_code == 403
+    
+    response = client.get(
+        f"/api/v1/attachments/{attachment_id}/{path}",
+        headers={"Authorization": f"Bearer {tokens['owner']}"}
+    )
+    assert response.status_code == 200
+
+def test_thumbnails_are_forbidden_to_other_reporters(client, reported_issue, monkeypatch):
+    """Test that reporters cannot have thumbnails rendered for files on someone else's issue"""
+    _, attachment_id, tokens = reported_issue
+    
+    async def render(*args):
+        raise AssertionError("rendered a thumbnail for a forbidden attachment")
+    
+    monkeypatch.setattr(thumbnail_generator, "get", render)
+    monkeypatch.setattr(Attachment, "has_thumbnail", True)
+    response = client.get(
+        f"/api/v1/attachments/{attachment_id}/thumbnail",
+        headers={"Authorization": f"Bearer {tokens['other']}"}
+    )
+    assert response.status_code == 403
@@ -1,25 +1,31 @@
 import os
+import tempfile
 import pytest
 from typing import Dict, Generator
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-from app.db.database import Base, get_db
+from app.db.database import Base, get_db, get_async_database_url
 from app.main import app
 from app.core.config import settings
+from app.core.revocation import revocation_store
 from app.core.security import create_access_token
 from app.models.user import UserRole
 
-# Use in-memory SQLite for tests
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Use a temporary SQLite file so the sync fixtures and the async API share one database
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(get_async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 @pytest.fixture(scope="function")
 def db() -> Generator:
@@ -32,21 +38,24 @@ def db() -> Generator:
         yield db
     finally:
         db.close()
-        
+    
     # Drop all tables after the test
     Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
-def client(db) -> Generator:
+def client(db, monkeypatch) -> Generator:
     # Override the get_db dependency
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            pass
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as async_db:
+            yield async_db
     
     app.dependency_overrides[get_db] = override_get_db
     
+    # The revocation filter opens its own sessions, rebuild it from the test database
+    monkeypatch.setattr(revocation_store, "session_factory", TestingAsyncSessionLocal)
+    monkeypatch.setattr(revocation_store, "_built_at", None)
+    monkeypatch.setattr(revocation_store, "_rebuild_task", None)
+    
     # Create test client
     with TestClient(app) as c:
         yield c
@@ -0,0 +1,39 @@
+import asyncio
+import io
+import zipfile
+from datetime import datetime
+
+from app.core.archives import ArchiveMember, stream_zip, unique_names
+
+def chunked(data: bytes, size: int):
+    async def chunks():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+    return chunks
+
+def test_stream_zip_builds_a_readable_archive_incrementally():
+    """Test that the archive streams in pieces, stores compressed formats and deflates the rest"""
+    log = b"line of text\n" * 5000
+    photo = bytes(range(256)) * 100
+    members = [
+        ArchiveMember("log.txt", len(log), datetime(2024, 5, 1, 12, 30), chunked(log, 4096)),
+        ArchiveMember("photo.jpg", len(photo), datetime(2024, 5, 2), chunked(photo, 4096)),
+    ]
+    
+    async def collect():
+        return [part async for part in stream_zip(members)]
+    
+    parts = asyncio.run(collect())
+    assert len(parts) > 4
+    assert max(map(len, parts)) < len(log)
+    with zipfile.ZipFile(io.BytesIO(b"".join(parts))) as archive:
+        assert archive.testzip() is None
+        assert archive.read("log.txt") == log
+        assert archive.read("photo.jpg") == photo
+        assert archive.getinfo("log.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("log.txt").date_time == (2024, 5, 1, 12, 30, 0)
+
+def test_unique_names_numbers_duplicates():
+    """Test that attachments sharing a filename get distinct archive entries"""
+    assert unique_names(["a.txt", "b.txt", "A.txt", "a.txt"]) == ["a.txt", "b.txt", "A (2).txt", "a (3).txt"]
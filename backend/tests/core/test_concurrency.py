@@ -0,0 +1,71 @@
+import asyncio
+
+from app.core.concurrency import AIMDLimiter, AdaptiveConcurrencyMiddleware, classify_request
+
+def http_scope(path, method="GET", query_string=b""):
+    return {"type": "http", "path": path, "method": method, "query_string": query_string}
+
+def test_classify_request():
+    """Test route class mapping"""
+    assert classify_request(http_scope("/api/v1/auth/login", "POST")) == "auth"
+    assert classify_request(http_scope("/api/v1/issues/", query_string=b"search=boom")) == "search"
+    assert classify_request(http_scope("/api/v1/issues/")) == "crud"
+    assert classify_request(http_scope("/api/v1/stats/dashboard")) == "stats"
+    assert classify_request(http_scope("/api/v1/attachments/issue/1/archive")) == "export"
+    assert classify_request(http_scope("/api/v1/uploads/abc", "PATCH")) == "upload"
+    assert classify_request(http_scope("/health")) is None
+
+def test_limiter_grows_additively_and_backs_off_multiplicatively():
+    """Test AIMD adaptation from latency"""
+    limiter = AIMDLimiter("test", target_seconds=0.1, initial_limit=10, min_limit=2, max_limit=11)
+    for _ in range(20):
+        assert limiter.try_acquire()
+        limiter.release(0.01)
+    assert limiter.limit == 11
+    
+    assert limiter.try_acquire()
+    limiter.release(0.5)
+    assert round(limiter.limit, 1) == 9.9
+    # A second slow response within the same window is part of the same signal
+    assert limiter.try_acquire()
+    limiter.release(0.5)
+    assert round(limiter.limit, 1) == 9.9
+
+def test_middleware_sheds_over_limit_and_bulk_first():
+    """Test 503 shedding and that bulk routes yield to saturated interactive ones"""
+    release = asyncio.Event()
+    sent = []
+    
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    
+    limiters = {
+        "crud": AIMDLimiter("crud", target_seconds=1, initial_limit=1, min_limit=1, max_limit=10),
+        "stats": AIMDLimiter("stats", target_seconds=1, initial_limit=5, min_limit=1, max_limit=10),
+    }
+    middleware = AdaptiveConcurrencyMiddleware(app, limiters=limiters)
+    
+    def request(path):
+        async def send(message):
+            if message["type"] == "http.response.start":
+                sent.append((path, message["status"]))
+        return middleware(http_scope(path), None, send)
+    
+    async def run():
+        admitted = asyncio.create_task(request("/api/v1/issues/1"))
+        stats = asyncio.create_task(request("/api/v1/stats/dashboard"))
+        await asyncio.sleep(0)
+        # crud is now saturated, so stats is held to its minimum of one
+        await request("/api/v1/issues/2")
+        await request("/api/v1/stats/daily")
+        release.set()
+        await asyncio.gather(admitted, stats)
+    
+    asyncio.run(run())
+    assert ("/api/v1/issues/2", 503) in sent
+    assert ("/api/v1/stats/daily", 503) in sent
+    assert ("/api/v1/issues/1", 200) in sent
+    assert ("/api/v1/stats/dashboard", 200) in sent
+    assert limiters["crud"].in_flight == 0
@@ -0,0 +1,52 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.downloads import RangeFileResponse, RangeNotSatisfiable, parse_range_header
+
+def test_parse_range_header():
+    """Test single, suffix, open-ended and overlapping ranges"""
+    assert parse_range_header("bytes=0-9", 100) == [(0, 9)]
+    assert parse_range_header("bytes=-10", 100) == [(90, 99)]
+    assert parse_range_header("bytes=90-", 100) == [(90, 99)]
+    assert parse_range_header("bytes=95-200", 100) == [(95, 99)]
+    assert parse_range_header("bytes=0-9,5-19,50-59", 100) == [(0, 19), (50, 59)]
+    assert parse_range_header("items=0-9", 100) is None
+    assert parse_range_header("bytes=9-0", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=100-", 100)
+
+def test_range_and_conditional_responses(tmp_path):
+    """Test 206 single and multipart responses, 304 revalidation and 416"""
+    content = bytes(range(256)) * 4
+    path = tmp_path / "file.bin"
+    path.write_bytes(content)
+    
+    async def download(request):
+        return RangeFileResponse(str(path), media_type="application/pdf", etag='"abc"', immutable=True)
+    
+    client = TestClient(Starlette(routes=[Route("/file", download)]))
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+    
+    response = client.get("/file", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.content == content[10:20]
+    
+    response = client.get("/file", headers={"Range": "bytes=0-1,-2"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert b"Content-Range: bytes 1022-1023/1024" in response.content
+    
+    response = client.get("/file", headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert client.get("/file", headers={"If-None-Match": '"abc"'}).status_code == 304
+    response = client.get("/file", headers={"Range": "bytes=2000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
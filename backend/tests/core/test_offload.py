@@ -0,0 +1,29 @@
+from urllib.parse import parse_qs, urlsplit
+
+from app.core import offload
+from app.core.offload import X_ACCEL_REDIRECT, file_response, signed_file_url, verify_file_signature
+
+def test_signed_file_url_round_trip():
+    """Test that a signed link verifies and that changing any part or letting it expire breaks it"""
+    url = signed_file_url("blobs/ab/cd/abcd", "report.pdf", "application/pdf", expires_in=60)
+    query = {name: values[0] for name, values in parse_qs(urlsplit(url).query).items()}
+    assert urlsplit(url).path.endswith("/files/blobs/ab/cd/abcd")
+    expires = int(query["expires"])
+    assert verify_file_signature("blobs/ab/cd/abcd", "report.pdf", "application/pdf", expires, query["signature"])
+    assert not verify_file_signature("blobs/ab/cd/abcd", "report.pdf", "text/html", expires, query["signature"])
+    assert not verify_file_signature("blobs/ab/cd/other", "report.pdf", "application/pdf", expires, query["signature"])
+    assert not verify_file_signature("blobs/ab/cd/abcd", "report.pdf", "application/pdf", expires + 1, query["signature"])
+    assert not verify_file_signature("blobs/ab/cd/abcd", "report.pdf", "application/pdf", 1, query["signature"])
+
+def test_file_response_offloads_to_proxy(monkeypatch):
+    """Test that with X-Accel-Redirect the response carries headers only and the proxy sends the bytes"""
+    monkeypatch.setattr(offload.settings, "DOWNLOAD_OFFLOAD", X_ACCEL_REDIRECT)
+    response = file_response(
+        "blobs/ab/cd/abcd", media_type="application/pdf", filename="Q3 report.pdf", etag='"abcd"', immutable=True
+    )
+    assert response.body == b""
+    assert response.headers["x-accel-redirect"] == "/protected-uploads/blobs/ab/cd/abcd"
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-disposition"] == "attachment; filename*=utf-8''Q3%20report.pdf"
+    assert response.headers["etag"] == '"abcd"'
+    assert "immutable" in response.headers["cache-control"]
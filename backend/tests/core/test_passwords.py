@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.core.passwords import PasswordHasher, PasswordHasherBusy, hash_password
+
+def test_hash_and_verify_in_pool():
+    """Test hashing and verification through the process pool"""
+    hasher = PasswordHasher(workers=1, max_queue=0, rounds=4)
+    
+    async def run():
+        hashed = await hasher.hash("secret")
+        return hashed, await hasher.verify_and_update("secret", hashed), await hasher.verify_and_update("wrong", hashed)
+    
+    try:
+        hashed, correct, wrong = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    assert hashed.startswith("$2b$04$")
+    assert correct == (True, None)
+    assert wrong == (False, None)
+
+def test_outdated_cost_is_rehashed():
+    """Test that a hash made with another cost comes back upgraded"""
+    hasher = PasswordHasher(workers=1, max_queue=0, rounds=5)
+    try:
+        valid, new_hash = asyncio.run(hasher.verify_and_update("secret", hash_password("secret", 4)))
+    finally:
+        hasher.shutdown()
+    assert valid
+    assert new_hash.startswith("$2b$05$")
+
+def test_saturated_pool_fails_fast():
+    """Test that work beyond the workers and queue is rejected instead of queued"""
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=4)
+    
+    async def run():
+        return await asyncio.gather(*(hasher.hash("secret") for _ in range(3)), return_exceptions=True)
+    
+    try:
+        results = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    assert sum(isinstance(result, PasswordHasherBusy) for result in results) == 1
+    assert hasher.in_flight == 0
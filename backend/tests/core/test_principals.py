@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.principals import PrincipalCache
+from app.core.security import create_access_token
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache stays bounded and keeps recently used tokens"""
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    cache.set("token-a", 1, {"id": 1})
+    cache.set("token-b", 2, {"id": 2})
+    assert cache.get("token-a") == {"id": 1}
+    cache.set("token-c", 3, {"id": 3})
+    assert len(cache) == 2
+    assert cache.get("token-b") is None
+    assert cache.get("token-a") == {"id": 1}
+
+def test_cache_respects_ttl_and_token_expiry():
+    """Test that entries never outlive the TTL or the token itself"""
+    cache = PrincipalCache(max_size=10, ttl_seconds=0)
+    cache.set("token-a", 1, {"id": 1})
+    assert cache.get("token-a") is None
+    
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.set("expired", 1, {"id": 1}, token_expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+    cache.set("fresh", 1, {"id": 1}, token_expires_at=time.time() + 30)
+    assert cache.get("fresh") == {"id": 1}
+
+def test_invalidate_user_drops_every_token():
+    """Test that updating or deactivating a user drops all of their cached tokens"""
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.set("token-a", 1, {"id": 1})
+    cache.set("token-b", 1, {"id": 1})
+    cache.set("token-c", 2, {"id": 2})
+    cache.invalidate_user("1")
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is None
+    assert cache.get("token-c") == {"id": 2}
+
+def test_cached_token_is_checked_for_revocation(monkeypatch):
+    """Test that a token logged out in another process stops working even while it is cached here"""
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    token = create_access_token({"sub": "1"})
+    cache.set(token, 1, {"id": 1}, jti="logged-out")
+    assert cache.lookup(token) == ({"id": 1}, "logged-out")
+    
+    async def fake_is_revoked(jti):
+        return jti == "logged-out"
+    
+    monkeypatch.setattr(security, "principal_cache", cache)
+    monkeypatch.setattr(security.revocation_store, "is_revoked", fake_is_revoked)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(security.get_current_user(db=None, token=token))
+    assert exc_info.value.status_code == 401
+    assert cache.get(token) is None
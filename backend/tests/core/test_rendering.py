@@ -0,0 +1,20 @@
+from app.core.rendering import render_markdown, sanitize_html
+
+def test_render_markdown_escapes_raw_html_and_unsafe_links():
+    """Test that typed HTML is shown as text and only safe URL schemes survive"""
+    html = render_markdown("**bold** <script>alert(1)</script> [x](javascript:alert(1)) [y](https://example.com)")
+    assert "<strong>bold</strong>" in html
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+    assert "javascript" not in html
+    assert '<a href="https://example.com" rel="nofollow noopener noreferrer">y</a>' in html
+
+def test_sanitize_html_keeps_only_allowed_markup():
+    """Test that disallowed tags, attributes and script content are removed and tags stay balanced"""
+    html = sanitize_html(
+        '<p onclick="x"><a href=" java\tscript:y">a<b>b</p><script>z</script><img src="/a.png" onerror="x">'
+        '<code class="language-py">c</code><code class="x">d</code>'
+    )
+    assert html == (
+        '<p><a rel="nofollow noopener noreferrer">a<b>b</b></a></p><img src="/a.png">'
+        '<code class="language-py">c</code><code>d</code>'
+    )
@@ -0,0 +1,64 @@
+import asyncio
+import base64
+import hashlib
+
+import pytest
+from starlette.requests import ClientDisconnect
+
+from app.core.blobs import UploadTooLarge
+from app.core.resumable import (
+    ChecksumMismatch, UploadBusy, locked_partial_upload, parse_upload_checksum, write_chunk
+)
+
+async def body(*chunks, disconnect=False):
+    for chunk in chunks:
+        yield chunk
+    if disconnect:
+        raise ClientDisconnect()
+
+def test_chunks_are_appended_and_verified(tmp_path):
+    """Test that chunks land at their offset and a bad checksum rolls the chunk back"""
+    path = str(tmp_path / "upload.part")
+    
+    async def run():
+        async with locked_partial_upload(path) as fd:
+            offset = await write_chunk(fd, 0, body(b"hello ", b"wor"), max_offset=11)
+            checksum = hashlib.sha256(b"ld").digest()
+            offset = await write_chunk(fd, offset, body(b"ld"), max_offset=11, checksum=checksum)
+            assert offset == 11
+            with pytest.raises(ChecksumMismatch):
+                await write_chunk(fd, 9, body(b"LD"), max_offset=11, checksum=checksum)
+            with pytest.raises(UploadTooLarge):
+                await write_chunk(fd, 9, body(b"ld!"), max_offset=11)
+    
+    asyncio.run(run())
+    assert open(path, "rb").read() == b"hello wor"
+
+def test_disconnect_keeps_received_bytes_without_checksum(tmp_path):
+    """Test that a dropped connection resumes from the bytes that arrived"""
+    path = str(tmp_path / "upload.part")
+    
+    async def run():
+        async with locked_partial_upload(path) as fd:
+            assert await write_chunk(fd, 0, body(b"abc", disconnect=True), max_offset=10) == 3
+            with pytest.raises(ClientDisconnect):
+                await write_chunk(fd, 3, body(b"def", disconnect=True), max_offset=10, checksum=b"x" * 32)
+    
+    asyncio.run(run())
+    assert open(path, "rb").read() == b"abc"
+
+def test_concurrent_writers_are_rejected(tmp_path):
+    """Test that only one request at a time can write to an upload"""
+    path = str(tmp_path / "upload.part")
+    
+    async def run():
+        async with locked_partial_upload(path):
+            with pytest.raises(UploadBusy):
+                async with locked_partial_upload(path):
+                    pass
+    
+    asyncio.run(run())
+    digest = hashlib.sha256(b"x").digest()
+    assert parse_upload_checksum("sha256 " + base64.b64encode(digest).decode()) == digest
+    with pytest.raises(ValueError):
+        parse_upload_checksum("md5 abc")
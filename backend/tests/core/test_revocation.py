@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+from contextlib import nullcontext
+
+from app.core import revocation
+from app.core.revocation import BloomFilter, RevocationStore
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test that every added item is reported and false positives stay near the error rate"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [uuid.uuid4().hex for _ in range(1000)]
+    for item in added:
+        bloom.add(item)
+    assert all(item in bloom for item in added)
+    
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300
+
+def test_store_only_queries_on_probable_hits(monkeypatch):
+    """Test that unrevoked tokens are answered from memory and revoked ones confirmed in the database"""
+    revoked = {"revoked-jti"}
+    lookups = []
+    
+    async def fake_unexpired(db):
+        return list(revoked)
+    
+    async def fake_is_revoked(db, jti):
+        lookups.append(jti)
+        return jti in revoked
+    
+    monkeypatch.setattr(revocation, "get_unexpired_revoked_jtis", fake_unexpired)
+    monkeypatch.setattr(revocation, "is_token_revoked", fake_is_revoked)
+    store = RevocationStore(capacity=100, error_rate=0.0001, refresh_seconds=60, session_factory=nullcontext)
+    
+    async def run():
+        assert await store.is_revoked("revoked-jti")
+        assert not await store.is_revoked("active-jti")
+    
+    asyncio.run(run())
+    assert lookups == ["revoked-jti"]
+
+def test_local_revocation_survives_lagging_rebuild(monkeypatch):
+    """Test that a token revoked here stays revoked even if a rebuild reads a stale table"""
+    async def fake_unexpired(db):
+        return []
+    
+    async def fake_revoke(db, jti, expires_at, user_id=None):
+        return True
+    
+    async def fake_is_revoked(db, jti):
+        return True
+    
+    monkeypatch.setattr(revocation, "get_unexpired_revoked_jtis", fake_unexpired)
+    monkeypatch.setattr(revocation, "revoke_token", fake_revoke)
+    monkeypatch.setattr(revocation, "is_token_revoked", fake_is_revoked)
+    store = RevocationStore(capacity=100, error_rate=0.0001, refresh_seconds=60, session_factory=nullcontext)
+    
+    async def run():
+        await store.revoke(None, "logged-out", expires_at=None)
+        await store.rebuild()
+        assert await store.is_revoked("logged-out")
+    
+    asyncio.run(run())
+
+def test_concurrent_requests_share_one_rebuild(monkeypatch):
+    """Test that a cold or stale filter is rebuilt once, with stale checks answered without waiting"""
+    rebuilds = []
+    
+    async def fake_unexpired(db):
+        rebuilds.append(db)
+        await asyncio.sleep(0.01)
+        return []
+    
+    monkeypatch.setattr(revocation, "get_unexpired_revoked_jtis", fake_unexpired)
+    store = RevocationStore(capacity=100, error_rate=0.0001, refresh_seconds=60, session_factory=nullcontext)
+    
+    async def run():
+        assert not any(await asyncio.gather(*(store.is_revoked(uuid.uuid4().hex) for _ in range(10))))
+        assert len(rebuilds) == 1
+        store.refresh_seconds = 0
+        assert not any(await asyncio.gather(*(store.is_revoked(uuid.uuid4().hex) for _ in range(10))))
+        await store._rebuild_task
+        assert len(rebuilds) == 2
+    
+    asyncio.run(run())
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from PIL import Image
+
+from app.core import storage, thumbnails
+from app.core.blobs import BlobStore
+from app.core.thumbnails import ThumbnailFailed, ThumbnailGenerator, render_thumbnails
+
+def test_render_thumbnails_fits_each_size(tmp_path):
+    """Test that every size is rendered from one decode and fits its bounding box"""
+    source = tmp_path / "photo.png"
+    Image.new("RGB", (800, 400), "red").save(source)
+    destinations = {64: str(tmp_path / "t" / "64.webp"), 256: str(tmp_path / "t" / "256.webp")}
+    assert render_thumbnails(str(source), destinations, max_pixels=10_000_000) == [64, 256]
+    with Image.open(destinations[256]) as image:
+        assert image.size == (256, 128)
+    with Image.open(destinations[64]) as image:
+        assert image.size == (64, 32)
+
+def test_generator_renders_lazily_and_remembers_failures(tmp_path, monkeypatch):
+    """Test that a missing thumbnail is rendered on demand and undecodable files are not retried"""
+    monkeypatch.setattr(thumbnails, "blob_store", BlobStore(str(tmp_path)))
+    monkeypatch.setattr(storage, "blob_store", BlobStore(str(tmp_path)))
+    source = tmp_path / "photo.png"
+    Image.new("RGBA", (300, 300), (0, 0, 255, 128)).save(source)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    generator = ThumbnailGenerator(sizes=[64, 256], workers=1, max_queue=4, max_pixels=10_000_000)
+    
+    async def run():
+        path = await generator.get("a" * 64, "photo.png", 64)
+        with Image.open(path) as image:
+            assert image.size == (64, 64)
+        for _ in range(2):
+            with pytest.raises(ThumbnailFailed):
+                await generator.get("b" * 64, "broken.png", 64)
+    
+    try:
+        asyncio.run(run())
+    finally:
+        generator.shutdown()
+    assert "b" * 64 in generator._failed
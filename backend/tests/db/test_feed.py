@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.crud import feed_crud
+from app.crud.feed_crud import delete_expired_feed_entries, get_feed
+from app.db.database import Base
+from app.models.attachment import Attachment  # noqa: F401, Issue's relationships resolve it by name
+from app.models.comment import Comment
+from app.models.feed_entry import FeedEntry, FeedEventType
+from app.models.issue import Issue, IssueStatus
+from app.models.issue_history import IssueHistory
+from app.models.issue_tag import IssueTag  # noqa: F401, Issue's relationships resolve it by name
+from app.models.user import User
+
+def test_feed_fans_out_on_write_and_reads_popular_issues(monkeypatch):
+    """Test that participants get their own rows, popular issues share one and old activity expires"""
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            reporter, assignee, commenter, outsider = (
+                User(email=f"{name}@example.com", name=name) for name in ("reporter", "assignee", "commenter", "outsider")
+            )
+            db.add_all([reporter, assignee, commenter, outsider])
+            await db.flush()
+            issue = Issue(title="Crash", description="It crashes", reporter_id=reporter.id, assignee_id=assignee.id)
+            db.add(issue)
+            await db.flush()
+            db.add(IssueHistory(
+                issue_id=issue.id, user_id=assignee.id, old_status=IssueStatus.OPEN, new_status=IssueStatus.TRIAGED
+            ))
+            await db.commit()
+            comment = Comment(issue_id=issue.id, user_id=commenter.id, content="Seen it\n\ntoo")
+            db.add(comment)
+            await db.commit()
+            
+            feed = await get_feed(db, user_id=reporter.id)
+            assert [(entry.event_type, entry.summary) for entry in feed] == [
+                (FeedEventType.COMMENT_ADDED, "Seen it too"),
+                (FeedEventType.STATUS_CHANGED, "OPEN → TRIAGED"),
+            ]
+            assert feed[0].issue_title == "Crash"
+            # The assignee changed the status themselves, the outsider takes no part
+            assert [entry.event_type for entry in await get_feed(db, user_id=assignee.id)] == [FeedEventType.COMMENT_ADDED]
+            assert await get_feed(db, user_id=outsider.id) == []
+            
+            first = await get_feed(db, user_id=reporter.id, limit=1)
+            second = await get_feed(db, user_id=reporter.id, before=first[0].id, limit=1)
+            assert [entry.id for entry in first + second] == [entry.id for entry in feed]
+            
+            # Three participants is over the limit, so new activity is stored once and merged on read
+            monkeypatch.setattr(feed_crud.settings, "FEED_FANOUT_MAX_PARTICIPANTS", 2)
+            db.add(Comment(issue_id=issue.id, user_id=reporter.id, content="Still crashing"))
+            await db.commit()
+            assert await db.scalar(select(func.count()).filter(FeedEntry.user_id.is_(None))) == 1
+            assert (await get_feed(db, user_id=commenter.id))[0].summary == "Still crashing"
+            assert (await get_feed(db, user_id=reporter.id))[0].summary == "Seen it too"
+            assert await get_feed(db, user_id=outsider.id) == []
+            
+            # Deleted comments leave every feed
+            await db.delete(comment)
+            await db.commit()
+            assert [entry.summary for entry in await get_feed(db, user_id=assignee.id)] == ["Still crashing"]
+            
+            await db.execute(update(FeedEntry).values(created_at=datetime.utcnow() - timedelta(days=365)))
+            await db.commit()
+            assert await get_feed(db, user_id=commenter.id) == []
+            assert await delete_expired_feed_entries(db, batch_size=1) == 2
+            assert await db.scalar(select(func.count()).select_from(FeedEntry)) == 0
+        await engine.dispose()
+    
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.blobs import QUARANTINE_DIR, BlobStore, blob_key, thumbnail_key
+from app.crud.orphan_crud import collect_orphaned_files
+from app.db.database import Base
+from app.models.attachment import Attachment
+from app.models.blob import Blob
+from app.models.upload_session import UploadSession
+
+def write(store: BlobStore, key: str, data: bytes = b"data", age: float = 0):
+    path = store.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+def test_orphans_are_quarantined_then_deleted(tmp_path):
+    """Test that unreferenced files are moved aside, kept through the grace period and then deleted"""
+    store = BlobStore(str(tmp_path))
+    live_sha, dead_sha = "a" * 64, "b" * 64
+    hour = 3600
+    for key in (blob_key(live_sha), thumbnail_key(live_sha, 64), "issue_1/kept.txt", "tmp/resumable-abc.part"):
+        write(store, key, age=2 * hour)
+    write(store, blob_key(dead_sha), b"x" * 10, age=2 * hour)
+    write(store, thumbnail_key(dead_sha, 64), b"y" * 5, age=2 * hour)
+    write(store, "issue_2/deleted.txt", b"z" * 7, age=2 * hour)
+    write(store, "tmp/upload-failed.part", b"w" * 3, age=2 * hour)
+    # Too recent, its upload may not have committed yet
+    write(store, "tmp/upload-running.part")
+    
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as db:
+            db.add(Blob(sha256=live_sha, size=4, ref_count=1))
+            db.add(Attachment(
+                filename="kept.txt", file_path="issue_1/kept.txt", content_type="text/plain", size=4,
+                issue_id=1, uploader_id=1
+            ))
+            db.add(UploadSession(
+                upload_id="abc", filename="big.pdf", content_type="application/pdf", size=10, offset=4,
+                expires_at=datetime.utcnow(), issue_id=1, uploader_id=1
+            ))
+            await db.commit()
+            options = dict(min_age_seconds=hour, quarantine_seconds=24 * hour, batch_size=3, batch_pause_seconds=0)
+            first = await collect_orphaned_files(db, store, **options)
+            second = await collect_orphaned_files(db, store, **options)
+            # Age the quarantine past its grace period
+            for stored in store.scan(QUARANTINE_DIR):
+                os.utime(os.path.join(tmp_path, QUARANTINE_DIR, stored.key), (0, 0))
+            third = await collect_orphaned_files(db, store, **options)
+        await engine.dispose()
+        return first, second, third
+    
+    first, second, third = asyncio.run(run())
+    assert first.scanned == 9 and first.quarantined == 4 and first.deleted == 0
+    assert second.scanned == 5 and second.quarantined == 0 and second.deleted == 0
+    assert third.deleted == 4 and third.reclaimed_bytes == 25
+    remaining = sorted(stored.key for stored in store.scan())
+    assert remaining == sorted([
+        blob_key(live_sha), thumbnail_key(live_sha, 64), "issue_1/kept.txt",
+        "tmp/resumable-abc.part", "tmp/upload-running.part"
+    ])
+    assert not os.path.exists(tmp_path / "issue_2")
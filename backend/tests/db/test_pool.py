@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+
+from app.db.pool import PoolWaitStats, TimedQueuePool, pool_status
+
+def make_pool(**options) -> TimedQueuePool:
+    """Build an instrumented pool over in-memory SQLite connections"""
+    pool = TimedQueuePool(lambda: sqlite3.connect(":memory:"), **options)
+    pool.wait_stats = PoolWaitStats("test")
+    return pool
+
+def test_pool_status_reports_usage_and_timeouts():
+    """Test that checkouts, overflow and timed out waits are reported"""
+    pool = make_pool(pool_size=1, max_overflow=1, timeout=0.01)
+    first = pool.connect()
+    second = pool.connect()
+    
+    status = pool_status(pool)
+    assert status["checked_out"] == 2
+    assert status["overflow"] == 1
+    assert status["checkouts"] == 2
+    
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    status = pool_status(pool)
+    assert status["timeouts"] == 1
+    assert status["max_wait_ms"] >= 10
+    
+    first.close()
+    second.close()
+    assert pool_status(pool)["checked_out"] == 0
+
+def test_recreated_pool_keeps_wait_stats():
+    """Test that disposing the engine does not reset the totals"""
+    pool = make_pool(pool_size=1)
+    pool.connect().close()
+    recreated = pool.recreate()
+    assert recreated.wait_stats is pool.wait_stats
+    assert pool_status(recreated)["checkouts"] == 1
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.crud.stats_crud import create_or_update_daily_stats
+from app.db import database
+from app.db.database import Base, RoutingSession
+from app.db.routing import RecentWrites, USE_PRIMARY_KEY, USER_ID_KEY, bind_session_user
+from app.models.attachment import Attachment  # noqa: F401, Issue's relationships resolve it by name
+from app.models.comment import Comment  # noqa: F401, Issue's relationships resolve it by name
+from app.models.daily_stats import DailyStats
+from app.models.issue_tag import IssueTag  # noqa: F401, Issue's relationships resolve it by name
+
+def test_recent_writes_expire_and_stay_bounded():
+    """Test the read-your-writes window and the size bound"""
+    recent = RecentWrites(window_seconds=60, max_size=2)
+    recent.mark(1)
+    recent.mark(2)
+    recent.mark(3)
+    assert len(recent) == 2
+    assert not recent.is_recent(1)
+    assert recent.is_recent("3")
+    
+    expired = RecentWrites(window_seconds=0)
+    expired.mark(1)
+    assert not expired.is_recent(1)
+
+def test_bind_session_user_pins_recent_writers():
+    """Test that only users inside their window are pinned to the primary"""
+    recent = RecentWrites(window_seconds=60)
+    recent.mark(7)
+    
+    info = {}
+    bind_session_user(info, 7, recent)
+    assert info == {USER_ID_KEY: "7", USE_PRIMARY_KEY: True}
+    
+    info = {}
+    bind_session_user(info, 8, recent)
+    assert info == {USER_ID_KEY: "8"}
+
+def test_daily_stats_row_is_written_on_the_primary(monkeypatch):
+    """Test that stats computed over a lagging replica update the primary's row instead of duplicating it"""
+    async def run():
+        primary, replica = (create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool) for _ in range(2))
+        for engine in (primary, replica):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(primary) as db:
+            db.add(DailyStats(date=date(2024, 1, 1), total_issues=5))
+            await db.commit()
+        
+        monkeypatch.setattr(database, "async_engine", primary)
+        monkeypatch.setattr(database, "replica_engine", replica)
+        async with AsyncSession(sync_session_class=RoutingSession) as db:
+            stats = await create_or_update_daily_stats(db, stats_date=date(2024, 1, 1))
+        assert stats.total_issues == 0
+        
+        async with AsyncSession(primary) as db:
+            assert await db.scalar(select(func.count()).select_from(DailyStats)) == 1
+        for engine in (primary, replica):
+            await engine.dispose()
+    
+    asyncio.run(run())
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.crud.statements import issue_by_id, user_by_email, user_by_id
+from app.db.database import Base
+from app.models.user import User, UserRole
+
+def test_statements_are_built_once():
+    """Test that hot lookups reuse one statement object and its cache key"""
+    assert issue_by_id() is issue_by_id()
+    assert user_by_id()._generate_cache_key() is user_by_id()._generate_cache_key()
+
+def test_statements_bind_parameters():
+    """Test that the shared statements look up the requested rows"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add_all([
+            User(email="a@example.com", name="A", role=UserRole.ADMIN),
+            User(email="b@example.com", name="B", role=UserRole.REPORTER),
+        ])
+        db.commit()
+        
+        assert db.scalar(user_by_id(), {"user_id": 2}).email == "b@example.com"
+        assert db.scalar(user_by_email(), {"email": "a@example.com"}).id == 1
+        assert db.scalar(user_by_email(), {"email": "c@example.com"}) is None
+        assert db.execute(issue_by_id(), {"issue_id": 1}).unique().scalars().first() is None
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm import Session
+
+from app.core import storage
+from app.core.blobs import BlobStore, UploadTooLarge, blob_key
+from app.core.config import settings
+from app.crud import blob_crud
+from app.crud.attachment_crud import create_attachment
+from app.crud.orphan_crud import collect_orphaned_files
+from app.db.database import Base
+from app.models.attachment import Attachment
+from app.models.blob import Blob
+from app.models.upload_session import UploadSession
+from app.schemas.attachment import AttachmentCreate
+
+def test_upload_is_streamed_hashed_and_content_addressed(tmp_path):
+    """Test that uploads are copied in chunks and moved to a fanned-out SHA-256 path"""
+    store = BlobStore(str(tmp_path))
+    content = os.urandom(10_000)
+    staged = store.stage(io.BytesIO(content), max_size=20_000, chunk_size=1024)
+    sha256 = hashlib.sha256(content).hexdigest()
+    assert (staged.size, staged.sha256) == (len(content), sha256)
+    
+    key = store.commit(staged)
+    assert key == f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+    with open(store.path(key), "rb") as f:
+        assert f.read() == content
+    assert os.listdir(tmp_path / "tmp") == []
+
+def test_linked_partial_survives_commit(tmp_path):
+    """Test that committing a link keeps a resumable partial file, so a failed complete can run again"""
+    store = BlobStore(str(tmp_path))
+    partial = store.partial_path("abc")
+    os.makedirs(os.path.dirname(partial))
+    with open(partial, "wb") as f:
+        f.write(b"finished upload")
+    staged = store.stage_file(partial, chunk_size=4)
+    for _ in range(2):
+        key = store.commit(staged._replace(temp_path=store.link_staged(partial)))
+    with open(store.path(key), "rb") as f:
+        assert f.read() == b"finished upload"
+    assert os.listdir(tmp_path / "tmp") == ["resumable-abc.part"]
+
+def test_oversized_upload_leaves_nothing_behind(tmp_path):
+    """Test that the size limit stops the copy and removes the partial file"""
+    store = BlobStore(str(tmp_path))
+    with pytest.raises(UploadTooLarge):
+        store.stage(io.BytesIO(b"x" * 5000), max_size=4096, chunk_size=1024)
+    assert os.listdir(tmp_path / "tmp") == []
+
+def test_blob_is_removed_with_its_last_reference(tmp_path, monkeypatch):
+    """Test that deleting attachments only removes the shared blob once no attachment uses it"""
+    store = BlobStore(str(tmp_path))
+    monkeypatch.setattr(blob_crud, "blob_store", store)
+    monkeypatch.setattr(storage, "blob_store", store)
+    staged = store.stage(io.BytesIO(b"same log"), max_size=1024, chunk_size=1024)
+    key = store.commit(staged)
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(Blob(sha256=staged.sha256, size=staged.size, ref_count=2))
+        attachments = [
+            Attachment(
+                filename="log.txt", file_path=key, content_type="text/plain", size=staged.size,
+                sha256=staged.sha256, issue_id=issue_id, uploader_id=1
+            )
+            for issue_id in (1, 2)
+        ]
+        db.add_all(attachments)
+        db.commit()
+        
+        db.delete(attachments[0])
+        db.commit()
+        assert db.scalar(select(Blob.ref_count)) == 1
+        assert os.path.exists(store.path(key))
+        
+        db.delete(attachments[1])
+        db.commit()
+        assert db.scalar(select(Blob)) is None
+        assert not os.path.exists(store.path(key))
+
+def test_attachments_larger_than_int32():
+    """Test that every size column fits the upload limits and a 2GB+ attachment round-trips through CRUD"""
+    largest = max(settings.RESUMABLE_UPLOAD_MAX_SIZE, settings.DIRECT_UPLOAD_MAX_SIZE)
+    assert largest >= 2 ** 31
+    for table in (Attachment.__table__, Blob.__table__, UploadSession.__table__):
+        ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+        for column in ("size", "offset"):
+            if column in table.c:
+                assert f"{column} BIGINT" in ddl.replace('"', "")
+    
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            attachment = await create_attachment(db, AttachmentCreate(
+                filename="dump.txt", content_type="text/plain", size=2 ** 31 + 1,
+                issue_id=1, file_path=blob_key("c" * 64), sha256="c" * 64
+            ), uploader_id=1)
+            assert attachment.size == 2 ** 31 + 1
+        await engine.dispose()
+    
+    asyncio.run(run())
+
+def test_released_blob_taken_back_is_kept(tmp_path, monkeypatch):
+    """Test that a blob re-uploaded after its last reference went is never lost to the pending release"""
+    store = BlobStore(str(tmp_path))
+    monkeypatch.setattr(storage, "blob_store", store)
+    staged = store.stage(io.BytesIO(b"same log"), max_size=1024, chunk_size=1024)
+    key = store.commit(staged)
+    
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        monkeypatch.setattr(blob_crud, "primary_session", lambda: AsyncSession(engine))
+        async with AsyncSession(engine) as db:
+            # The same content was uploaded again after the release was scheduled
+            db.add(Blob(sha256=staged.sha256, size=staged.size, ref_count=1))
+            await db.commit()
+            await blob_crud.release_blobs([key])
+            assert os.path.exists(store.path(key))
+            
+            # Released for real, then taken back by an upload the re-check could not see yet
+            await db.execute(delete(Blob))
+            await db.commit()
+            await blob_crud.release_blobs([key])
+            assert not os.path.exists(store.path(key))
+            db.add(Blob(sha256=staged.sha256, size=staged.size, ref_count=1))
+            await db.commit()
+            report = await collect_orphaned_files(
+                db, store, min_age_seconds=3600, quarantine_seconds=86400, batch_size=10, batch_pause_seconds=0
+            )
+            assert report.restored == 1
+        await engine.dispose()
+    
+    asyncio.run(run())
+    with open(store.path(key), "rb") as f:
+        assert f.read() == b"same log"
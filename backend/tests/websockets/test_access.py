@@ -0,0 +1,71 @@
+import asyncio
+
+from app.crud.issue_crud import IssueAccess
+from app.models.user import UserRole
+from app.websockets import access
+from app.websockets.access import IssueAccessCache, ACCESS_ALLOWED, ACCESS_FORBIDDEN, ACCESS_NOT_FOUND
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache stays bounded and keeps recently used entries"""
+    cache = IssueAccessCache(max_size=2, ttl_seconds=60)
+    cache.set("1", 10, True)
+    cache.set("1", 11, False)
+    assert cache.get("1", 10) is True
+    cache.set("1", 12, True)
+    assert len(cache) == 2
+    assert cache.get("1", 11) is None
+    assert cache.get("1", 10) is True
+
+def test_cache_expires_and_invalidates():
+    """Test TTL expiry and per-user and per-issue invalidation"""
+    cache = IssueAccessCache(max_size=10, ttl_seconds=0)
+    cache.set("1", 10, True)
+    assert cache.get("1", 10) is None
+    
+    cache = IssueAccessCache(max_size=10, ttl_seconds=60)
+    cache.set("1", 10, True)
+    cache.set("2", 10, True)
+    cache.set("2", 11, True)
+    cache.invalidate_issue(10)
+    assert cache.get("1", 10) is None
+    assert cache.get("2", 11) is True
+    cache.invalidate_user(2)
+    assert cache.get("2", 11) is None
+
+def test_check_issue_access_batches_and_caches(monkeypatch):
+    """Test that a batch uses one lookup and reporters only see their own issues"""
+    lookups = []
+    roles = {"5": (UserRole.REPORTER, True), "9": (UserRole.MAINTAINER, True)}
+    
+    async def fake_load(issue_ids, user_id):
+        lookups.append(list(issue_ids))
+        role, is_active = roles.get(user_id, (None, False))
+        return IssueAccess(role=role, is_active=is_active, reporter_ids={1: 5, 2: 6})
+    
+    monkeypatch.setattr(access, "load_issue_access", fake_load)
+    monkeypatch.setattr(access, "access_cache", IssueAccessCache(max_size=10, ttl_seconds=60))
+    
+    decisions = asyncio.run(access.check_issue_access("5", [1, 2, 3]))
+    assert decisions == {1: ACCESS_ALLOWED, 2: ACCESS_FORBIDDEN, 3: ACCESS_NOT_FOUND}
+    
+    asyncio.run(access.check_issue_access("5", [1, 2]))
+    assert lookups == [[1, 2, 3]]
+    
+    decisions = asyncio.run(access.check_issue_access("9", [2]))
+    assert decisions == {2: ACCESS_ALLOWED}
+
+def test_access_follows_the_database_role(monkeypatch):
+    """Test that unknown, deactivated and demoted users are denied whatever their token claims"""
+    accounts = {
+        "1": IssueAccess(role=None, is_active=False, reporter_ids={1: 5}),
+        "2": IssueAccess(role=UserRole.ADMIN, is_active=False, reporter_ids={1: 5}),
+        "3": IssueAccess(role=UserRole.REPORTER, is_active=True, reporter_ids={1: 5}),
+    }
+    
+    async def fake_load(issue_ids, user_id):
+        return accounts[user_id]
+    
+    monkeypatch.setattr(access, "load_issue_access", fake_load)
+    monkeypatch.setattr(access, "access_cache", IssueAccessCache(max_size=10, ttl_seconds=60))
+    for user_id in accounts:
+        assert asyncio.run(access.check_issue_access(user_id, [1])) == {1: ACCESS_FORBIDDEN}
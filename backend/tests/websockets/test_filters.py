@@ -0,0 +1,58 @@
+import pytest
+
+from app.models.user import UserRole
+from app.websockets.filters import FilterIndex, FilterError, normalize_filter
+
+def issue(**fields):
+    """Build the issue payload carried by issue_update events"""
+    payload = {
+        "id": 1, "status": "OPEN", "severity": "CRITICAL",
+        "reporter_id": 5, "assignee_id": 7, "tags": ["backend"]
+    }
+    payload.update(fields)
+    return payload
+
+def test_index_matches_only_when_all_fields_match():
+    """Test that a filter matches only when every predicate field matches"""
+    index = FilterIndex()
+    critical = index.add("1", normalize_filter({"severity": "CRITICAL"}, "1", UserRole.ADMIN.value))
+    open_critical = index.add("1", normalize_filter(
+        {"severity": "CRITICAL", "status": ["OPEN", "TRIAGED"]}, "1", UserRole.ADMIN.value
+    ))
+    mine = index.add("7", normalize_filter({"assignee_id": "me", "tag": "backend"}, "7", UserRole.MAINTAINER.value))
+    
+    assert index.match(issue()) == {"1": [critical, open_critical], "7": [mine]}
+    assert index.match(issue(status="DONE", tags=[])) == {"1": [critical]}
+    assert index.match(issue(severity="LOW", assignee_id=None)) == {}
+
+def test_removed_filters_stop_matching():
+    """Test that removing a filter clears it from the index"""
+    index = FilterIndex()
+    filter_id = index.add("1", normalize_filter({"severity": "CRITICAL"}, "1", UserRole.ADMIN.value))
+    assert index.remove(filter_id) == "1"
+    assert index.match(issue()) == {}
+    assert len(index) == 0
+
+def test_reporter_filters_are_scoped_to_own_issues():
+    """Test that reporters only receive matches for issues they reported"""
+    predicates = normalize_filter({"severity": "CRITICAL"}, "5", UserRole.REPORTER.value)
+    assert predicates["reporter_id"] == {"5"}
+    
+    index = FilterIndex()
+    index.add("5", predicates)
+    assert index.match(issue(reporter_id=6)) == {}
+    
+    with pytest.raises(FilterError):
+        normalize_filter({"reporter_id": 6}, "5", UserRole.REPORTER.value)
+
+@pytest.mark.parametrize("role", [None, "", "SUPERUSER"])
+def test_unknown_roles_are_rejected(role):
+    """Test that a filter is refused when the user's role is missing or unrecognised"""
+    with pytest.raises(FilterError):
+        normalize_filter({"severity": "CRITICAL"}, "5", role)
+
+@pytest.mark.parametrize("raw_filter", [None, {}, {"title": "x"}, {"severity": "URGENT"}, {"status": []}])
+def test_invalid_filters_are_rejected(raw_filter):
+    """Test validation of filter fields and values"""
+    with pytest.raises(FilterError):
+        normalize_filter(raw_filter, "1", UserRole.ADMIN.value)
@@ -0,0 +1,229 @@
+import asyncio
+import json
+
+import pytest
+from starlette.websockets import WebSocketState
+
+from app.core.metrics import WS_BROADCASTS
+from app.websockets.manager import ConnectionManager
+
+class FakeWebSocket:
+    """Minimal WebSocket stand-in that records sent frames"""
+    def __init__(self):
+        self.sent = []
+        self.client_state = WebSocketState.CONNECTING
+        self.close_code = None
+    
+    async def accept(self):
+        self.client_state = WebSocketState.CONNECTED
+    
+    async def close(self, code=1000):
+        self.close_code = code
+    
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+def issue_message(update_type="updated", **fields):
+    """Build an issue_update event"""
+    issue = {"id": 1, "title": "Crash on login", "status": "OPEN", "severity": "HIGH"}
+    issue.update(fields)
+    return {"type": "issue_update", "update_type": update_type, "issue": issue}
+
+async def connected_manager(coalesce_window):
+    """Create a manager with one user subscribed to issue 1"""
+    manager = ConnectionManager(coalesce_window=coalesce_window)
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, user_id=7)
+    manager.subscribe_to_issue(7, 1)
+    return manager, websocket
+
+def test_burst_is_coalesced_into_one_frame():
+    """Test that updates inside the window produce a single merged frame"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0.01)
+        await manager.publish_to_issue(issue_message(status="TRIAGED"), 1)
+        await manager.publish_to_issue(issue_message(status="IN_PROGRESS"), 1)
+        await asyncio.sleep(0.05)
+        return websocket.sent
+    
+    sent = asyncio.run(scenario())
+    assert len(sent) == 1
+    assert sent[0]["issue"]["status"] == "IN_PROGRESS"
+    assert sent[0]["delta"] is False
+
+def test_followup_frames_carry_only_changed_fields():
+    """Test that frames after the first contain only deltas"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0)
+        await manager.publish_to_issue(issue_message(), 1)
+        await manager.publish_to_issue(issue_message(status="TRIAGED"), 1)
+        await manager.publish_to_issue(issue_message(status="TRIAGED"), 1)
+        return websocket.sent
+    
+    sent = asyncio.run(scenario())
+    assert len(sent) == 2
+    assert sent[1]["issue"] == {"id": 1, "status": "TRIAGED"}
+    assert sent[1]["delta"] is True
+
+def test_mixed_events_are_batched():
+    """Test that different entities on one issue share a batch frame"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0.01)
+        await manager.publish_to_issue(issue_message(), 1)
+        await manager.publish_to_issue({
+            "type": "comment_update",
+            "update_type": "created",
+            "comment": {"id": 3, "content": "Seen on staging too", "issue_id": 1},
+        }, 1)
+        await asyncio.sleep(0.05)
+        return websocket.sent
+    
+    sent = asyncio.run(scenario())
+    assert len(sent) == 1
+    assert sent[0]["type"] == "batch"
+    assert [event["type"] for event in sent[0]["events"]] == ["issue_update", "comment_update"]
+
+@pytest.mark.parametrize("first,second,expected", [
+    ("created", "updated", "created"),
+    ("updated", "deleted", "deleted"),
+    ("updated", "updated", "updated"),
+])
+def test_update_types_are_merged(first, second, expected):
+    """Test the update type reported for a coalesced entity"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0.01)
+        await manager.publish_to_issue(issue_message(first), 1)
+        await manager.publish_to_issue(issue_message(second, title="Crash on logout"), 1)
+        await asyncio.sleep(0.05)
+        return websocket.sent
+    
+    sent = asyncio.run(scenario())
+    assert sent[0]["update_type"] == expected
+
+def test_broadcast_encodes_payload_once(monkeypatch):
+    """Test that every recipient receives the same pre-encoded text"""
+    from app.websockets import manager as manager_module
+    calls = []
+    original_encode = manager_module.encode_message
+    
+    def counting_encode(message):
+        calls.append(message)
+        return original_encode(message)
+    
+    monkeypatch.setattr(manager_module, "encode_message", counting_encode)
+    
+    async def scenario():
+        manager = ConnectionManager(coalesce_window=0)
+        websockets = [FakeWebSocket() for _ in range(5)]
+        for user_id, websocket in enumerate(websockets):
+            await manager.connect(websocket, user_id=user_id)
+            manager.subscribe_to_issue(user_id, 1)
+        await manager.broadcast_to_issue_subscribers({"type": "ping"}, 1)
+        return websockets
+    
+    websockets = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(websocket.sent == [{"type": "ping", "seq": 1}] for websocket in websockets)
+
+def test_idle_connections_are_reaped_with_subscriptions():
+    """Test that silent connections are closed and their subscriptions purged"""
+    async def scenario():
+        manager = ConnectionManager(coalesce_window=0, heartbeat_interval=0, heartbeat_timeout=0.01)
+        idle, alive = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(idle, user_id=1)
+        await manager.connect(alive, user_id=2)
+        manager.subscribe_to_issue(1, 10)
+        await asyncio.sleep(0.02)
+        manager.touch(alive)
+        reaped = await manager.reap_idle_connections()
+        return manager, idle, reaped
+    
+    manager, idle, reaped = asyncio.run(scenario())
+    assert reaped == 1
+    assert idle.close_code == 1001
+    assert list(manager.active_connections) == [2]
+    assert manager.issue_subscriptions == {}
+    assert manager.connection_count() == 1
+
+def test_connection_and_subscription_caps():
+    """Test that per-user connection and subscription caps are enforced"""
+    async def scenario():
+        manager = ConnectionManager(coalesce_window=0, heartbeat_interval=0)
+        manager.max_connections_per_user = 1
+        manager.max_subscriptions_per_user = 1
+        first = await manager.connect(FakeWebSocket(), user_id=1)
+        second = await manager.connect(FakeWebSocket(), user_id=1)
+        return manager, first, second
+    
+    manager, first, second = asyncio.run(scenario())
+    assert first is True
+    assert second is False
+    assert manager.subscribe_to_issue(1, 10) is True
+    assert manager.subscribe_to_issue(1, 10) is True
+    assert manager.subscribe_to_issue(1, 11) is False
+
+def test_replay_since_returns_missed_frames_or_resync():
+    """Test that frames are stamped with sequence numbers and replayed for a known gap"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0)
+        await manager.publish_to_issue(issue_message(status="TRIAGED"), 1)
+        await manager.publish_to_issue(issue_message(status="IN_PROGRESS"), 1)
+        manager.subscribe_to_issue(8, 2)
+        await manager.publish_to_issue(issue_message(status="DONE", id=2), 2)
+        return manager, websocket
+    
+    manager, websocket = asyncio.run(scenario())
+    assert [frame["seq"] for frame in websocket.sent] == [1, 2]
+    
+    frames = manager.replay_since(manager.epoch, 1, {1, 2})
+    assert [frame["seq"] for frame in frames] == [2, 3]
+    assert manager.replay_since(manager.epoch, 3, {1}) == []
+    assert manager.replay_since("other-process", 1, {1}) is None
+    
+    manager.replay_buffer.popleft()
+    manager.replay_buffer.popleft()
+    assert manager.replay_since(manager.epoch, 1, {1}) is None
+
+def test_unwatched_issues_are_not_recorded():
+    """Test that events without subscribers are dropped and resuming clients are told to resync"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0)
+        await manager.publish_to_issue(issue_message(status="TRIAGED"), 1)
+        await manager.publish_to_issue(issue_message(status="DONE", id=2), 2)
+        return manager
+    
+    manager = asyncio.run(scenario())
+    assert [issue_id for _, issue_id, _ in manager.replay_buffer] == [1]
+    assert manager._pending_events == {} and 2 not in manager._snapshots
+    assert manager.replay_since(manager.epoch, 0, {1}) is not None
+    assert manager.replay_since(manager.epoch, 1, {2}) is None
+
+def test_joining_subscriber_gets_its_own_snapshot():
+    """Test that a new subscriber gets the baseline while existing subscribers keep receiving deltas"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0)
+        await manager.publish_to_issue(issue_message(), 1)
+        joining = FakeWebSocket()
+        await manager.connect(joining, user_id=8)
+        manager.subscribe_to_issue(8, 1)
+        snapshot = manager.issue_snapshot(1)
+        await manager.publish_to_issue(issue_message(status="TRIAGED"), 1)
+        return websocket.sent, joining.sent, snapshot
+    
+    sent, joined, snapshot = asyncio.run(scenario())
+    assert snapshot["seq"] == 1
+    assert snapshot["events"] == [{"type": "issue_update", "issue": issue_message()["issue"], "delta": False}]
+    assert sent[1]["issue"] == {"id": 1, "status": "TRIAGED"}
+    assert joined == [sent[1]]
+
+def test_pings_are_not_counted_as_broadcasts():
+    """Test that heartbeats reach every connection without touching the broadcast metrics"""
+    async def scenario():
+        manager, websocket = await connected_manager(coalesce_window=0)
+        broadcasts = WS_BROADCASTS.labels(scope="all")._value.get()
+        await manager.ping_all()
+        return websocket.sent, WS_BROADCASTS.labels(scope="all")._value.get() - broadcasts
+    
+    sent, broadcasts = asyncio.run(scenario())
+    assert sent == [{"type": "ping"}]
+    assert broadcasts == 0